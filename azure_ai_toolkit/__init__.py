@@ -0,0 +1,6 @@
+"""
+Azure AI Toolkit
+----------------
+Shared helpers used by the example scripts in this repository for running
+Azure AI Text Analytics workloads in bulk.
+"""
@@ -0,0 +1,189 @@
+"""
+Document readers and service-sized batching for Azure AI Text Analytics.
+
+Documents are streamed from a file or stdin and packed into batches that
+respect the per-request document count and character limits of the service,
+so per-request overhead is amortized across as many documents as allowed.
+"""
+
+import json
+import sys
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO
+
+from azure_ai_toolkit.memory import MemoryCeiling
+
+# Service limits for synchronous Language API requests
+# https://learn.microsoft.com/en-us/azure/ai-services/language-service/concepts/data-limits
+MAX_DOCUMENTS_PER_BATCH = {
+    "analyze_sentiment": 10,
+    "detect_language": 1000,
+}
+MAX_CHARACTERS_PER_DOCUMENT = 5120
+MAX_CHARACTERS_PER_BATCH = 125000
+
+# Upper bound on documents per batch including already answered ones (cache
+# hits), so a long run of hits is still streamed rather than accumulated
+MAX_BATCH_LENGTH = 1000
+
+INPUT_FORMATS = ("text", "jsonl")
+
+
+def guess_input_format(path: str) -> str:
+    """Infer the input format from the file extension ("jsonl" or "text")."""
+    return "jsonl" if path.endswith((".jsonl", ".ndjson")) else "text"
+
+
+def _open_input(path: str) -> TextIO:
+    if path == "-":
+        return sys.stdin
+    return open(path, "r", encoding="utf-8")
+
+
+def read_documents(path: str, input_format: Optional[str] = None) -> Iterator[Dict]:
+    """
+    Stream documents from a file, or from stdin when path is "-".
+
+    Args:
+        path: Input file path, or "-" for stdin.
+        input_format: "text" for one document per line, "jsonl" for one JSON
+            object per line with a "text" field and optional "id" and
+            "language" fields. Inferred from the extension when omitted.
+
+    Yields:
+        Documents as dicts with "id" and "text" keys (and "language" when
+        provided). Blank lines are skipped; ids default to the line number.
+    """
+    input_format = input_format or guess_input_format(path)
+    if input_format not in INPUT_FORMATS:
+        raise ValueError(f"Unsupported input format: {input_format}")
+
+    stream = _open_input(path)
+    try:
+        for line_number, line in enumerate(stream, start=1):
+            document = parse_line(line, line_number, input_format)
+            if document is not None:
+                yield document
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def read_document_range(
+    path: str,
+    start: int,
+    end: int,
+    first_line: int = 1,
+    input_format: Optional[str] = None,
+    positions: bool = False,
+) -> Iterator[Dict]:
+    """
+    Stream the documents of the lines starting within a byte range of a file.
+
+    Used to split one input between several workers; ids default to the line
+    number in the whole file, so the output matches a single read_documents
+    pass.
+
+    Args:
+        path: Input file path.
+        start: Byte offset of the first line; must be at a line start.
+        end: Lines starting at or after this offset are left to the next range.
+        first_line: Line number of the line at start.
+        input_format: As for read_documents.
+        positions: Add a "position" key to each document holding the byte
+            offset and line number at which reading would resume after it.
+    """
+    input_format = input_format or guess_input_format(path)
+    if input_format not in INPUT_FORMATS:
+        raise ValueError(f"Unsupported input format: {input_format}")
+
+    with open(path, "rb") as stream:
+        stream.seek(start)
+        position = start
+        line_number = first_line
+        while position < end:
+            line = stream.readline()
+            if not line:
+                break
+            position += len(line)
+            document = parse_line(line.decode("utf-8"), line_number, input_format)
+            line_number += 1
+            if document is not None:
+                if positions:
+                    document["position"] = (position, line_number)
+                yield document
+
+
+def parse_line(line: str, line_number: int, input_format: str) -> Optional[Dict]:
+    """Parse one input line into a document, or None for a blank line (see read_documents)."""
+    line = line.rstrip("\r\n")
+    if not line.strip():
+        return None
+    if input_format == "text":
+        return {"id": str(line_number), "text": line}
+
+    record = json.loads(line)
+    if "text" not in record:
+        raise ValueError(f"Line {line_number}: missing 'text' field")
+    document = {"id": str(record.get("id", line_number)), "text": record["text"]}
+    if record.get("language"):
+        document["language"] = record["language"]
+    return document
+
+
+def iter_batches(
+    documents: Iterable[Dict],
+    max_documents: int = MAX_DOCUMENTS_PER_BATCH["analyze_sentiment"],
+    max_characters: int = MAX_CHARACTERS_PER_BATCH,
+    memory_ceiling: Optional[MemoryCeiling] = None,
+) -> Iterator[List[Dict]]:
+    """
+    Pack a stream of documents into batches within the service limits.
+
+    A batch is closed as soon as adding the next document would exceed either
+    the document count or the total character budget. A single document larger
+    than the character budget is sent on its own so the service can report it.
+    Documents already carrying a "result" (e.g. cache hits) ride along without
+    counting towards the service limits, since they are never sent.
+
+    Args:
+        documents: Iterable of document dicts with a "text" key.
+        max_documents: Maximum number of documents per request.
+        max_characters: Maximum total characters per request.
+        memory_ceiling: Optional MemoryCeiling, sampled after every batch
+            yielded; while the process is above it, both limits are scaled
+            down for the batches packed next.
+
+    Yields:
+        Lists of documents, each list being one service request.
+    """
+    batch: List[Dict] = []
+    batch_documents = 0
+    batch_characters = 0
+    document_limit, character_limit = max_documents, max_characters
+    if memory_ceiling is not None:
+        document_limit, character_limit = memory_ceiling.limits(max_documents, max_characters)
+    for document in documents:
+        if "result" in document:
+            batch.append(document)
+            if len(batch) >= MAX_BATCH_LENGTH:
+                yield batch
+                batch = []
+                batch_documents = 0
+                batch_characters = 0
+                # Also between answered-only batches, so long runs of cache hits are not unchecked
+                if memory_ceiling is not None:
+                    document_limit, character_limit = memory_ceiling.limits(max_documents, max_characters)
+            continue
+        size = len(document["text"])
+        if batch_documents and (batch_documents >= document_limit or batch_characters + size > character_limit):
+            yield batch
+            batch = []
+            batch_documents = 0
+            batch_characters = 0
+            if memory_ceiling is not None:
+                document_limit, character_limit = memory_ceiling.limits(max_documents, max_characters)
+        batch.append(document)
+        batch_documents += 1
+        batch_characters += size
+    if batch:
+        yield batch
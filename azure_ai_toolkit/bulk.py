@@ -0,0 +1,200 @@
+"""
+Bulk execution of Text Analytics operations over batched documents.
+
+Results are converted to plain JSON-serializable records as soon as each
+batch returns, and each SDK result object is released as soon as it is
+converted, so a batch never holds both in full. Sentence-level detail, the
+bulk of a sentiment result for long documents, is only converted when the
+output needs it.
+
+The time every request spends in serialization, deserialization and result
+processing is recorded in azure_ai_toolkit.metrics.
+"""
+
+import time
+from functools import partial
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from azure_ai_toolkit import metrics
+from azure_ai_toolkit.cache import ResultCache
+from azure_ai_toolkit.langid import LocalLanguageDetector
+from azure_ai_toolkit.pipeline import ordered_map
+from azure_ai_toolkit.preprocess import Preprocessor
+from azure_ai_toolkit.throttling import RetryScheduler
+
+
+def _scores_to_record(scores) -> Dict:
+    return {"positive": scores.positive, "neutral": scores.neutral, "negative": scores.negative}
+
+
+def sentiment_result_to_record(result, include_sentences: bool = True) -> Dict:
+    """
+    Convert an AnalyzeSentimentResult (or DocumentError) into a plain record.
+
+    Sentence-level results are kept under "sentences" unless include_sentences
+    is False; writers only output them when asked to.
+    """
+    if result.is_error:
+        return {
+            "id": result.id,
+            "error": {"code": result.error.code, "message": result.error.message},
+        }
+    record = {
+        "id": result.id,
+        "sentiment": result.sentiment,
+        "confidence_scores": _scores_to_record(result.confidence_scores),
+    }
+    if include_sentences:
+        record["sentences"] = [
+            {
+                "text": sentence.text,
+                "sentiment": sentence.sentiment,
+                "confidence_scores": _scores_to_record(sentence.confidence_scores),
+                "offset": sentence.offset,
+                "length": sentence.length,
+            }
+            for sentence in result.sentences
+        ]
+    return record
+
+
+def language_result_to_record(result) -> Dict:
+    """Convert a DetectLanguageResult (or DocumentError) into a plain record."""
+    if result.is_error:
+        return {
+            "id": result.id,
+            "error": {"code": result.error.code, "message": result.error.message},
+        }
+    return {
+        "id": result.id,
+        "language": result.primary_language.name,
+        "iso6391_name": result.primary_language.iso6391_name,
+        "confidence_score": result.primary_language.confidence_score,
+    }
+
+
+RESULT_CONVERTERS = {
+    "analyze_sentiment": sentiment_result_to_record,
+    "detect_language": language_result_to_record,
+}
+
+
+def prepare_documents(
+    documents: Iterable[Dict],
+    operation: str,
+    cache: Optional[ResultCache] = None,
+    language_detector: Optional[LocalLanguageDetector] = None,
+    preprocessor: Optional[Preprocessor] = None,
+) -> Iterable[Dict]:
+    """
+    Answer what can be answered locally before documents are batched.
+
+    Texts are normalized and oversized documents chunked first. Languages
+    detected locally answer detect_language outright and become "language"
+    hints for other operations. The hint is applied before deduplication and
+    the cache lookup since it is part of their keys. With a preprocessor,
+    the records must be passed through preprocessor.finish().
+    """
+    if preprocessor is not None:
+        documents = preprocessor.split(documents)
+    if language_detector is not None:
+        if operation == "detect_language":
+            documents = language_detector.annotate(documents)
+        else:
+            documents = language_detector.hint(documents)
+    if preprocessor is not None:
+        documents = preprocessor.deduplicate(documents)
+    if cache is not None:
+        documents = cache.annotate(documents, operation)
+    return documents
+
+
+def _request_document(document: Dict) -> Dict:
+    # Only send the fields the service understands
+    request = {"id": document["id"], "text": document["text"]}
+    if document.get("language"):
+        request["language"] = document["language"]
+    return request
+
+
+def run_batch(client, operation: str, batch: List[Dict], include_sentences: bool = True, **kwargs) -> List[Dict]:
+    """
+    Send one batch of documents to the service and return plain records.
+
+    Args:
+        client: A TextAnalyticsClient.
+        operation: Client method name, "analyze_sentiment" or "detect_language".
+        batch: Documents as dicts with "id" and "text" keys.
+        include_sentences: Keep sentence-level sentiment in the records.
+        **kwargs: Passed to the client method, e.g. model_version.
+
+    Returns:
+        One record per document, in input order.
+    """
+    convert = RESULT_CONVERTERS[operation]
+    if operation == "analyze_sentiment" and not include_sentences:
+        convert = partial(sentiment_result_to_record, include_sentences=False)
+    start = time.perf_counter()
+    # Clear marks left by a request that failed on this thread
+    metrics.transport_marks()
+    response = getattr(client, operation)([_request_document(document) for document in batch], **kwargs)
+    returned = time.perf_counter()
+    sent, received = metrics.transport_marks()
+    if sent is not None and received is not None:
+        # Only clients from azure_ai_toolkit.clients mark their transport
+        metrics.observe("serialization", sent - start)
+        metrics.observe("deserialization", returned - received)
+    records = []
+    for index, result in enumerate(response):
+        records.append(convert(result))
+        # Drop each SDK result once converted rather than the whole list at the end
+        response[index] = None
+    del response
+    metrics.observe("result_processing", time.perf_counter() - returned)
+    return records
+
+
+def run_bulk(
+    client,
+    operation: str,
+    batches: Iterable[List[Dict]],
+    max_in_flight: int = 1,
+    scheduler: Optional[RetryScheduler] = None,
+    cache: Optional[ResultCache] = None,
+    model_version: Optional[str] = None,
+    include_sentences: bool = True,
+) -> Iterator[Dict]:
+    """
+    Run every batch and yield one record per document, in input order.
+
+    Args:
+        client: A TextAnalyticsClient, shared by all worker threads.
+        operation: Client method name, "analyze_sentiment" or "detect_language".
+        batches: Iterable of document batches; consumed lazily. Documents
+            that already carry a "result" (see ResultCache.annotate) are not
+            sent.
+        max_in_flight: Maximum number of concurrent requests.
+        scheduler: Optional RetryScheduler pacing requests and retrying
+            throttled requests and transiently failed documents.
+        cache: Optional ResultCache that successful results are stored in.
+        model_version: Model version to request; the service default otherwise.
+        include_sentences: Keep sentence-level sentiment in the records;
+            leave it out when the output does not need it, as it makes up
+            most of a sentiment result for long documents.
+    """
+    kwargs = {"model_version": model_version} if model_version else {}
+    send_batch = partial(run_batch, client, operation, include_sentences=include_sentences, **kwargs)
+    if scheduler is not None:
+        send_batch = partial(scheduler.run_batch, send_batch)
+
+    def process(batch: List[Dict]) -> List[Dict]:
+        pending = [document for document in batch if "result" not in document]
+        fresh = send_batch(pending) if pending else []
+        if cache is not None:
+            cache.put_many(pending, fresh, operation)
+        fresh = iter(fresh)
+        return [document["result"] if "result" in document else next(fresh) for document in batch]
+
+    for records in ordered_map(process, batches, max_in_flight):
+        yield from records
+
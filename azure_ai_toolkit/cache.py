@@ -0,0 +1,198 @@
+"""
+Persistent, content-addressed cache of Text Analytics results.
+
+Results are stored in a SQLite database keyed by a hash of the normalized
+document text, the operation, the model version and the language hint, so
+re-scoring overlapping text across runs only pays for documents the service
+has not seen. Entries expire after a TTL and the least recently used entries
+are evicted once the cache grows past its size bound.
+
+Access times of hits are recorded in memory and written in one transaction
+every ACCESS_FLUSH_SIZE hits, with every store and on close, so lookups do
+not hold the database's write lock between them; several processes may
+share one cache file.
+
+normalize_text is also what preprocess uses for deduplication, so cache keys
+and deduplication keys cannot drift apart.
+"""
+
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+import unicodedata
+from typing import Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 1000000
+# Hits whose access times are written together
+ACCESS_FLUSH_SIZE = 256
+
+_WHITESPACE = re.compile(r"\s+")
+# Control and format characters other than whitespace
+_CONTROL = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\x7f\u200b\ufeff]")
+
+
+def normalize_text(text: str) -> str:
+    """Return text in NFC form, without control characters and with collapsed whitespace."""
+    text = _CONTROL.sub("", unicodedata.normalize("NFC", text))
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def cache_key(text: str, operation: str, model_version: str = "latest", language: str = "") -> str:
+    """Return the content address of a document for the given operation."""
+    material = "\0".join((operation, model_version, language or "", normalize_text(text)))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """A thread-safe SQLite result cache with TTL expiry and LRU eviction."""
+
+    def __init__(
+        self,
+        path: str,
+        ttl: float = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        model_version: str = "latest",
+        require_sentences: bool = True,
+    ):
+        """
+        Args:
+            path: SQLite database file; created if missing.
+            ttl: Seconds after which an entry is no longer served.
+            max_entries: Number of entries kept before evicting the least
+                recently used ones.
+            model_version: Model version the cached results were produced with.
+            require_sentences: Whether sentiment records must carry
+                sentence-level results; records stored by runs that left
+                them out are then treated as misses.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.model_version = model_version
+        self.require_sentences = require_sentences
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        # Key -> access time of hits not yet written
+        self._accessed: Dict[str, float] = {}
+
+        import sqlite3
+
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY, record TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+        self._connection.commit()
+        self._size = self._connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def key(self, document: Dict, operation: str) -> str:
+        return cache_key(document["text"], operation, self.model_version, document.get("language", ""))
+
+    def get(self, document: Dict, operation: str) -> Optional[Dict]:
+        """
+        Return the cached record for a document, or None on a miss.
+
+        The record's "id" is rewritten to the document's id, since identical
+        text may appear under different ids.
+        """
+        key = self.key(document, operation)
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT record, created FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            record = json.loads(row[0]) if row is not None and row[1] + self.ttl >= now else None
+            needs_sentences = self.require_sentences and operation == "analyze_sentiment"
+            if record is not None and needs_sentences and "sentences" not in record:
+                # Stored without sentence-level results; the service has to be asked again
+                record = None
+            if record is None:
+                self.stats["misses"] += 1
+                return None
+            self._accessed[key] = now
+            if len(self._accessed) >= ACCESS_FLUSH_SIZE:
+                self._flush_accessed()
+                self._connection.commit()
+            self.stats["hits"] += 1
+        record["id"] = document["id"]
+        return record
+
+    def put_many(self, documents: List[Dict], records: List[Dict], operation: str):
+        """Store successful records for the given documents; errors are never cached."""
+        now = time.time()
+        rows = [(self.key(document, operation), json.dumps(record, ensure_ascii=False), now, now)
+                for document, record in zip(documents, records) if "error" not in record]
+        if not rows:
+            return
+        with self._lock:
+            # Before evicting, so recent hits are not taken for the least recently used
+            self._flush_accessed()
+            # Only rows that were not there yet count towards the size; the rest are overwritten
+            added = self._connection.executemany(
+                "INSERT OR IGNORE INTO results (key, record, created, accessed) VALUES (?, ?, ?, ?)", rows
+            ).rowcount
+            if added < len(rows):
+                self._connection.executemany(
+                    "UPDATE results SET record = ?, created = ?, accessed = ? WHERE key = ?",
+                    [(record, created, accessed, key) for key, record, created, accessed in rows],
+                )
+            self.stats["stores"] += len(rows)
+            self._size += added
+            if self._size > self.max_entries:
+                self._evict(now)
+            self._connection.commit()
+
+    def _flush_accessed(self):
+        # Within the caller's transaction; the caller commits
+        if self._accessed:
+            self._connection.executemany(
+                "UPDATE results SET accessed = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._accessed.items()],
+            )
+            self._accessed.clear()
+
+    def _evict(self, now: float):
+        # Drop expired entries first, then the least recently used down to 90% of the bound
+        self._connection.execute("DELETE FROM results WHERE created < ?", (now - self.ttl,))
+        self._size = self._connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        excess = self._size - int(self.max_entries * 0.9)
+        if excess > 0:
+            self._connection.execute(
+                "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY accessed LIMIT ?)",
+                (excess,),
+            )
+            self._size -= excess
+            self.stats["evictions"] += excess
+            logger.info("Evicted %d least recently used cache entries", excess)
+
+    def annotate(self, documents: Iterable[Dict], operation: str) -> Iterator[Dict]:
+        """
+        Look documents up before batching.
+
+        Yields each document; hits carry their cached record under a "result"
+        key, which the batching and bulk helpers treat as already answered.
+        Documents already answered are not looked up.
+        """
+        for document in documents:
+            if "result" in document:
+                yield document
+                continue
+            record = self.get(document, operation)
+            if record is not None:
+                document = dict(document, result=record)
+            yield document
+
+    def close(self):
+        with self._lock:
+            self._flush_accessed()
+            self._connection.commit()
+            self._connection.close()
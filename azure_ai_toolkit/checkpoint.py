@@ -0,0 +1,224 @@
+"""
+Checkpointed, resumable bulk runs with exactly-once output.
+
+Results are appended to the output file (JSON Lines or CSV) in input
+order. After every fully written batch, and whenever the run stops, the
+output is fsync'd and a checkpoint (``<output>.checkpoint.json``) is atomically replaced with the
+input offset and output size after that batch. A rerun with the same input
+and output truncates anything written after that checkpoint and continues
+reading the input from the recorded offset, so every document appears in
+the output exactly once and documents of committed batches are never sent
+(or billed) again.
+
+Only the batches that were in flight when the process died, and the one
+being written, are resent; with a result cache, those that had already
+returned are served from the cache. A checkpoint interval can be set to
+save fsyncs on fast runs, at the cost of also resending the batches
+written since the last checkpoint. The checkpoint is removed once the run
+completes.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from azure_ai_toolkit import batching, bulk, writers
+from azure_ai_toolkit.cache import ResultCache
+from azure_ai_toolkit.langid import LocalLanguageDetector
+from azure_ai_toolkit.memory import MemoryCeiling
+from azure_ai_toolkit.preprocess import Preprocessor
+from azure_ai_toolkit.throttling import RetryScheduler
+
+logger = logging.getLogger(__name__)
+
+# Checkpoint after every batch, so no answered document is billed twice
+DEFAULT_CHECKPOINT_INTERVAL = 0.0
+
+
+def checkpoint_path(output_path: str) -> str:
+    """Return the checkpoint file used for an output file."""
+    return output_path + ".checkpoint.json"
+
+
+def _fingerprint(path: str) -> List[int]:
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _save(path: str, state: Dict):
+    # Write, fsync and rename so a crash never leaves a torn checkpoint
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".checkpoint-")
+    with os.fdopen(fd, "w") as checkpoint_file:
+        json.dump(state, checkpoint_file)
+        checkpoint_file.flush()
+        os.fsync(checkpoint_file.fileno())
+    os.replace(temp_path, path)
+
+
+def load_checkpoint(path: str, expected: Dict) -> Optional[Dict]:
+    """Return the checkpoint at path if it was written for the expected run."""
+    try:
+        with open(path, "r") as checkpoint_file:
+            state = json.load(checkpoint_file)
+    except (OSError, ValueError):
+        return None
+    if any(state.get(key) != value for key, value in expected.items()):
+        logger.warning("Ignoring checkpoint %s written for a different input or operation", path)
+        return None
+    return state
+
+
+def run_checkpointed(
+    client,
+    operation: str,
+    input_path: str,
+    output_path: str,
+    input_format: Optional[str] = None,
+    max_in_flight: int = 1,
+    scheduler: Optional[RetryScheduler] = None,
+    cache: Optional[ResultCache] = None,
+    model_version: Optional[str] = None,
+    checkpoint_interval: float = DEFAULT_CHECKPOINT_INTERVAL,
+    language_detector: Optional[LocalLanguageDetector] = None,
+    output_format: str = "jsonl",
+    include_sentences: bool = False,
+    preprocessor: Optional[Preprocessor] = None,
+    memory_ceiling: Optional[MemoryCeiling] = None,
+) -> Dict:
+    """
+    Run a bulk operation from an input file into an output file, resumably.
+
+    Args:
+        client: A TextAnalyticsClient (or LazyClient).
+        operation: "analyze_sentiment" or "detect_language".
+        input_path: Input file; stdin cannot be resumed.
+        output_path: Output file, appended to across resumed runs.
+        input_format: As for batching.read_documents.
+        max_in_flight: Maximum number of concurrent requests.
+        scheduler: Optional RetryScheduler, as for bulk.run_bulk.
+        cache: Optional ResultCache, as for bulk.run_bulk.
+        model_version: Model version to request.
+        checkpoint_interval: Minimum seconds between checkpoints; batches
+            written since the last checkpoint are resent after a crash. By
+            default every batch is checkpointed.
+        language_detector: Optional local language pre-detection, as for
+            bulk.prepare_documents.
+        output_format: "jsonl" or "csv"; Parquet files cannot be appended to.
+        include_sentences: Also write sentence-level sentiment.
+        preprocessor: Optional normalization, deduplication and chunking, as
+            for bulk.prepare_documents. Checkpoints are only taken between
+            documents, never between the chunks of one.
+        memory_ceiling: Optional MemoryCeiling shrinking batches while the
+            process is above it, as for batching.iter_batches.
+
+    Returns:
+        A dict with the total record "count" across all runs and the line
+        the run "resumed_from", or None for a fresh run.
+    """
+    state_path = checkpoint_path(output_path)
+    expected = {
+        "input": os.path.abspath(input_path),
+        "fingerprint": _fingerprint(input_path),
+        "input_format": input_format or batching.guess_input_format(input_path),
+        "operation": operation,
+        "model_version": model_version,
+        "output_format": output_format,
+        "include_sentences": include_sentences,
+        "preprocess": preprocessor is not None,
+    }
+    if not writers.WRITERS[output_format].resumable:
+        raise ValueError(f"{output_format} output cannot be checkpointed")
+    state = load_checkpoint(state_path, expected) if os.path.exists(output_path) else None
+    resumed_from = None
+    if state is None:
+        state = dict(expected, offset=0, line=1, output_size=0, records=0, batches=0, last_batch_ids=[])
+        open(output_path, "w").close()
+    else:
+        resumed_from = state["line"]
+        logger.info("Resuming at line %d after %d records", state["line"], state["records"])
+        # Drop records written after the last checkpoint; they are redone below
+        os.truncate(output_path, state["output_size"])
+
+    documents: Iterable[Dict] = batching.read_document_range(
+        input_path, state["offset"], expected["fingerprint"][0], state["line"], input_format, positions=True
+    )
+    documents = bulk.prepare_documents(documents, operation, cache, language_detector, preprocessor)
+
+    # Batches in the order their records will come back, with their sizes
+    submitted: Deque[Tuple[int, Dict]] = deque()
+
+    def track(batches: Iterator[List[Dict]]) -> Iterator[List[Dict]]:
+        for batch in batches:
+            submitted.append((len(batch), batch))
+            yield batch
+
+    batches = track(batching.iter_batches(documents, max_documents=batching.MAX_DOCUMENTS_PER_BATCH[operation],
+                                          memory_ceiling=memory_ceiling))
+    consumed = 0
+
+    def count(records: Iterator[Dict]) -> Iterator[Dict]:
+        nonlocal consumed
+        for record in records:
+            consumed += 1
+            yield record
+
+    records = count(bulk.run_bulk(client, operation, batches, max_in_flight, scheduler, cache, model_version,
+                                  include_sentences))
+    if preprocessor is not None:
+        records = preprocessor.finish(records)
+
+    with open(output_path, "ab") as output:
+        writer = writers.open_writer(output, output_format, operation, include_sentences)
+        if not state["output_size"]:
+            state["output_size"] = writer.write_header()
+        committed = dict(state)
+        last_checkpoint = time.monotonic()
+
+        def commit():
+            writer.flush()
+            os.fsync(output.fileno())
+            _save(state_path, committed)
+
+        output_size = committed["output_size"]
+        records_before = committed["records"]
+        # Service records of the completed batches
+        settled = 0
+        try:
+            for record in records:
+                output_size += writer.write(record)
+                if preprocessor is not None and preprocessor.pending:
+                    # Part of a chunked document is still to come
+                    continue
+                completed = 0
+                while submitted and consumed >= settled + submitted[0][0]:
+                    size, batch = submitted.popleft()
+                    settled += size
+                    completed += 1
+                if not completed:
+                    continue
+                # Every record of the batch is written; chunks carry the
+                # position after their whole document
+                offset, line = batch[-1]["position"]
+                committed.update(
+                    offset=offset, line=line, output_size=output_size,
+                    records=records_before + writer.count, batches=committed["batches"] + completed,
+                    last_batch_ids=[document["id"] for document in batch],
+                )
+                if time.monotonic() - last_checkpoint >= checkpoint_interval:
+                    commit()
+                    last_checkpoint = time.monotonic()
+        except BaseException:
+            # Keep the progress of fully written batches for the rerun
+            commit()
+            raise
+        writer.close()
+        os.fsync(output.fileno())
+
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    return {"count": committed["records"], "resumed_from": resumed_from}
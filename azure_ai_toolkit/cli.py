@@ -0,0 +1,482 @@
+"""
+Command line interface shared by the sentiment analysis scripts.
+
+The Terraform and Bicep deployments store their configuration and secrets
+differently, but analyze text the same way. Each script only loads its
+configuration and retrieves the AI Services credentials from Key Vault, and
+hands that over to main() here, which runs one of:
+
+- bulk mode (--input): every line of a file or stdin, checkpointed when
+  writing to a file, or split between --processes worker processes;
+- worker mode (--spool): every job file dropped into a spool directory,
+  until SIGTERM;
+- otherwise the script's own interactive mode.
+
+A credential loader is called with (args, on_rotation) and returns the
+(endpoint, key) pairs of the AI Services resources, calling on_rotation with
+(name, value) when a Key Vault secret is later found to have changed. It is
+only called when credentials are needed: on the first cache miss of a bulk
+run, and never with --endpoint.
+
+Only what the argument parser needs is imported up front. Each mode imports
+the rest of the toolkit when it starts, so `--help` does not load the
+process pool of the sharded mode, the spool of the worker or the bulk
+pipeline.
+"""
+
+import argparse
+import atexit
+import contextlib
+import functools
+import logging
+import os
+import signal
+import sys
+from typing import Callable, List, Optional, Tuple
+
+from azure_ai_toolkit import batching, endpoints, metrics, writers
+from azure_ai_toolkit.clients import get_text_analytics_client, discard_clients, LazyClient, DEFAULT_POOL_SIZE
+from azure_ai_toolkit.cache import ResultCache, DEFAULT_TTL_SECONDS, DEFAULT_MAX_ENTRIES
+from azure_ai_toolkit.throttling import RetryScheduler, TIER_REQUESTS_PER_SECOND
+from azure_ai_toolkit.memory import MemoryCeiling
+
+CredentialLoader = Callable[[argparse.Namespace, Optional[Callable[[str, str], None]]], List[Tuple[str, str]]]
+
+BANNER = "=== Azure AI Services Sentiment Analysis ({}) ==="
+
+
+def analyze_sentiment_bulk(client, input_path, input_format, writer, concurrency=1, scheduler=None,
+                           cache=None, model_version=None, language_detector=None, preprocessor=None,
+                           memory_ceiling=None):
+    """
+    Performs sentiment analysis on every document of a file (or stdin) in
+    service-sized batches, with up to `concurrency` batches in flight,
+    streaming the results through writer in input order.
+    Documents found in the result cache are answered without a service call,
+    languages detected locally are sent as hints, and with a preprocessor
+    repeated texts are sent once and oversized documents in chunks.
+    Sentence-level results are only kept when the writer outputs them, and
+    with a memory ceiling batches shrink while the process is above it
+    """
+    from azure_ai_toolkit import bulk
+
+    documents = batching.read_documents(input_path, input_format)
+    documents = bulk.prepare_documents(documents, "analyze_sentiment", cache, language_detector, preprocessor)
+    batches = batching.iter_batches(
+        documents,
+        max_documents=batching.MAX_DOCUMENTS_PER_BATCH["analyze_sentiment"],
+        memory_ceiling=memory_ceiling
+    )
+    records = bulk.run_bulk(client, "analyze_sentiment", batches, concurrency, scheduler,
+                            cache, model_version, writer.include_sentences)
+    if preprocessor:
+        records = preprocessor.finish(records)
+    return writers.write_records(records, writer)
+
+
+def build_parser():
+    """
+    Build the command line parser for the interactive, bulk and worker modes
+    """
+    parser = argparse.ArgumentParser(description='Azure AI Services sentiment analysis.')
+    parser.add_argument('--input', help='Analyze every line of this file in bulk ("-" for stdin).')
+    parser.add_argument('--input-format', choices=batching.INPUT_FORMATS,
+                        help='Input format; inferred from the file extension by default.')
+    parser.add_argument('--output', default='-', help='File for bulk results (default: stdout).')
+    parser.add_argument('--output-format', choices=writers.OUTPUT_FORMATS,
+                        help='Result format; inferred from the --output extension, JSONL by default.')
+    parser.add_argument('--sentences', action='store_true',
+                        help='Also write sentence-level sentiment for each document.')
+    parser.add_argument('--key-vault-name', help='Key Vault holding the AI Services credentials.')
+    parser.add_argument('--ai-services-name', help='Name of the AI Services resource.')
+    parser.add_argument('--non-interactive', action='store_true',
+                        help='Never prompt for missing configuration (the default without a terminal).')
+    parser.add_argument('--endpoint', action='append',
+                        help='Use this AI Services endpoint (key from AI_SERVICES_KEY) instead of Key Vault; '
+                             'repeat to balance bulk requests across several resources, with one key for all '
+                             'or comma-separated keys in the same order.')
+    parser.add_argument('--resources', type=int, default=1,
+                        help='Number of AI Services resources whose credentials are stored in Key Vault '
+                             '(numbered -2, -3, ... after the first); bulk requests are balanced across them.')
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='Maximum number of batches in flight in bulk mode (default: 4).')
+    parser.add_argument('--tier', choices=sorted(TIER_REQUESTS_PER_SECOND),
+                        help='Pricing tier of the AI Services resources, used to pace bulk requests.')
+    parser.add_argument('--requests-per-second', type=float,
+                        help='Pace bulk requests to this rate per resource (overrides --tier).')
+    parser.add_argument('--model-version', help='Sentiment model version to request (default: latest).')
+    parser.add_argument('--cache', help='SQLite file caching results across bulk runs.')
+    parser.add_argument('--cache-ttl', type=float, default=DEFAULT_TTL_SECONDS,
+                        help='Seconds a cached result stays valid (default: 7 days).')
+    parser.add_argument('--cache-max-entries', type=int, default=DEFAULT_MAX_ENTRIES,
+                        help='Number of cached results kept before evicting the least recently used.')
+    parser.add_argument('--local-language-detection', action='store_true',
+                        help='Detect clear-cut languages locally and send them as hints with each document.')
+    parser.add_argument('--preprocess', action='store_true',
+                        help='Normalize text, send repeated texts once and split documents over the '
+                             'service character limit into chunks whose scores are aggregated.')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='Split a bulk --input file between this many worker processes (requires --output).')
+    parser.add_argument('--max-memory-mb', type=float,
+                        help='Shrink bulk batches while the resident memory of a process exceeds this many MB.')
+    parser.add_argument('--spool',
+                        help='Run as a worker analyzing every job file placed in SPOOL/incoming until SIGTERM.')
+    parser.add_argument('--poll-interval', type=float, default=1.0,
+                        help='Seconds between spool checks when no job is pending (default: 1).')
+    parser.add_argument('--metrics', action='store_true',
+                        help='Print per-stage timings and request counters to stderr at exit.')
+    parser.add_argument('--metrics-port', type=int,
+                        help='In worker mode, serve Prometheus metrics on this port at /metrics.')
+    parser.add_argument('--metrics-host', default=metrics.DEFAULT_METRICS_HOST,
+                        help='Interface to serve metrics on (default: %(default)s; 0.0.0.0 for all interfaces).')
+    return parser
+
+
+def parse_args(argv=None):
+    """
+    Parse command line arguments for the interactive, bulk and worker modes
+    """
+    return build_parser().parse_args(argv)
+
+
+def resolve_credentials(args, load_credentials, on_rotation=None):
+    """
+    Return (endpoint, key) pairs of the AI Services resources from the command line,
+    or from Key Vault through load_credentials, calling on_rotation when a Key Vault
+    secret later changes
+    """
+    if args.endpoint:
+        try:
+            return endpoints.pair_keys(args.endpoint, os.environ.get('AI_SERVICES_KEY', ''))
+        except ValueError as e:
+            print(f"❌ Error pairing AI_SERVICES_KEY with --endpoint: {str(e)}", file=sys.stderr)
+            sys.exit(1)
+    return load_credentials(args, on_rotation)
+
+
+def resource_count(args):
+    """
+    Return how many AI Services resources bulk requests are balanced across
+    """
+    return len(args.endpoint) if args.endpoint else args.resources
+
+
+def client_factory(args, credentials):
+    """
+    Return a picklable factory for the shared client of a single resource,
+    or for a pool balancing requests across several. Retries are handled by
+    the scheduler, so the SDK's own retry policy is disabled.
+    """
+    client_kwargs = {'pool_size': max(args.concurrency, DEFAULT_POOL_SIZE), 'retry_total': 0}
+    if len(credentials) == 1:
+        endpoint, key = credentials[0]
+        return functools.partial(get_text_analytics_client, endpoint, key, **client_kwargs)
+    return functools.partial(endpoints.create_pool, credentials, requests_per_second=args.requests_per_second,
+                             tier=args.tier, **client_kwargs)
+
+
+def create_bulk_resources(args, load_credentials, status_stream):
+    """
+    Build the client, request scheduler, optional result cache and optional
+    local language detector shared by bulk and worker mode
+    """
+    def connect():
+        # Resolved on the first cache miss only, so runs answered entirely from
+        # the cache never contact Key Vault or load the Azure SDK
+        try:
+            with contextlib.redirect_stdout(status_stream):
+                credentials = resolve_credentials(args, load_credentials, on_rotation=reconnect)
+        except SystemExit:
+            # The cause was printed above; fail this run or worker job, not the
+            # whole worker, and try again on the next request
+            raise RuntimeError("Could not retrieve the AI Services credentials") from None
+        client = client_factory(args, credentials)()
+        if isinstance(client, endpoints.EndpointPool):
+            metrics.REGISTRY.add_stats(client.stats, 'endpoint_')
+        return client
+
+    def reconnect(name, value):
+        # A rotated key takes effect with the next request instead of failing every one with 401
+        print(f"🔄 Secret '{name}' changed in Key Vault, reconnecting with the new value", file=status_stream)
+        discard_clients()
+        lazy_client.reset()
+
+    if args.endpoint:
+        # Needs no network, so a key mismatch is reported before any work starts
+        resolve_credentials(args, load_credentials)
+    scheduler = RetryScheduler(
+        requests_per_second=args.requests_per_second,
+        tier=args.tier,
+        max_concurrency=args.concurrency,
+        resources=resource_count(args)
+    )
+    cache = None
+    if args.cache:
+        cache = ResultCache(args.cache, ttl=args.cache_ttl, max_entries=args.cache_max_entries,
+                            model_version=args.model_version or 'latest', require_sentences=args.sentences)
+    detector = None
+    if args.local_language_detection:
+        from azure_ai_toolkit.langid import LocalLanguageDetector
+
+        detector = LocalLanguageDetector()
+    metrics.REGISTRY.add_stats(scheduler.stats)
+    if cache:
+        metrics.REGISTRY.add_stats(cache.stats, 'cache_')
+    if detector:
+        metrics.REGISTRY.add_stats(detector.stats, 'language_')
+    lazy_client = LazyClient(connect)
+    return lazy_client, scheduler, cache, detector
+
+
+def create_memory_ceiling(args):
+    """
+    Build the memory ceiling of a bulk or worker run, if --max-memory-mb is set
+    """
+    ceiling = MemoryCeiling.from_megabytes(args.max_memory_mb)
+    if ceiling:
+        metrics.REGISTRY.add_stats(ceiling.stats, 'memory_')
+    return ceiling
+
+
+def print_bulk_stats(scheduler, cache, detector, status_stream, preprocess_stats=None, client=None,
+                     memory_ceiling=None):
+    """
+    Print request, retry, endpoint, cache, local language detection,
+    preprocessing and memory statistics of a bulk or worker run
+    """
+    print(f"   Requests: {scheduler.stats['requests']}, throttled: {scheduler.stats['throttled']}, "
+          f"retried requests: {scheduler.stats['retried_requests']}, "
+          f"retried documents: {scheduler.stats['retried_documents']}", file=status_stream)
+    pool = client.built if client is not None else None
+    if isinstance(pool, endpoints.EndpointPool):
+        print(f"   Failovers between endpoints: {pool.stats['failovers']}", file=status_stream)
+        for line in pool.describe():
+            print(f"   {line}", file=status_stream)
+    if cache:
+        print(f"   Cache hits: {cache.stats['hits']}, misses: {cache.stats['misses']}", file=status_stream)
+    if detector:
+        print_language_stats(detector.stats, status_stream)
+    if preprocess_stats:
+        print_preprocess_stats(preprocess_stats, status_stream)
+    if memory_ceiling:
+        print(f"   Peak resident memory: {memory_ceiling.peak_rss / (1 << 20):.0f} MB "
+              f"(ceiling {memory_ceiling.limit_bytes / (1 << 20):.0f} MB), "
+              f"batches shrunk {memory_ceiling.stats['shrinks']} times", file=status_stream)
+
+
+def print_language_stats(stats, status_stream=sys.stdout):
+    """
+    Print how many language detections were answered locally
+    """
+    total = stats['local'] + stats['service']
+    fraction = stats['local'] / total if total else 0.0
+    print(f"   Languages detected locally: {stats['local']} of {total} documents "
+          f"({fraction:.0%} of detect_language calls avoided)", file=status_stream)
+
+
+def print_preprocess_stats(stats, status_stream=sys.stdout):
+    """
+    Print how many documents preprocessing normalized, deduplicated and chunked
+    """
+    print(f"   Preprocessed: {stats['documents']} documents, {stats['normalized']} normalized, "
+          f"{stats['duplicates']} duplicates not sent, "
+          f"{stats['chunked']} oversized documents split into {stats['chunks']} chunks", file=status_stream)
+
+
+def print_metrics_summary():
+    """
+    Print the time spent in each stage and the request counters of this run
+    """
+    print("📈 Metrics (stage, passes, total time, p50, p99):", file=sys.stderr)
+    for line in metrics.REGISTRY.summary():
+        print(f"   {line}", file=sys.stderr)
+
+
+def run_bulk(args, load_credentials, banner=True):
+    """
+    Bulk mode: stream documents from --input and write the results to --output
+    """
+    from azure_ai_toolkit import checkpoint
+    from azure_ai_toolkit.preprocess import Preprocessor
+
+    # Keep stdout clean for results when they are written there
+    status_stream = sys.stderr if args.output == '-' else sys.stdout
+    if banner:
+        print(BANNER.format("bulk"), file=status_stream)
+
+    client, scheduler, cache, detector = create_bulk_resources(args, load_credentials, status_stream)
+    memory_ceiling = create_memory_ceiling(args)
+    preprocessor = Preprocessor('analyze_sentiment') if args.preprocess else None
+    if preprocessor:
+        metrics.REGISTRY.add_stats(preprocessor.stats, 'preprocess_')
+    output_format = args.output_format or writers.guess_output_format(args.output)
+    # Runs from a file into a regular file (not stdout or /dev/null) are
+    # checkpointed; rerunning after a failure resumes. Parquet cannot be appended to.
+    output_is_file = args.output != '-' and (os.path.isfile(args.output) or not os.path.exists(args.output))
+    if args.input != '-' and output_is_file and writers.WRITERS[output_format].resumable:
+        # SIGTERM stops like Ctrl+C, so the last written batches are recorded
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        try:
+            result = checkpoint.run_checkpointed(
+                client, 'analyze_sentiment', args.input, args.output, args.input_format,
+                args.concurrency, scheduler, cache, args.model_version,
+                language_detector=detector, output_format=output_format,
+                include_sentences=args.sentences, preprocessor=preprocessor,
+                memory_ceiling=memory_ceiling
+            )
+        except KeyboardInterrupt:
+            print("⏸️ Interrupted; rerun the same command to resume from the last checkpoint", file=sys.stderr)
+            sys.exit(130)
+        except Exception as e:
+            print(f"❌ Error analyzing sentiment: {str(e)}", file=sys.stderr)
+            print("   Rerun the same command to resume from the last checkpoint", file=sys.stderr)
+            sys.exit(1)
+        finally:
+            if cache:
+                cache.close()
+        if result['resumed_from']:
+            print(f"⏩ Resumed from line {result['resumed_from']}", file=status_stream)
+        count = result['count']
+    else:
+        output = sys.stdout.buffer if args.output == '-' else open(args.output, 'wb')
+        try:
+            writer = writers.open_writer(output, output_format, 'analyze_sentiment', args.sentences)
+            count = analyze_sentiment_bulk(client, args.input, args.input_format, writer,
+                                           args.concurrency, scheduler, cache, args.model_version,
+                                           detector, preprocessor, memory_ceiling)
+        except Exception as e:
+            print(f"❌ Error analyzing sentiment: {str(e)}", file=sys.stderr)
+            sys.exit(1)
+        finally:
+            if output is not sys.stdout.buffer:
+                output.close()
+            if cache:
+                cache.close()
+    print(f"✅ Analyzed {count} documents", file=status_stream)
+    print_bulk_stats(scheduler, cache, detector, status_stream, preprocessor and preprocessor.stats, client,
+                     memory_ceiling)
+
+
+def run_sharded_bulk(args, load_credentials, banner=True):
+    """
+    Sharded bulk mode: split --input between --processes worker processes,
+    resuming the shards an interrupted run already finished
+    """
+    from azure_ai_toolkit import sharding
+
+    if banner:
+        print(BANNER.format("bulk"))
+    if args.input == '-' or args.output == '-':
+        print("❌ --processes needs an --input file and an --output file", file=sys.stderr)
+        sys.exit(1)
+    # Stop like Ctrl+C on SIGTERM, so shards in progress are finished first
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    # Credentials are resolved once here; every process builds its own client
+    credentials = resolve_credentials(args, load_credentials)
+    try:
+        result = sharding.run_sharded(
+            client_factory(args, credentials), 'analyze_sentiment', args.input, args.output, args.processes,
+            input_format=args.input_format, concurrency=args.concurrency,
+            requests_per_second=args.requests_per_second, tier=args.tier, resources=len(credentials),
+            cache_path=args.cache, cache_ttl=args.cache_ttl,
+            cache_max_entries=args.cache_max_entries, model_version=args.model_version,
+            local_language_detection=args.local_language_detection, preprocess=args.preprocess,
+            output_format=args.output_format or writers.guess_output_format(args.output),
+            include_sentences=args.sentences, max_memory_mb=args.max_memory_mb
+        )
+    except KeyboardInterrupt:
+        print("⏸️ Interrupted; rerun the same command to resume the unfinished shards", file=sys.stderr)
+        sys.exit(130)
+    except Exception as e:
+        print(f"❌ Error analyzing sentiment: {str(e)}", file=sys.stderr)
+        print("   Rerun the same command to resume the unfinished shards", file=sys.stderr)
+        sys.exit(1)
+    stats = result['stats']
+    print(f"✅ Analyzed {result['count']} documents with {args.processes} processes"
+          + (f" ({result['resumed']} shards resumed)" if result['resumed'] else ''))
+    print(f"   Requests: {stats['requests']}, throttled: {stats['throttled']}, "
+          f"retried requests: {stats['retried_requests']}, retried documents: {stats['retried_documents']}")
+    if args.cache:
+        print(f"   Cache hits: {stats['hits']}, misses: {stats['misses']}")
+    if args.local_language_detection:
+        print_language_stats(stats)
+    if args.preprocess:
+        print_preprocess_stats(stats)
+
+
+def run_worker(args, load_credentials, banner=True):
+    """
+    Worker mode: keep the client warm and analyze every job file dropped into
+    the --spool directory until SIGTERM, writing one JSONL result file per job
+    """
+    from azure_ai_toolkit import key_vault, spool
+    from azure_ai_toolkit.preprocess import Preprocessor
+
+    # Job progress from the toolkit only; the SDK logs every HTTP request at INFO
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s %(levelname)s %(message)s')
+    logging.getLogger('azure_ai_toolkit').setLevel(logging.INFO)
+    if banner:
+        print(BANNER.format("worker"))
+    client, scheduler, cache, detector = create_bulk_resources(args, load_credentials, sys.stdout)
+    memory_ceiling = create_memory_ceiling(args)
+
+    output_format = args.output_format or 'jsonl'
+    preprocess_stats = {}
+    metrics.REGISTRY.add_stats(preprocess_stats, 'preprocess_')
+
+    def handle_job(job_path, output):
+        writer = writers.open_writer(output, output_format, 'analyze_sentiment', args.sentences)
+        # Duplicates are found within a job
+        preprocessor = Preprocessor('analyze_sentiment') if args.preprocess else None
+        # The client is built once, so look for rotated credentials before every job
+        key_vault.revalidate_secrets()
+        try:
+            return analyze_sentiment_bulk(client, job_path, args.input_format, writer, args.concurrency,
+                                          scheduler, cache, args.model_version, detector, preprocessor,
+                                          memory_ceiling)
+        finally:
+            for name, value in (preprocessor.stats.items() if preprocessor else ()):
+                preprocess_stats[name] = preprocess_stats.get(name, 0) + value
+
+    worker = spool.SpoolWorker(args.spool, handle_job, poll_interval=args.poll_interval,
+                               result_suffix='.' + output_format)
+    worker.install_signal_handlers()
+    metrics.REGISTRY.add_stats(worker.stats, 'spool_')
+    if args.metrics_port is not None:
+        server = metrics.serve_prometheus(args.metrics_port, args.metrics_host)
+        host, port = server.server_address[:2]
+        print(f"📈 Serving metrics at http://{host}:{port}/metrics")
+    print(f"📥 Waiting for jobs in {os.path.join(args.spool, 'incoming')}")
+    try:
+        worker.run()
+    finally:
+        if cache:
+            cache.close()
+    print(f"✅ Processed {worker.stats['jobs']} jobs ({worker.stats['records']} documents), "
+          f"{worker.stats['failed']} failed")
+    print_bulk_stats(scheduler, cache, detector, sys.stdout, preprocess_stats, client, memory_ceiling)
+
+
+def main(load_credentials: CredentialLoader, run_interactive: Callable[[argparse.Namespace], None],
+         banner: bool = True, argv=None):
+    """
+    Run the mode the command line asks for.
+
+    Args:
+        load_credentials: The script's credential loader, see the module docstring.
+        run_interactive: Called with the parsed arguments when neither
+            --input nor --spool is given.
+        banner: Print a banner naming the mode before a bulk or worker run.
+        argv: Command line arguments; sys.argv[1:] by default.
+    """
+    args = parse_args(argv)
+    if args.metrics:
+        atexit.register(print_metrics_summary)
+    if args.spool:
+        run_worker(args, load_credentials, banner)
+    elif args.input and args.processes > 1:
+        run_sharded_bulk(args, load_credentials, banner)
+    elif args.input:
+        run_bulk(args, load_credentials, banner)
+    else:
+        run_interactive(args)
@@ -0,0 +1,147 @@
+"""
+Process-wide, long-lived Text Analytics clients.
+
+Constructing a TextAnalyticsClient per call also builds a new HTTP pipeline
+and connection pool, so every request pays for a fresh TCP (and TLS)
+handshake. The factory below keeps one client per endpoint and key for the
+lifetime of the process, backed by a ``requests`` session whose connection
+pool is sized for the expected concurrency.
+
+The Azure SDK is imported on first use only, so that runs which never reach
+the service (``--help``, cache hits) do not pay for loading it.
+
+Client construction and the time each request spends on the network are
+recorded in azure_ai_toolkit.metrics.
+"""
+
+import atexit
+import threading
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Tuple
+
+from azure_ai_toolkit import metrics
+
+if TYPE_CHECKING:
+    # The SDK is loaded on first use only
+    from azure.ai.textanalytics import TextAnalyticsClient
+
+DEFAULT_POOL_SIZE = 10
+
+_clients: Dict[Tuple, "TextAnalyticsClient"] = {}
+_lock = threading.Lock()
+
+
+def _build_transport(pool_size: int, keep_alive: bool):
+    import requests
+    from requests.adapters import HTTPAdapter
+    from azure.core.pipeline.transport import RequestsTransport
+
+    class TimedTransport(RequestsTransport):
+        def send(self, request, **kwargs):
+            metrics.mark_sent()
+            try:
+                return super().send(request, **kwargs)
+            finally:
+                metrics.mark_received()
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if not keep_alive:
+        session.headers["Connection"] = "close"
+    return TimedTransport(session=session, session_owner=True)
+
+
+def get_text_analytics_client(
+    endpoint: str,
+    key: str,
+    pool_size: int = DEFAULT_POOL_SIZE,
+    keep_alive: bool = True,
+    **client_kwargs,
+) -> "TextAnalyticsClient":
+    """
+    Return the shared TextAnalyticsClient for an endpoint, creating it once.
+
+    Args:
+        endpoint: AI Services endpoint URL.
+        key: API key for the endpoint.
+        pool_size: Maximum number of pooled connections to the endpoint;
+            should be at least the number of concurrent requests.
+        keep_alive: Reuse connections between requests. Disable only to
+            measure the cost of connection setup.
+        **client_kwargs: Extra TextAnalyticsClient options, e.g. retry_total.
+
+    Returns:
+        A client that is safe to share between threads.
+    """
+    cache_key = (endpoint, key, pool_size, keep_alive, tuple(sorted(client_kwargs.items())))
+    with _lock:
+        client = _clients.get(cache_key)
+        if client is None:
+            with metrics.stage("client_construction"):
+                from azure.ai.textanalytics import TextAnalyticsClient
+                from azure.core.credentials import AzureKeyCredential
+
+                client = TextAnalyticsClient(
+                    endpoint=endpoint,
+                    credential=AzureKeyCredential(key),
+                    transport=_build_transport(pool_size, keep_alive),
+                    **client_kwargs,
+                )
+            _clients[cache_key] = client
+        return client
+
+
+class LazyClient:
+    """
+    Stands in for a client that is only built when first used.
+
+    The factory typically resolves credentials and calls
+    get_text_analytics_client, so a run that never calls the service
+    never loads the SDK or contacts Key Vault.
+    """
+
+    def __init__(self, factory: Callable[[], "TextAnalyticsClient"]):
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def built(self) -> Optional["TextAnalyticsClient"]:
+        """The real client if it has been built, without building it."""
+        return self._client
+
+    def get(self) -> "TextAnalyticsClient":
+        """Return the real client, building it on the first call."""
+        with self._lock:
+            if self._client is None:
+                self._client = self._factory()
+            return self._client
+
+    def reset(self):
+        """Forget the real client, so the next call builds a new one, e.g. with a rotated key."""
+        with self._lock:
+            self._client = None
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+def discard_clients():
+    """
+    Forget every shared client, so the next get_text_analytics_client call builds a new one.
+
+    Used when credentials change; the old clients are not closed, since
+    requests may still be in flight on them.
+    """
+    with _lock:
+        _clients.clear()
+
+
+@atexit.register
+def close_clients():
+    """Close every shared client and its connection pool."""
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
@@ -0,0 +1,231 @@
+"""
+Coalescing of documents that arrive one at a time into batched requests.
+
+Interactive and piped input produces one document per line. Sending each
+line as its own request costs a round trip and a billed call per line,
+while waiting for full batches (as batching.iter_batches does) holds back
+the first results until a thousand lines have arrived. A Coalescer sits in
+between: the first document to arrive opens a short window, every document
+arriving within it joins the same request, and the request is sent when the
+window closes or the batch is full.
+
+Input is read on a background thread and requests run on a thread pool, so
+an asyncio loop keeps reading while requests are in flight; results are
+handed out in input order as soon as they are available.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set, TextIO
+
+from azure_ai_toolkit import batching, bulk
+from azure_ai_toolkit.cache import ResultCache
+from azure_ai_toolkit.langid import LocalLanguageDetector
+from azure_ai_toolkit.throttling import RetryScheduler
+
+DEFAULT_WINDOW_SECONDS = 0.05
+# Lines read ahead of the documents being coalesced
+DEFAULT_MAX_BUFFERED_LINES = 1000
+
+
+class Coalescer:
+    """Groups documents submitted within a time window into one request."""
+
+    def __init__(
+        self,
+        send_batch: Callable[[List[Dict]], List[Dict]],
+        window: float = DEFAULT_WINDOW_SECONDS,
+        max_documents: int = batching.MAX_DOCUMENTS_PER_BATCH["detect_language"],
+        max_characters: int = batching.MAX_CHARACTERS_PER_BATCH,
+        max_in_flight: int = 4,
+    ):
+        """
+        Args:
+            send_batch: Sends a list of documents and returns one record per
+                document, in order; called on a worker thread.
+            window: Seconds to wait after the first document of a batch for
+                more documents to join it.
+            max_documents: Documents per request; a full batch is sent at once.
+            max_characters: Total characters per request.
+            max_in_flight: Maximum number of concurrent requests.
+        """
+        self.send_batch = send_batch
+        self.window = window
+        self.max_documents = max_documents
+        self.max_characters = max_characters
+        self.max_in_flight = max_in_flight
+        self.stats = {"documents": 0, "requests": 0}
+        self._batch: List[Dict] = []
+        self._futures: List[asyncio.Future] = []
+        self._characters = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._requests: Set[asyncio.Task] = set()
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="ta-coalesce")
+
+    async def submit(self, document: Dict) -> asyncio.Future:
+        """
+        Queue a document for the next request.
+
+        Documents already carrying a "result" are answered without a request.
+
+        Returns:
+            A future resolving to the document's record.
+        """
+        future = asyncio.get_running_loop().create_future()
+        if "result" in document:
+            future.set_result(document["result"])
+            return future
+        size = len(document["text"])
+        if self._batch and (len(self._batch) >= self.max_documents or self._characters + size > self.max_characters):
+            self.flush()
+        # Backpressure: with every request slot busy and another batch queued, wait for a request to finish
+        while len(self._requests) > self.max_in_flight:
+            await asyncio.wait(self._requests, return_when=asyncio.FIRST_COMPLETED)
+        self._batch.append(document)
+        self._futures.append(future)
+        self._characters += size
+        if len(self._batch) == 1:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self.flush)
+        return future
+
+    def flush(self):
+        """Send the documents queued so far without waiting for the window to close."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._batch:
+            return
+        batch, futures = self._batch, self._futures
+        self._batch, self._futures, self._characters = [], [], 0
+        self.stats["documents"] += len(batch)
+        self.stats["requests"] += 1
+        task = asyncio.ensure_future(self._send(batch, futures))
+        self._requests.add(task)
+        task.add_done_callback(self._requests.discard)
+
+    async def _send(self, batch: List[Dict], futures: List[asyncio.Future]):
+        try:
+            records = await asyncio.get_running_loop().run_in_executor(self._executor, self.send_batch, batch)
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future, record in zip(futures, records):
+            if not future.done():
+                future.set_result(record)
+
+    async def close(self):
+        """Send what is queued and wait for every request to finish."""
+        self.flush()
+        if self._requests:
+            await asyncio.wait(self._requests)
+        self._executor.shutdown(wait=True)
+
+
+async def read_lines(stream: TextIO, max_buffered: int = DEFAULT_MAX_BUFFERED_LINES) -> AsyncIterator[str]:
+    """
+    Yield the lines of a blocking stream such as stdin without blocking the event loop.
+
+    A background thread reads the stream, at most max_buffered lines ahead.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(max_buffered)
+
+    def reader():
+        try:
+            for line in stream:
+                asyncio.run_coroutine_threadsafe(queue.put(line), loop).result()
+        finally:
+            asyncio.run_coroutine_threadsafe(queue.put(None), loop)
+
+    threading.Thread(target=reader, name="coalesce-reader", daemon=True).start()
+    while True:
+        line = await queue.get()
+        if line is None:
+            return
+        yield line
+
+
+async def run_coalesced(
+    client,
+    operation: str,
+    lines: AsyncIterator[str],
+    handle_record: Callable[[Dict], None],
+    window: float = DEFAULT_WINDOW_SECONDS,
+    max_in_flight: int = 4,
+    scheduler: Optional[RetryScheduler] = None,
+    cache: Optional[ResultCache] = None,
+    language_detector: Optional[LocalLanguageDetector] = None,
+    input_format: str = "text",
+) -> Dict[str, int]:
+    """
+    Answer lines as they arrive, coalescing them into as few requests as the window allows.
+
+    Args:
+        client: A TextAnalyticsClient (or endpoints.EndpointPool).
+        operation: "analyze_sentiment" or "detect_language".
+        lines: Input lines, e.g. from read_lines(sys.stdin).
+        handle_record: Called with each record on the event loop, in input
+            order, as soon as it and every record before it are available.
+        window: Seconds lines may wait for others to join their request.
+        max_in_flight: Maximum number of concurrent requests.
+        scheduler: Optional RetryScheduler pacing and retrying requests.
+        cache: Optional ResultCache consulted before and filled after requests.
+        language_detector: Optional LocalLanguageDetector, see bulk.prepare_documents.
+        input_format: "text" or "jsonl", as for batching.read_documents.
+
+    Returns:
+        The number of "documents" answered and of service "requests" made.
+    """
+    send_batch = partial(bulk.run_batch, client, operation)
+    if scheduler is not None:
+        send_batch = partial(scheduler.run_batch, send_batch)
+
+    def process(batch: List[Dict]) -> List[Dict]:
+        records = send_batch(batch)
+        if cache is not None:
+            cache.put_many(batch, records, operation)
+        return records
+
+    coalescer = Coalescer(process, window, batching.MAX_DOCUMENTS_PER_BATCH[operation],
+                          max_in_flight=max_in_flight)
+    pending: asyncio.Queue = asyncio.Queue()
+    count = 0
+
+    async def emit():
+        nonlocal count
+        while True:
+            future = await pending.get()
+            if future is None:
+                return
+            handle_record(await future)
+            count += 1
+
+    emitter = asyncio.ensure_future(emit())
+    line_number = 0
+    try:
+        async for line in lines:
+            line_number += 1
+            document = batching.parse_line(line, line_number, input_format)
+            if document is None:
+                continue
+            for document in bulk.prepare_documents([document], operation, cache, language_detector):
+                pending.put_nowait(await coalescer.submit(document))
+            if emitter.done():
+                # Stop reading once a record could not be produced
+                break
+        pending.put_nowait(None)
+        coalescer.flush()
+        await emitter
+    finally:
+        emitter.cancel()
+        await coalescer.close()
+        # Records behind a failed one are never handled; retrieve their errors so they are not reported again
+        while not pending.empty():
+            future = pending.get_nowait()
+            if future is not None and future.done() and not future.cancelled():
+                future.exception()
+    return {"documents": count, "requests": coalescer.stats["requests"]}
@@ -0,0 +1,206 @@
+"""
+Deployment configuration resolution for the example scripts.
+
+The Key Vault and AI Services names are resolved, per value, from the first
+source that provides them:
+
+1. Explicit overrides (command line flags)
+2. Environment variables (KEY_VAULT_NAME, AI_SERVICES_NAME)
+3. Deployment output files written by the Terraform and Bicep deploy scripts
+4. An interactive prompt, only when attached to a terminal
+
+Resolution never blocks on input() in non-interactive runs; it raises
+ConfigError instead. Values parsed and validated from a file are stored in a
+small cache keyed on the file's path, size and modification time, so
+short-lived workers skip re-parsing and re-validating unchanged files.
+"""
+
+import json
+import os
+import re
+import sys
+import tempfile
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from azure_ai_toolkit import metrics
+
+CONFIG_KEYS = ("KEY_VAULT_NAME", "AI_SERVICES_NAME")
+
+TERRAFORM_OUTPUTS_FILE = "deployment-outputs.json"
+DEPLOYMENT_CONFIG_FILE = "deployment_config.json"
+CACHE_FILE = ".deployment_config.cache.json"
+
+# Azure naming rules: https://learn.microsoft.com/en-us/azure/azure-resource-manager/management/resource-name-rules
+_NAME_PATTERNS = {
+    "KEY_VAULT_NAME": re.compile(r"^[A-Za-z][A-Za-z0-9-]{1,22}[A-Za-z0-9]$"),
+    "AI_SERVICES_NAME": re.compile(r"^[A-Za-z0-9][A-Za-z0-9-]{0,62}[A-Za-z0-9]$"),
+}
+
+
+class ConfigError(Exception):
+    """Raised when the deployment configuration cannot be resolved."""
+
+
+def parse_terraform_outputs(data: Dict) -> Dict[str, str]:
+    """Extract the configuration from `terraform output -json` results."""
+    return {
+        "KEY_VAULT_NAME": data.get("key_vault", {}).get("value", {}).get("name", ""),
+        "AI_SERVICES_NAME": data.get("ai_services", {}).get("value", {}).get("name", ""),
+    }
+
+
+def parse_deployment_config(data: Dict) -> Dict[str, str]:
+    """Extract the configuration from a flat deployment_config.json."""
+    return {key: data.get(key, "") for key in CONFIG_KEYS}
+
+
+PARSERS: Dict[str, Callable[[Dict], Dict[str, str]]] = {
+    TERRAFORM_OUTPUTS_FILE: parse_terraform_outputs,
+    DEPLOYMENT_CONFIG_FILE: parse_deployment_config,
+}
+
+
+def validate_config(config: Dict[str, str]) -> Dict[str, str]:
+    """
+    Check that every value is present and a valid Azure resource name.
+
+    Raises:
+        ConfigError: Naming the first missing or invalid value.
+    """
+    for key in CONFIG_KEYS:
+        value = config.get(key)
+        if not value:
+            raise ConfigError(f"Missing required configuration value: {key}")
+        if not _NAME_PATTERNS[key].match(value):
+            raise ConfigError(f"Invalid {key}: {value!r}")
+    return config
+
+
+def _read_cache(cache_path: str) -> Dict:
+    try:
+        with open(cache_path, "r") as cache_file:
+            return json.load(cache_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_cache(cache_path: str, cache: Dict):
+    # Write atomically so concurrent workers never see a partial file
+    directory = os.path.dirname(os.path.abspath(cache_path))
+    try:
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".config-cache-")
+        with os.fdopen(fd, "w") as cache_file:
+            json.dump(cache, cache_file)
+        os.replace(temp_path, cache_path)
+    except OSError:
+        # The cache is an optimization only
+        pass
+
+
+def load_config_file(path: str, cache_path: Optional[str] = CACHE_FILE) -> Optional[Dict[str, str]]:
+    """
+    Load and validate the configuration from one deployment output file.
+
+    Args:
+        path: File to load; its base name selects the parser.
+        cache_path: Compiled config cache, or None to always parse.
+
+    Returns:
+        The validated configuration, or None if the file does not exist.
+
+    Raises:
+        ConfigError: If the file cannot be parsed or holds invalid values.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+
+    source = os.path.abspath(path)
+    fingerprint = [stat.st_mtime_ns, stat.st_size]
+    cache = _read_cache(cache_path) if cache_path else {}
+    entry = cache.get(source)
+    if entry and entry.get("fingerprint") == fingerprint:
+        return entry["config"]
+
+    parser = PARSERS.get(os.path.basename(path), parse_deployment_config)
+    try:
+        with open(path, "r") as config_file:
+            config = validate_config(parser(json.load(config_file)))
+    except json.JSONDecodeError as e:
+        raise ConfigError(f"Cannot parse {path}: {e}")
+    except ConfigError as e:
+        raise ConfigError(f"{path}: {e}")
+
+    if cache_path:
+        cache[source] = {"fingerprint": fingerprint, "config": config}
+        _write_cache(cache_path, cache)
+    return config
+
+
+def resolve_config(
+    overrides: Optional[Dict[str, Optional[str]]] = None,
+    files: Iterable[str] = (TERRAFORM_OUTPUTS_FILE, DEPLOYMENT_CONFIG_FILE),
+    interactive: Optional[bool] = None,
+    cache_path: Optional[str] = CACHE_FILE,
+    prompt: Callable[[str], str] = input,
+) -> Tuple[Dict[str, str], str]:
+    """
+    Resolve the deployment configuration from flags, environment, files and prompt.
+
+    Args:
+        overrides: Values from command line flags; None values are ignored.
+        files: Deployment output files to try, in order.
+        interactive: Whether missing values may be prompted for. Defaults to
+            whether stdin is a terminal.
+        cache_path: Compiled config cache, or None to disable it.
+        prompt: Function used to ask for missing values.
+
+    Returns:
+        A tuple of (validated configuration, description of its sources).
+
+    Raises:
+        ConfigError: If a value is missing in a non-interactive run, or a
+            value is invalid.
+    """
+    config: Dict[str, str] = {}
+    sources = []
+
+    def take(values: Dict[str, Optional[str]], source: str):
+        taken = False
+        for key in CONFIG_KEYS:
+            if not config.get(key) and values.get(key):
+                config[key] = values[key]
+                taken = True
+        if taken:
+            sources.append(source)
+
+    errors = []
+    # Prompting is left out of the timing
+    with metrics.stage("config_load"):
+        take(overrides or {}, "command line")
+        take({key: os.environ.get(key) for key in CONFIG_KEYS}, "environment")
+
+        for path in files:
+            if all(config.get(key) for key in CONFIG_KEYS):
+                break
+            try:
+                values = load_config_file(path, cache_path)
+            except ConfigError as e:
+                errors.append(str(e))
+                continue
+            if values:
+                take(values, path)
+
+    missing = [key for key in CONFIG_KEYS if not config.get(key)]
+    if missing:
+        if interactive is None:
+            interactive = sys.stdin is not None and sys.stdin.isatty()
+        if not interactive:
+            details = "; ".join(errors) if errors else "no deployment output file found"
+            raise ConfigError(f"Missing {', '.join(missing)} ({details}). "
+                              "Pass them as flags or environment variables.")
+        labels = {"KEY_VAULT_NAME": "Key Vault Name: ", "AI_SERVICES_NAME": "AI Services Name: "}
+        take({key: prompt(labels[key]).strip() for key in missing}, "manual input")
+
+    return validate_config(config), ", ".join(sources)
@@ -0,0 +1,252 @@
+"""
+Load balancing and failover across several AI Services resources.
+
+One resource's rate limit caps the throughput of a run. An EndpointPool
+stands in for a TextAnalyticsClient and spreads requests over the clients
+of several resources (e.g. in different regions):
+
+* Each request goes to an endpoint picked at random, weighted by the
+  inverse of its observed latency (an exponentially weighted moving
+  average), by its requests in flight and, when the per-resource rate is
+  known, by the quota left in its token bucket.
+* When an endpoint throttles (429), fails with a server error or cannot be
+  reached, it is set aside for its Retry-After (or an exponential backoff)
+  and the request is sent to the next best endpoint straight away. Only
+  when every endpoint failed is the error raised, so a RetryScheduler backs
+  off as it would for a single resource.
+* An endpoint that rejects its key (401/403) is taken out of rotation.
+
+Non-retryable errors such as an invalid request (400) are raised as is,
+since every endpoint would reject the request in the same way.
+"""
+
+import logging
+import random
+import threading
+import time
+from typing import List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+from azure_ai_toolkit.clients import get_text_analytics_client
+from azure_ai_toolkit.throttling import (
+    RETRYABLE_STATUS_CODES,
+    TIER_REQUESTS_PER_SECOND,
+    TokenBucket,
+    get_retry_after,
+)
+
+logger = logging.getLogger(__name__)
+
+OPERATIONS = ("analyze_sentiment", "detect_language")
+AUTHENTICATION_STATUS_CODES = {401, 403}
+
+# Weight of the newest request in the latency average
+LATENCY_SMOOTHING = 0.2
+BASE_COOLDOWN_SECONDS = 1.0
+MAX_COOLDOWN_SECONDS = 60.0
+# Keeps endpoints with an empty bucket in rotation, just unlikely to be picked
+MIN_QUOTA_WEIGHT = 0.05
+
+
+class Endpoint:
+    """One resource of a pool and what has been observed about it."""
+
+    def __init__(self, url: str, client, requests_per_second: Optional[float] = None):
+        self.url = url
+        self.name = urlparse(url).netloc or url
+        self.client = client
+        self.bucket = TokenBucket(requests_per_second) if requests_per_second else None
+        self.latency: Optional[float] = None
+        self.in_flight = 0
+        self.failures = 0
+        self.available_at = 0.0
+        self.disabled = False
+        self.error: Optional[Exception] = None
+        self.stats = {"requests": 0, "throttled": 0, "errors": 0}
+
+    def weight(self, default_latency: float) -> float:
+        quota = max(MIN_QUOTA_WEIGHT, self.bucket.fill) if self.bucket else 1.0
+        return quota / ((self.latency or default_latency) * (self.in_flight + 1))
+
+
+class EndpointPool:
+    """Spreads client calls over several resources, failing over between them."""
+
+    def __init__(self, endpoints: Sequence[Endpoint]):
+        if not endpoints:
+            raise ValueError("An endpoint pool needs at least one endpoint")
+        self.endpoints = list(endpoints)
+        self.stats = {"requests": 0, "failovers": 0}
+        self._lock = threading.Lock()
+
+    def _pick(self, exclude: List[Endpoint]) -> Optional[Endpoint]:
+        with self._lock:
+            candidates = [endpoint for endpoint in self.endpoints
+                          if not endpoint.disabled and endpoint not in exclude]
+            if not candidates:
+                return None
+            now = time.monotonic()
+            ready = [endpoint for endpoint in candidates if endpoint.available_at <= now]
+            if ready:
+                # Endpoints without a measurement yet count as the fastest, so they get probed
+                known = [endpoint.latency for endpoint in self.endpoints if endpoint.latency]
+                default_latency = min(known) if known else 1.0
+                weights = [endpoint.weight(default_latency) for endpoint in ready]
+                endpoint = random.choices(ready, weights)[0]
+            else:
+                # Everything left is cooling down; try the one that recovers first
+                endpoint = min(candidates, key=lambda candidate: candidate.available_at)
+            endpoint.in_flight += 1
+            return endpoint
+
+    def _succeeded(self, endpoint: Endpoint, seconds: float):
+        with self._lock:
+            endpoint.in_flight -= 1
+            endpoint.failures = 0
+            endpoint.stats["requests"] += 1
+            if endpoint.latency is None:
+                endpoint.latency = seconds
+            else:
+                endpoint.latency += LATENCY_SMOOTHING * (seconds - endpoint.latency)
+
+    def _failed(self, endpoint: Endpoint, error: Exception, status_code: Optional[int]):
+        with self._lock:
+            endpoint.in_flight -= 1
+            endpoint.stats["requests"] += 1
+            if status_code in AUTHENTICATION_STATUS_CODES:
+                endpoint.disabled = True
+                endpoint.error = error
+                endpoint.stats["errors"] += 1
+                logger.error("Endpoint %s rejected its credentials (HTTP %s), taking it out of rotation",
+                             endpoint.name, status_code)
+                return
+            endpoint.failures += 1
+            cooldown = min(MAX_COOLDOWN_SECONDS, BASE_COOLDOWN_SECONDS * 2 ** (endpoint.failures - 1))
+            if status_code == 429:
+                endpoint.stats["throttled"] += 1
+                retry_after = get_retry_after(error)
+                if retry_after is not None:
+                    cooldown = retry_after
+            else:
+                endpoint.stats["errors"] += 1
+            endpoint.available_at = time.monotonic() + cooldown
+            logger.warning("Endpoint %s failed (%s), setting it aside for %.1fs",
+                           endpoint.name, status_code or type(error).__name__, cooldown)
+
+    def call(self, operation: str, *args, **kwargs):
+        """
+        Call a client method on the best available endpoint, failing over on errors.
+
+        Raises:
+            HttpResponseError: For non-retryable errors, or the last error
+                once every endpoint failed.
+            ServiceRequestError: When no endpoint could be reached.
+        """
+        from azure.core.exceptions import HttpResponseError, ServiceRequestError, ServiceResponseError
+
+        with self._lock:
+            self.stats["requests"] += 1
+        tried: List[Endpoint] = []
+        last_error = None
+        while True:
+            endpoint = self._pick(tried)
+            if endpoint is None:
+                # Every endpoint failed, or all were taken out of rotation earlier
+                raise last_error or self.endpoints[0].error
+            if tried:
+                with self._lock:
+                    self.stats["failovers"] += 1
+            tried.append(endpoint)
+            if endpoint.bucket:
+                # Only tracks the remaining quota; the RetryScheduler paces the run
+                endpoint.bucket.try_acquire()
+            start = time.perf_counter()
+            try:
+                result = getattr(endpoint.client, operation)(*args, **kwargs)
+            except HttpResponseError as e:
+                if e.status_code not in RETRYABLE_STATUS_CODES | AUTHENTICATION_STATUS_CODES:
+                    with self._lock:
+                        endpoint.in_flight -= 1
+                    raise
+                self._failed(endpoint, e, e.status_code)
+                last_error = e
+            except (ServiceRequestError, ServiceResponseError) as e:
+                self._failed(endpoint, e, None)
+                last_error = e
+            else:
+                self._succeeded(endpoint, time.perf_counter() - start)
+                return result
+
+    def __getattr__(self, name):
+        if name not in OPERATIONS:
+            raise AttributeError(name)
+
+        def operation(*args, **kwargs):
+            return self.call(name, *args, **kwargs)
+
+        return operation
+
+    def describe(self) -> List[str]:
+        """Return one line per endpoint with its share of requests, latency and failures."""
+        total = sum(endpoint.stats["requests"] for endpoint in self.endpoints) or 1
+        lines = []
+        for endpoint in self.endpoints:
+            latency = f"{endpoint.latency * 1000:.0f}ms" if endpoint.latency is not None else "n/a"
+            state = ", disabled" if endpoint.disabled else ""
+            lines.append(f"{endpoint.name}: {endpoint.stats['requests'] / total:.0%} of requests, "
+                         f"latency {latency}, throttled {endpoint.stats['throttled']}, "
+                         f"errors {endpoint.stats['errors']}{state}")
+        return lines
+
+
+def create_pool(
+    credentials: Sequence[Tuple[str, str]],
+    requests_per_second: Optional[float] = None,
+    tier: Optional[str] = None,
+    **client_kwargs,
+) -> EndpointPool:
+    """
+    Build a pool from the shared clients of several resources.
+
+    Picklable through functools.partial, so it can serve as the client
+    factory of sharding.run_sharded.
+
+    Args:
+        credentials: (endpoint, key) of each resource.
+        requests_per_second: Rate limit of each resource, used to estimate
+            its remaining quota; takes precedence over tier.
+        tier: Pricing tier of the resources ("F0" or "S").
+        **client_kwargs: Passed to get_text_analytics_client, e.g. pool_size
+            and retry_total.
+    """
+    if requests_per_second is None and tier is not None:
+        requests_per_second = TIER_REQUESTS_PER_SECOND[tier]
+    return EndpointPool([
+        Endpoint(endpoint, get_text_analytics_client(endpoint, key, **client_kwargs), requests_per_second)
+        for endpoint, key in credentials
+    ])
+
+
+def numbered_names(name: str, count: int) -> List[str]:
+    """
+    Secret names of count resources: name, name-2, name-3, ...
+
+    The first resource keeps the unnumbered name, so existing single-resource
+    vaults need no changes.
+    """
+    return [name] + [f"{name}-{index}" for index in range(2, count + 1)]
+
+
+def pair_keys(endpoints: Sequence[str], keys: str) -> List[Tuple[str, str]]:
+    """
+    Pair endpoints with keys given as one key for all or a comma-separated key per endpoint.
+
+    Raises:
+        ValueError: When the number of keys matches neither.
+    """
+    values = keys.split(",") if keys else [""]
+    if len(values) == 1:
+        values = values * len(endpoints)
+    if len(values) != len(endpoints):
+        raise ValueError(f"Got {len(values)} keys for {len(endpoints)} endpoints")
+    return list(zip(endpoints, values))
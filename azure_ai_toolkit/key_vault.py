@@ -0,0 +1,259 @@
+"""
+Cached, concurrently prefetched Azure Key Vault secrets.
+
+Probing the DefaultAzureCredential chain and fetching secrets one by one
+dominates the start-up time of the example scripts. This module builds the
+credential once per process, resolves its token once (instead of once per
+request or client), fetches all needed secrets of a vault concurrently and
+keeps them in memory with an expiry. Entries close to expiry are refreshed in
+the background on access (refresh-ahead), so callers never block on a
+refresh, and refresh listeners are notified when a refetched secret has
+changed, e.g. to pick up a rotated API key. Long-lived processes that only
+read their secrets once call revalidate_secrets() now and then, so
+rotations are noticed at all.
+
+Secrets are only ever held in memory; nothing is written to disk. The Azure
+Identity and Key Vault libraries are imported on first use only.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional
+
+from azure_ai_toolkit import metrics
+
+if TYPE_CHECKING:
+    # Azure Core is loaded on first use only
+    from azure.core.credentials import AccessToken
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 3600
+DEFAULT_REFRESH_AHEAD_SECONDS = 300
+
+# Tokens are renewed this many seconds before they expire
+TOKEN_REFRESH_MARGIN_SECONDS = 300
+
+_credential = None
+_credential_lock = threading.Lock()
+_caches: Dict[str, "SecretCache"] = {}
+# Options each process-wide cache was created with, to detect conflicting requests
+_cache_options: Dict[str, dict] = {}
+_caches_lock = threading.Lock()
+
+
+class _SharedTokenCredential:
+    """
+    Wraps a credential so concurrent callers share one token per scope.
+
+    Without it, every thread issuing its first request would probe the whole
+    DefaultAzureCredential chain in parallel.
+    """
+
+    def __init__(self, credential):
+        self._credential = credential
+        self._tokens: Dict[tuple, "AccessToken"] = {}
+        self._lock = threading.Lock()
+
+    def get_token(self, *scopes, **kwargs) -> "AccessToken":
+        key = (scopes, tuple(sorted(kwargs.items())))
+        with self._lock:
+            token = self._tokens.get(key)
+            if token is None or token.expires_on - TOKEN_REFRESH_MARGIN_SECONDS < time.time():
+                with metrics.stage("credential"):
+                    token = self._credential.get_token(*scopes, **kwargs)
+                self._tokens[key] = token
+            return token
+
+    def close(self):
+        self._credential.close()
+
+
+def get_credential():
+    """Return the process-wide Azure credential, probing the chain only once."""
+    global _credential
+    with _credential_lock:
+        if _credential is None:
+            with metrics.stage("credential"):
+                from azure.identity import DefaultAzureCredential
+
+                _credential = _SharedTokenCredential(DefaultAzureCredential())
+        return _credential
+
+
+class SecretCache:
+    """In-memory cache of one vault's secrets with expiry and refresh-ahead."""
+
+    def __init__(
+        self,
+        vault_url: str,
+        ttl: float = DEFAULT_TTL_SECONDS,
+        refresh_ahead: float = DEFAULT_REFRESH_AHEAD_SECONDS,
+        on_refresh: Optional[Callable[[str, str], None]] = None,
+        credential=None,
+        max_workers: int = 8,
+        **client_kwargs,
+    ):
+        """
+        Args:
+            vault_url: URL of the Key Vault, e.g. https://myvault.vault.azure.net/.
+            ttl: Seconds a fetched secret is served from memory.
+            refresh_ahead: Seconds before expiry at which an access triggers a
+                background refresh.
+            on_refresh: Refresh listener registered right away, see
+                add_refresh_listener.
+            credential: Credential to use; the shared process-wide
+                DefaultAzureCredential by default.
+            max_workers: Maximum number of concurrent secret requests.
+            **client_kwargs: Extra SecretClient options, e.g. connection_verify.
+        """
+        self.vault_url = vault_url
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.max_workers = max_workers
+        self._listeners: List[Callable[[str, str], None]] = [on_refresh] if on_refresh else []
+
+        from azure.keyvault.secrets import SecretClient
+
+        self._client = SecretClient(vault_url=vault_url, credential=credential or get_credential(), **client_kwargs)
+        self._entries: Dict[str, tuple] = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def _fetch(self, name: str) -> str:
+        with metrics.stage("secret_fetch"):
+            value = self._client.get_secret(name).value
+        with self._lock:
+            previous = self._entries.get(name)
+            self._entries[name] = (value, time.monotonic() + self.ttl)
+        if previous is not None and previous[0] != value:
+            logger.info("Secret '%s' changed in the vault", name)
+            with self._lock:
+                listeners = list(self._listeners)
+            for listener in listeners:
+                try:
+                    listener(name, value)
+                except Exception:
+                    # One failing listener must not keep the others from the new value
+                    logger.exception("Refresh listener for secret '%s' failed", name)
+        return value
+
+    def add_refresh_listener(self, listener: Callable[[str, str], None]):
+        """
+        Call listener with (name, value) whenever a secret is refetched, in
+        the background or after expiring, and its value changed.
+
+        The cache is shared by everything in the process that reads the
+        vault, so each caller adds its own listener; adding the same listener
+        again has no effect.
+        """
+        with self._lock:
+            if listener not in self._listeners:
+                self._listeners.append(listener)
+
+    def remove_refresh_listener(self, listener: Callable[[str, str], None]):
+        """Stop calling a listener added with add_refresh_listener."""
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def _refresh(self, name: str):
+        try:
+            self._fetch(name)
+        except Exception as e:
+            # Keep serving the current value until it expires
+            logger.warning("Background refresh of secret '%s' failed: %s", name, e)
+        finally:
+            with self._lock:
+                self._refreshing.discard(name)
+
+    def _lookup(self, name: str) -> Optional[str]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or entry[1] <= now:
+                return None
+            value, expires = entry
+            if expires - now <= self.refresh_ahead and name not in self._refreshing:
+                self._refreshing.add(name)
+                threading.Thread(target=self._refresh, args=(name,), daemon=True).start()
+            return value
+
+    def get_many(self, names: Iterable[str]) -> Dict[str, str]:
+        """
+        Return the values of several secrets, fetching all misses concurrently.
+
+        Raises:
+            Exception: Whatever the SecretClient raised for the first secret
+                that could not be fetched.
+        """
+        names = list(names)
+        values = {name: self._lookup(name) for name in names}
+        missing = [name for name, value in values.items() if value is None]
+        if len(missing) == 1:
+            values[missing[0]] = self._fetch(missing[0])
+        elif missing:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(missing))) as executor:
+                for name, value in zip(missing, executor.map(self._fetch, missing)):
+                    values[name] = value
+        return values
+
+    def get(self, name: str) -> str:
+        """Return the value of one secret."""
+        return self.get_many([name])[name]
+
+    def revalidate(self):
+        """
+        Look every cached secret up again, so rotated values reach the refresh listeners.
+
+        Secrets close to expiry are refreshed in the background and expired
+        ones refetched; a failed refetch is logged and retried on the next
+        call rather than raised.
+        """
+        with self._lock:
+            names = list(self._entries)
+        for name in names:
+            if self._lookup(name) is None:
+                try:
+                    self._fetch(name)
+                except Exception as e:
+                    logger.warning("Refetching expired secret '%s' failed: %s", name, e)
+
+
+def get_secret_cache(vault_url: str, **kwargs) -> SecretCache:
+    """
+    Return the process-wide SecretCache for a vault, creating it once.
+
+    Args:
+        vault_url: URL of the Key Vault.
+        **kwargs: SecretCache options, used when the cache is created.
+
+    Raises:
+        ValueError: If the cache already exists and options differing from
+            those it was created with are given. Use add_refresh_listener
+            rather than on_refresh to be notified of rotations.
+    """
+    with _caches_lock:
+        cache = _caches.get(vault_url)
+        if cache is None:
+            cache = SecretCache(vault_url, **kwargs)
+            _caches[vault_url] = cache
+            _cache_options[vault_url] = kwargs
+        elif kwargs and kwargs != _cache_options.get(vault_url, {}):
+            raise ValueError(f"The secret cache for {vault_url} already exists with different options")
+        return cache
+
+
+def revalidate_secrets():
+    """Revalidate the secrets of every process-wide SecretCache, see SecretCache.revalidate."""
+    with _caches_lock:
+        caches = list(_caches.values())
+    for cache in caches:
+        cache.revalidate()
+
+
+def get_secrets(vault_url: str, names: Iterable[str]) -> Dict[str, str]:
+    """Fetch several secrets of a vault concurrently, served from memory when cached."""
+    return get_secret_cache(vault_url).get_many(names)
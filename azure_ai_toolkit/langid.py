@@ -0,0 +1,194 @@
+"""
+Local language pre-detection to skip detect_language calls.
+
+A small classifier answers clear-cut cases locally and leaves everything else
+to the service:
+
+- Texts written mostly in a script used by a single language (Hangul, kana,
+  Greek, Thai, Hebrew) are classified by script alone.
+- Latin-script texts are scored against short lists of very frequent
+  function words, each weighted by how many languages share it. A language
+  is only chosen when enough words match and it clearly beats the others.
+
+Anything shorter, mixed or ambiguous (Cyrillic, Arabic, Han without kana,
+unlisted Latin languages) returns None and should be sent to the service.
+Results use the service's record format, so they can stand in for a
+detect_language result and be used as language hints for analyze_sentiment.
+"""
+
+import re
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_MIN_WORDS = 3
+
+# Service language names and ISO 639-1 codes
+LANGUAGES = {
+    "en": "English",
+    "es": "Spanish",
+    "fr": "French",
+    "de": "German",
+    "it": "Italian",
+    "pt": "Portuguese",
+    "nl": "Dutch",
+    "ja": "Japanese",
+    "ko": "Korean",
+    "el": "Greek",
+    "th": "Thai",
+    "he": "Hebrew",
+}
+
+_FUNCTION_WORDS = {
+    "en": "the and of to is in that it was for with you this are have be not but they what on at from by "
+          "we my an or will would there their been has which she he very our all were can",
+    "es": "el la los las de que y en un una es por con para no se del al lo como más pero muy su sus este "
+          "esta está son también fue hay yo ser todo cuando porque nos ya",
+    "fr": "le la les des et est une un du dans que qui pour pas sur avec ce cette il elle nous vous je au "
+          "aux sont mais très plus ne ont été être qu c l d",
+    "de": "der die das und ist nicht ein eine zu den mit von sich auf für dem des auch es ich sie wir sehr "
+          "aber war wie oder noch nur wird sind werden haben kein über einen",
+    "it": "il di che e la per un una non sono è della con del le gli anche ma più molto questo questa come "
+          "nel alla ho ha io lo dei delle perché sempre tutto",
+    "pt": "o a os as de que e do da em um uma para com não é dos das no na por mais muito mas foi ser está "
+          "isso você eu ele ela também são pelo pela",
+    "nl": "de het een en van is dat niet in op te zijn met voor ik er maar om ook als dit aan hij wij zij "
+          "heeft was bij nog naar wordt geen heel erg",
+}
+
+# Words shared by several languages count for correspondingly less
+_WORD_WEIGHTS: Dict[str, Dict[str, float]] = {}
+for _language, _words in _FUNCTION_WORDS.items():
+    for _word in _words.split():
+        _WORD_WEIGHTS.setdefault(_word, {})[_language] = 1.0
+for _weights in _WORD_WEIGHTS.values():
+    for _language in _weights:
+        _weights[_language] = 1.0 / len(_weights)
+
+# Unicode blocks of scripts that identify a single language
+_SCRIPTS = (
+    ("ko", ((0xAC00, 0xD7AF), (0x1100, 0x11FF), (0x3130, 0x318F))),
+    ("ja", ((0x3040, 0x30FF),)),
+    ("el", ((0x0370, 0x03FF),)),
+    ("th", ((0x0E00, 0x0E7F),)),
+    ("he", ((0x0590, 0x05FF),)),
+)
+_HAN = (0x4E00, 0x9FFF)
+
+_WORD = re.compile(r"[^\W\d_]+")
+
+
+def _is_latin(ch: str) -> bool:
+    return ch.isascii() or "À" <= ch <= "ɏ"
+
+
+class LocalLanguageDetector:
+    """Answers high-confidence language detections locally and counts how many were avoided."""
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, min_words: int = DEFAULT_MIN_WORDS):
+        """
+        Args:
+            threshold: Minimum local confidence (0-1) to answer without the service.
+            min_words: Minimum number of words in a Latin-script text.
+        """
+        self.threshold = threshold
+        self.min_words = min_words
+        self.stats = {"local": 0, "service": 0}
+
+    def _classify_script(self, letters: str) -> Optional[Tuple[str, float]]:
+        counts = {language: 0 for language, _ in _SCRIPTS}
+        han = 0
+        for ch in letters:
+            code = ord(ch)
+            if _HAN[0] <= code <= _HAN[1]:
+                han += 1
+                continue
+            for language, blocks in _SCRIPTS:
+                if any(start <= code <= end for start, end in blocks):
+                    counts[language] += 1
+                    break
+        # Japanese mixes kana with Han characters
+        counts["ja"] += han if counts["ja"] else 0
+        language = max(counts, key=counts.get)
+        share = counts[language] / len(letters)
+        return (language, share) if share >= self.threshold else None
+
+    def _classify_words(self, text: str) -> Optional[Tuple[str, float]]:
+        words = _WORD.findall(text.lower())
+        if len(words) < self.min_words:
+            return None
+        scores: Dict[str, float] = {}
+        matched = 0
+        for word in words:
+            weights = _WORD_WEIGHTS.get(word)
+            if weights:
+                matched += 1
+                for language, weight in weights.items():
+                    scores[language] = scores.get(language, 0.0) + weight
+        # Require function words to make up a plausible share of the text
+        if not scores or matched < 2 or matched / len(words) < 0.2:
+            return None
+        language = max(scores, key=scores.get)
+        confidence = scores[language] / sum(scores.values())
+        return (language, confidence) if confidence >= self.threshold else None
+
+    def classify(self, text: str) -> Optional[Tuple[str, float]]:
+        """Return (ISO 639-1 code, confidence) for a clear-cut text, or None."""
+        letters = [ch for ch in text if ch.isalpha()]
+        if not letters:
+            return None
+        latin = sum(1 for ch in letters if _is_latin(ch))
+        if latin == len(letters):
+            return self._classify_words(text)
+        if latin / len(letters) > 1 - self.threshold:
+            return None
+        return self._classify_script("".join(ch for ch in letters if not _is_latin(ch)))
+
+    def detect(self, document: Dict) -> Optional[Dict]:
+        """Return a detect_language record for a document, or None if the service is needed."""
+        result = self.classify(document["text"])
+        if result is None:
+            self.stats["service"] += 1
+            return None
+        self.stats["local"] += 1
+        language, confidence = result
+        return {
+            "id": document["id"],
+            "language": LANGUAGES[language],
+            "iso6391_name": language,
+            "confidence_score": round(confidence, 2),
+        }
+
+    def annotate(self, documents: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        Answer detect_language locally where possible.
+
+        Documents detected locally carry their record under a "result" key,
+        which the batching and bulk helpers treat as already answered.
+        """
+        for document in documents:
+            if "result" not in document:
+                record = self.detect(document)
+                if record is not None:
+                    document = dict(document, result=record)
+            yield document
+
+    def hint(self, documents: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        Add a "language" hint to documents without one, for analyze_sentiment.
+
+        Without a hint the service assumes the request's default language, so
+        hints both avoid a separate detect_language call and score non-English
+        text with the right model.
+        """
+        for document in documents:
+            if not document.get("language"):
+                record = self.detect(document)
+                if record is not None:
+                    document = dict(document, language=record["iso6391_name"])
+            yield document
+
+    @property
+    def local_fraction(self) -> float:
+        """Fraction of detections answered without the service."""
+        total = self.stats["local"] + self.stats["service"]
+        return self.stats["local"] / total if total else 0.0
@@ -0,0 +1,107 @@
+"""
+A resident memory ceiling for bulk runs.
+
+Every batch in flight holds its documents, the service's response and the
+records converted from it, so memory grows with the batch size times the
+number of requests in flight. A MemoryCeiling samples the resident set size
+of the process and, while it is above the configured limit, halves the
+batch size batching.iter_batches packs; once memory is back well below the
+limit, batches grow again step by step up to the service limits.
+
+Freed memory is not always returned to the operating system, so after a
+spike batches may stay small for the rest of the run; the ceiling trades
+throughput for a bounded footprint, never the other way around.
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Batches never shrink below this fraction of the service limits
+MIN_SCALE = 1 / 64
+# Batches grow again once memory is below this fraction of the limit
+RECOVERY_FRACTION = 0.8
+DEFAULT_CHECK_INTERVAL = 0.5
+
+
+def current_rss() -> Optional[int]:
+    """
+    Return the resident set size of this process in bytes.
+
+    Read from /proc on Linux; elsewhere the peak resident set size is the
+    best the standard library offers. None when neither is available.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class MemoryCeiling:
+    """Scales batch sizes down while the process uses more memory than a limit."""
+
+    def __init__(self, limit_bytes: int, check_interval: float = DEFAULT_CHECK_INTERVAL):
+        """
+        Args:
+            limit_bytes: Resident memory above which batches shrink.
+            check_interval: Minimum seconds between samples of the resident
+                memory, and so between two adjustments of the batch size.
+        """
+        self.limit_bytes = limit_bytes
+        self.check_interval = check_interval
+        self.scale = 1.0
+        self.peak_rss = 0
+        self.stats = {"shrinks": 0, "grows": 0}
+        self._checked = float("-inf")
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_megabytes(cls, megabytes: Optional[float], **kwargs) -> Optional["MemoryCeiling"]:
+        """Return a ceiling of the given size, or None when no size is given."""
+        return cls(int(megabytes * (1 << 20)), **kwargs) if megabytes else None
+
+    def check(self) -> float:
+        """
+        Sample the resident memory if due and return the current batch size scale.
+
+        Returns:
+            The fraction of the service limits batches may use, at most 1.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked < self.check_interval:
+                return self.scale
+            self._checked = now
+            rss = current_rss()
+            if rss is None:
+                return self.scale
+            self.peak_rss = max(self.peak_rss, rss)
+            if rss > self.limit_bytes and self.scale > MIN_SCALE:
+                self.scale = max(MIN_SCALE, self.scale / 2)
+                self.stats["shrinks"] += 1
+                logger.warning("Resident memory %.0f MB is above the %.0f MB ceiling, batches shrunk to %.0f%%",
+                               rss / (1 << 20), self.limit_bytes / (1 << 20), self.scale * 100)
+            elif rss < self.limit_bytes * RECOVERY_FRACTION and self.scale < 1.0:
+                self.scale = min(1.0, self.scale * 2)
+                self.stats["grows"] += 1
+            return self.scale
+
+    def limits(self, max_documents: int, max_characters: int) -> Tuple[int, int]:
+        """Scale a batch's document and character limits, keeping room for at least one document."""
+        scale = self.check()
+        if scale >= 1.0:
+            return max_documents, max_characters
+        return max(1, int(max_documents * scale)), max(1, int(max_characters * scale))
@@ -0,0 +1,268 @@
+"""
+In-process metrics for the hot path: per-stage timings and counters.
+
+Every stage a request goes through is timed into a histogram of the
+``azure_ai_stage_seconds`` family, labelled by stage:
+
+    config_load          resolving the Key Vault and AI Services names
+    credential           building the credential and acquiring tokens
+                         (the DefaultAzureCredential chain)
+    secret_fetch         fetching a secret from Key Vault
+    client_construction  building a TextAnalyticsClient (incl. the SDK import)
+    serialization        from calling the SDK until the request is sent
+    network              sending the request and receiving the response
+    deserialization      from receiving the response until the SDK returns
+    result_processing    converting SDK results into plain records
+
+The statistics dicts kept by the scheduler, result cache and other helpers
+are exported as counters without extra bookkeeping on the hot path.
+
+Metrics can be rendered in the Prometheus text format, served over HTTP for
+long-running workers, or summarized at the end of a CLI run. Only the
+standard library is used.
+"""
+
+import bisect
+import contextlib
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+STAGES = (
+    "config_load",
+    "credential",
+    "secret_fetch",
+    "client_construction",
+    "serialization",
+    "network",
+    "deserialization",
+    "result_processing",
+)
+
+# Metrics are only reachable from this machine unless asked otherwise
+DEFAULT_METRICS_HOST = "127.0.0.1"
+
+# Upper bounds in seconds, from sub-millisecond local work to slow retries
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    """A thread-safe histogram with fixed buckets."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.min = float("inf")
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+
+    def quantile(self, fraction: float) -> float:
+        """Estimate a quantile by interpolating within its bucket, bounded by the observed range."""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                estimate = lower + (upper - lower) * (rank - seen) / count
+                return min(max(estimate, self.min), self.max)
+            seen += count
+        return self.max
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {"counts": list(self.counts), "sum": self.sum, "count": self.count,
+                    "min": self.min, "max": self.max}
+
+    def merge(self, snapshot: Dict):
+        with self._lock:
+            for index, count in enumerate(snapshot["counts"]):
+                self.counts[index] += count
+            self.sum += snapshot["sum"]
+            self.count += snapshot["count"]
+            self.min = min(self.min, snapshot["min"])
+            self.max = max(self.max, snapshot["max"])
+
+
+class Registry:
+    """Stage histograms and exported statistics of one process."""
+
+    def __init__(self):
+        self.stages: Dict[str, Histogram] = {}
+        self._stats: List[Tuple[str, Dict]] = []
+        self._lock = threading.Lock()
+
+    def histogram(self, stage: str) -> Histogram:
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.stages.setdefault(stage, Histogram())
+        return histogram
+
+    def observe(self, stage: str, seconds: float):
+        """Record the duration of one pass through a stage."""
+        self.histogram(stage).observe(seconds)
+
+    @contextlib.contextmanager
+    def stage(self, stage: str) -> Iterator[None]:
+        """Time the body of a with statement as one pass through a stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def add_stats(self, stats: Dict[str, int], prefix: str = ""):
+        """
+        Export a statistics dict as counters named azure_ai_<prefix><key>_total.
+
+        The dict is read when metrics are rendered, so it keeps being updated
+        by its owner as usual.
+        """
+        with self._lock:
+            self._stats.append((prefix, stats))
+
+    def counters(self) -> Dict[str, int]:
+        totals: Dict[str, int] = {}
+        with self._lock:
+            stats = list(self._stats)
+        for prefix, values in stats:
+            for key, value in list(values.items()):
+                name = f"{prefix}{key}"
+                totals[name] = totals.get(name, 0) + value
+        return totals
+
+    def snapshot(self, reset: bool = False) -> Dict[str, Dict]:
+        """Return the stage histograms as plain data, e.g. to send to another process."""
+        with self._lock:
+            stages = dict(self.stages)
+            if reset:
+                self.stages = {}
+        return {stage: histogram.snapshot() for stage, histogram in stages.items()}
+
+    def merge(self, snapshot: Dict[str, Dict]):
+        """Add stage histograms taken with snapshot() in another process."""
+        for stage, histogram in snapshot.items():
+            self.histogram(stage).merge(histogram)
+
+    def render_prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines = [
+            "# HELP azure_ai_stage_seconds Time spent per pass through each stage.",
+            "# TYPE azure_ai_stage_seconds histogram",
+        ]
+        with self._lock:
+            stages = dict(self.stages)
+        for stage, histogram in sorted(stages.items()):
+            snapshot = histogram.snapshot()
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + (float("inf"),), snapshot["counts"]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'azure_ai_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'azure_ai_stage_seconds_sum{{stage="{stage}"}} {snapshot["sum"]!r}')
+            lines.append(f'azure_ai_stage_seconds_count{{stage="{stage}"}} {snapshot["count"]}')
+        for name, value in sorted(self.counters().items()):
+            lines.append(f"# TYPE azure_ai_{name}_total counter")
+            lines.append(f"azure_ai_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> List[str]:
+        """Return one line per stage and one with every counter, for printing at exit."""
+        lines = []
+        with self._lock:
+            stages = dict(self.stages)
+        ordered = [stage for stage in STAGES if stage in stages]
+        ordered += sorted(stage for stage in stages if stage not in STAGES)
+        for stage in ordered:
+            histogram = stages[stage]
+            if not histogram.count:
+                continue
+            lines.append(f"{stage:<20} {histogram.count:>7}  total {histogram.sum:8.3f}s  "
+                         f"p50 {histogram.quantile(0.5) * 1000:8.1f}ms  p99 {histogram.quantile(0.99) * 1000:8.1f}ms")
+        counters = self.counters()
+        if counters:
+            lines.append(", ".join(f"{name}: {value}" for name, value in sorted(counters.items())))
+        return lines
+
+
+REGISTRY = Registry()
+
+observe = REGISTRY.observe
+stage = REGISTRY.stage
+
+# When the transport of the current thread last started sending and finished
+# receiving, so callers can split an SDK call into its stages
+_transport = threading.local()
+
+
+def mark_sent():
+    _transport.sent = time.perf_counter()
+
+
+def mark_received():
+    _transport.received = time.perf_counter()
+    observe("network", _transport.received - _transport.sent)
+
+
+def transport_marks() -> Tuple[Optional[float], Optional[float]]:
+    """Return and clear the (sent, received) times recorded on this thread."""
+    marks = (getattr(_transport, "sent", None), getattr(_transport, "received", None))
+    _transport.sent = _transport.received = None
+    return marks
+
+
+def serve_prometheus(port: int, host: str = DEFAULT_METRICS_HOST,
+                     registry: Registry = REGISTRY) -> "ThreadingHTTPServer":
+    """
+    Serve GET /metrics in the Prometheus text format on a background thread.
+
+    Args:
+        port: Port to listen on; 0 picks a free one (see server.server_port).
+        host: Interface to bind; only the loopback interface by default,
+            "0.0.0.0" or "" for all interfaces.
+        registry: Registry to expose.
+
+    Returns:
+        The server; call shutdown() to stop it.
+    """
+    # Only workers serve metrics, so CLI runs do not pay for importing http.server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            data = registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
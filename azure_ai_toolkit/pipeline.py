@@ -0,0 +1,50 @@
+"""
+Bounded, order-preserving concurrent execution for batched service calls.
+
+Batches are pulled lazily from the input iterator, so at most
+``max_in_flight`` batches are ever buffered: the reader is only advanced
+when the oldest in-flight batch has completed and its results have been
+handed to the consumer. Throughput therefore scales with concurrency rather
+than with per-request network latency.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Deque, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def ordered_map(func: Callable[[T], R], items: Iterable[T], max_in_flight: int = 4) -> Iterator[R]:
+    """
+    Apply func to each item on a thread pool, yielding results in input order.
+
+    Args:
+        func: Function to run for each item, typically one service request.
+        items: Iterable of work items; consumed lazily.
+        max_in_flight: Maximum number of items submitted but not yet yielded.
+            A value of 1 runs everything on the calling thread.
+
+    Yields:
+        func(item) for each item, in the order the items were produced.
+    """
+    if max_in_flight <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    pending: Deque = deque()
+    executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="ta-batch")
+    try:
+        for item in items:
+            # Backpressure: wait for the oldest batch before reading another one
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+            pending.append(executor.submit(func, item))
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
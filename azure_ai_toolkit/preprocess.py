@@ -0,0 +1,259 @@
+"""
+Text preprocessing before documents are submitted.
+
+Three steps cut billed transactions and avoid per-document errors:
+
+- Normalization: Unicode NFC, collapsed whitespace and no control
+  characters (cache.normalize_text), so the same text is always sent (and
+  cached) the same way.
+- Deduplication: a document whose normalized text and language hint were
+  already seen in the run is not sent; the first occurrence's result is
+  copied to it, under its own id.
+- Chunking: documents over the service's per-document character limit are
+  split at sentence boundaries into chunks that are sent separately, and the
+  chunk results are aggregated back into one record for the document.
+
+Preprocessing is applied in two halves around the bulk pipeline:
+Preprocessor.split() and Preprocessor.deduplicate() on the documents (see
+bulk.prepare_documents), then Preprocessor.finish() on the records, which
+come back one per prepared document and in the same order.
+"""
+
+import re
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Iterable, Iterator, List, Tuple
+
+from azure_ai_toolkit.batching import MAX_CHARACTERS_PER_DOCUMENT
+from azure_ai_toolkit.cache import cache_key, normalize_text
+
+DEFAULT_MAX_ENTRIES = 100000
+
+# Positions right after sentence-ending punctuation and its trailing spaces
+_SENTENCE_END = re.compile(r"(?<=[.!?。！？])[\"')\]”’]*\s+")
+
+
+def split_text(text: str, max_characters: int = MAX_CHARACTERS_PER_DOCUMENT) -> List[Tuple[int, str]]:
+    """
+    Split text into chunks of at most max_characters, at sentence boundaries.
+
+    Sentences are packed greedily; a sentence longer than the limit is split
+    at the last space before it (or at the limit when there is none).
+
+    Returns:
+        (offset, chunk) pairs; the chunks concatenate back to text.
+    """
+    boundaries = [match.end() for match in _SENTENCE_END.finditer(text)] + [len(text)]
+    chunks = []
+    start = 0
+    previous = 0
+    for boundary in boundaries:
+        if boundary - start <= max_characters:
+            previous = boundary
+            continue
+        if boundary - previous <= max_characters:
+            chunks.append((start, text[start:previous]))
+            start = previous
+        # A single sentence over the limit
+        while boundary - start > max_characters:
+            end = text.rfind(" ", start + 1, start + max_characters) + 1 or start + max_characters
+            chunks.append((start, text[start:end]))
+            start = end
+        previous = boundary
+    if start < len(text):
+        chunks.append((start, text[start:]))
+    return chunks
+
+
+def _combine_sentiment(chunks: List[Tuple[Dict, Dict]]) -> Dict:
+    total = sum(len(document["text"]) for document, _ in chunks)
+    scores = {name: 0.0 for name in ("positive", "neutral", "negative")}
+    labels = set()
+    sentences = []
+    for document, record in chunks:
+        weight = len(document["text"]) / total
+        for name in scores:
+            scores[name] += record["confidence_scores"][name] * weight
+        labels.add(record["sentiment"])
+        for sentence in record.get("sentences", []):
+            sentences.append(dict(sentence, offset=sentence["offset"] + document["chunk_offset"]))
+    # The service's document-level rule, applied to chunks instead of sentences
+    positive = labels & {"positive", "mixed"}
+    negative = labels & {"negative", "mixed"}
+    if positive and negative:
+        sentiment = "mixed"
+    elif positive:
+        sentiment = "positive"
+    elif negative:
+        sentiment = "negative"
+    else:
+        sentiment = "neutral"
+    return {
+        "sentiment": sentiment,
+        "confidence_scores": {name: round(score, 2) for name, score in scores.items()},
+        "sentences": sentences,
+    }
+
+
+def _combine_language(chunks: List[Tuple[Dict, Dict]]) -> Dict:
+    total = sum(len(document["text"]) for document, _ in chunks)
+    weights: Dict[str, float] = {}
+    names = {}
+    for document, record in chunks:
+        code = record["iso6391_name"]
+        weights[code] = weights.get(code, 0.0) + record["confidence_score"] * len(document["text"])
+        names[code] = record["language"]
+    code = max(weights, key=weights.get)
+    return {"language": names[code], "iso6391_name": code, "confidence_score": round(weights[code] / total, 2)}
+
+
+_COMBINERS = {
+    "analyze_sentiment": _combine_sentiment,
+    "detect_language": _combine_language,
+}
+
+
+class Preprocessor:
+    """Normalizes, deduplicates and chunks documents, and reassembles their records."""
+
+    def __init__(
+        self,
+        operation: str,
+        normalize: bool = True,
+        deduplicate: bool = True,
+        max_characters: int = MAX_CHARACTERS_PER_DOCUMENT,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ):
+        """
+        Args:
+            operation: "analyze_sentiment" or "detect_language".
+            normalize: Normalize document text before anything else.
+            deduplicate: Answer repeated texts from their first occurrence.
+            max_characters: Documents longer than this are chunked.
+            max_entries: Distinct texts remembered for deduplication; the
+                least recently seen are forgotten beyond it.
+        """
+        self.operation = operation
+        self.normalize = normalize
+        self.max_characters = max_characters
+        self.max_entries = max_entries if deduplicate else 0
+        self.stats = {"documents": 0, "normalized": 0, "duplicates": 0, "chunked": 0, "chunks": 0}
+        # Dedup key -> [first record or None, duplicates waiting for it]
+        self._seen: "OrderedDict[str, List]" = OrderedDict()
+        # Chunked documents as (sequence number of the first chunk, chunks)
+        self._chunked: Deque[Tuple[int, List[Dict]]] = deque()
+        # First occurrences whose records are still to come, as (sequence number, key)
+        self._first: Deque[Tuple[int, str]] = deque()
+        self._prepared = 0
+        self._deduplicated = 0
+        self._finished = 0
+
+    def split(self, documents: Iterable[Dict]) -> Iterator[Dict]:
+        """Normalize documents and replace oversized ones with their chunks."""
+        for document in documents:
+            self.stats["documents"] += 1
+            if self.normalize:
+                text = normalize_text(document["text"])
+                if text != document["text"]:
+                    self.stats["normalized"] += 1
+                    document = dict(document, text=text)
+            if len(document["text"]) <= self.max_characters or "result" in document:
+                self._prepared += 1
+                yield document
+                continue
+            chunks = [
+                dict(document, id=f"{document['id']}#{index}", text=text, chunk_offset=offset)
+                for index, (offset, text) in enumerate(split_text(document["text"], self.max_characters))
+            ]
+            self._chunked.append((self._prepared, chunks))
+            self.stats["chunked"] += 1
+            self.stats["chunks"] += len(chunks)
+            self._prepared += len(chunks)
+            yield from chunks
+
+    def deduplicate(self, documents: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        Mark documents whose text was already seen in this run.
+
+        Duplicates carry a placeholder "result", so they are batched but not
+        sent; finish() replaces it with the first occurrence's record. Apply
+        after language hints are set, since the hint is part of the key.
+        """
+        for document in documents:
+            sequence = self._deduplicated
+            self._deduplicated += 1
+            if not self.max_entries or "result" in document:
+                yield document
+                continue
+            key = cache_key(document["text"], self.operation, "", document.get("language", ""))
+            entry = self._seen.get(key)
+            if entry is None:
+                self._seen[key] = [None, 0]
+                self._first.append((sequence, key))
+                self._forget()
+                yield document
+                continue
+            entry[1] += 1
+            self._seen.move_to_end(key)
+            self.stats["duplicates"] += 1
+            yield dict(document, result={"id": document["id"], "duplicate_of": key})
+
+    def _forget(self):
+        # Entries still awaited by duplicates in flight are kept
+        while len(self._seen) > self.max_entries:
+            for key, entry in self._seen.items():
+                if not entry[1]:
+                    del self._seen[key]
+                    break
+            else:
+                return
+
+    def _resolve(self, record: Dict) -> Dict:
+        # The first occurrence always comes back before its duplicates
+        entry = self._seen[record["duplicate_of"]]
+        entry[1] -= 1
+        return dict(entry[0], id=record["id"])
+
+    def _remember(self, sequence: int, record: Dict):
+        if self._first and self._first[0][0] == sequence:
+            _, key = self._first.popleft()
+            entry = self._seen.get(key)
+            if entry is not None:
+                entry[0] = record
+
+    def finish(self, records: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        Turn the records of prepared documents back into one record per input document.
+
+        Args:
+            records: One record per document yielded by split(), in order,
+                e.g. from bulk.run_bulk.
+        """
+        chunk_records: List[Tuple[Dict, Dict]] = []
+        for record in records:
+            sequence = self._finished
+            self._finished += 1
+            if "duplicate_of" in record:
+                record = self._resolve(record)
+            else:
+                self._remember(sequence, record)
+            if self._chunked and self._chunked[0][0] <= sequence:
+                first, chunks = self._chunked[0]
+                chunk_records.append((chunks[sequence - first], record))
+                if len(chunk_records) < len(chunks):
+                    continue
+                self._chunked.popleft()
+                record = self._combine(chunk_records)
+                chunk_records = []
+            yield record
+
+    @property
+    def pending(self) -> bool:
+        """True while finish() holds some but not all chunks of a document."""
+        return bool(self._chunked) and self._chunked[0][0] < self._finished
+
+    def _combine(self, chunk_records: List[Tuple[Dict, Dict]]) -> Dict:
+        parent_id = chunk_records[0][0]["id"].rpartition("#")[0]
+        for _, record in chunk_records:
+            if "error" in record:
+                return {"id": parent_id, "error": record["error"]}
+        return {"id": parent_id, **_COMBINERS[self.operation](chunk_records)}
@@ -0,0 +1,352 @@
+"""
+Multi-process, resumable execution of a bulk operation over one large file.
+
+A single process spends most of its CPU time deserializing service responses
+and formatting results, so very large inputs are split into shards at line
+boundaries (by byte offset, without reading the file) and processed by a
+pool of worker processes, each with its own pooled client, request scheduler
+and result cache connection. Every shard is written to its own JSON Lines
+part file next to the output; once all are done the parts are concatenated
+in order, or streamed through the writer of another output format.
+
+Progress is recorded in a manifest (``<output>.manifest.json``) after each
+shard completes. Rerunning with the same input and output skips the shards
+that already finished, so an interrupted backfill only redoes the shards
+that were in progress. On SIGINT the shards in progress are finished before
+the run stops.
+"""
+
+import functools
+import json
+import logging
+import math
+import os
+import signal
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, Iterator, List, Optional
+
+from azure_ai_toolkit import batching, bulk, metrics, writers
+from azure_ai_toolkit.cache import DEFAULT_MAX_ENTRIES, DEFAULT_TTL_SECONDS, ResultCache
+from azure_ai_toolkit.clients import LazyClient
+from azure_ai_toolkit.langid import LocalLanguageDetector
+from azure_ai_toolkit.memory import MemoryCeiling
+from azure_ai_toolkit.preprocess import Preprocessor
+from azure_ai_toolkit.throttling import TIER_REQUESTS_PER_SECOND, RetryScheduler
+
+logger = logging.getLogger(__name__)
+
+# Shards per process: more shards lose less work on interruption and even
+# out uneven shards, at the cost of one extra part file each
+SHARDS_PER_PROCESS = 4
+
+_SCHEDULER_STATS = ("requests", "throttled", "retried_requests", "retried_documents")
+_CACHE_STATS = ("hits", "misses")
+_LANGUAGE_STATS = ("local", "service")
+_PREPROCESS_STATS = ("documents", "normalized", "duplicates", "chunked", "chunks")
+
+
+def plan_shards(path: str, shards: int) -> List[Dict]:
+    """
+    Split a file into about `shards` byte ranges that start at line boundaries.
+
+    Returns:
+        One dict per non-empty shard with "index", "start", "end" and
+        "first_line" (the line number at "start").
+    """
+    size = os.path.getsize(path)
+    boundaries = [0]
+    with open(path, "rb") as stream:
+        for i in range(1, shards):
+            target = max(size * i // shards, boundaries[-1], 1)
+            # Move to the start of the line following the one containing target - 1
+            stream.seek(target - 1)
+            stream.readline()
+            boundaries.append(stream.tell())
+    boundaries.append(size)
+
+    plan = []
+    first_line = 1
+    with open(path, "rb") as stream:
+        for start, end in zip(boundaries, boundaries[1:]):
+            if end <= start:
+                continue
+            plan.append({"index": len(plan), "start": start, "end": end, "first_line": first_line})
+            # Count lines to number the next shard's documents; bytes.count is
+            # far cheaper than parsing
+            stream.seek(start)
+            remaining = end - start
+            while remaining:
+                chunk = stream.read(min(remaining, 1 << 20))
+                first_line += chunk.count(b"\n")
+                remaining -= len(chunk)
+    return plan
+
+
+def _fingerprint(path: str) -> List[int]:
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _write_manifest(path: str, manifest: Dict):
+    # Write, fsync and rename so a crash never leaves a torn manifest
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".manifest-")
+    with os.fdopen(fd, "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+        manifest_file.flush()
+        os.fsync(manifest_file.fileno())
+    os.replace(temp_path, path)
+
+
+def _load_manifest(path: str, expected: Dict) -> Optional[Dict]:
+    try:
+        with open(path, "r") as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError):
+        return None
+    if any(manifest.get(key) != value for key, value in expected.items()):
+        logger.warning("Ignoring manifest %s written for a different input or operation", path)
+        return None
+    return manifest
+
+
+def _exit_with_parent(parent_pid: int):
+    while os.getppid() == parent_pid:
+        time.sleep(1)
+    os._exit(1)
+
+
+def _init_worker(parent_pid: int):
+    # Interrupts are handled by the parent, which lets running shards finish
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # A killed parent never sends more work; exit instead of waiting forever
+    threading.Thread(target=_exit_with_parent, args=(parent_pid,), daemon=True).start()
+    # Timings inherited from a forked parent are already counted there
+    metrics.REGISTRY.snapshot(reset=True)
+
+
+@functools.lru_cache(maxsize=None)
+def _memory_ceiling(max_memory_mb: Optional[float]) -> Optional[MemoryCeiling]:
+    # One per worker process, so what it learned carries over to the next shard
+    return MemoryCeiling.from_megabytes(max_memory_mb)
+
+
+def run_shard(client_factory: Callable, shard: Dict, options: Dict) -> Dict:
+    """
+    Process one shard in a worker process and write its part file.
+
+    Returns:
+        The shard's record count, request and cache statistics, and the
+        stage timings of the process since its previous shard.
+    """
+    operation = options["operation"]
+    scheduler = RetryScheduler(
+        requests_per_second=options["requests_per_second"],
+        max_concurrency=options["concurrency"],
+    )
+    cache = None
+    if options["cache_path"]:
+        cache = ResultCache(options["cache_path"], ttl=options["cache_ttl"],
+                            max_entries=options["cache_max_entries"],
+                            model_version=options["model_version"] or "latest",
+                            require_sentences=options["include_sentences"])
+
+    documents = batching.read_document_range(
+        options["input_path"], shard["start"], shard["end"], shard["first_line"], options["input_format"]
+    )
+    detector = LocalLanguageDetector() if options["local_language_detection"] else None
+    # Duplicates are found within a shard
+    preprocessor = Preprocessor(operation) if options["preprocess"] else None
+    documents = bulk.prepare_documents(documents, operation, cache, detector, preprocessor)
+    batches = batching.iter_batches(documents, max_documents=batching.MAX_DOCUMENTS_PER_BATCH[operation],
+                                    memory_ceiling=_memory_ceiling(options["max_memory_mb"]))
+    records = bulk.run_bulk(LazyClient(client_factory), operation, batches, options["concurrency"],
+                            scheduler, cache, options["model_version"], options["include_sentences"])
+    if preprocessor:
+        records = preprocessor.finish(records)
+
+    temp_path = shard["part"] + ".tmp"
+    try:
+        with open(temp_path, "wb") as output:
+            # Parts keep sentences when requested, for the final writer
+            writer = writers.JsonlWriter(output, operation, options["include_sentences"])
+            count = writers.write_records(records, writer)
+            os.fsync(output.fileno())
+        os.replace(temp_path, shard["part"])
+    finally:
+        if cache:
+            cache.close()
+    stats = {name: scheduler.stats[name] for name in _SCHEDULER_STATS}
+    if cache:
+        stats.update({name: cache.stats[name] for name in _CACHE_STATS})
+    if detector:
+        stats.update({name: detector.stats[name] for name in _LANGUAGE_STATS})
+    if preprocessor:
+        stats.update({name: preprocessor.stats[name] for name in _PREPROCESS_STATS})
+    return {"count": count, "stats": stats, "metrics": metrics.REGISTRY.snapshot(reset=True)}
+
+
+def _read_parts(shards: List[Dict]) -> Iterator[Dict]:
+    for shard in shards:
+        with open(shard["part"], "r", encoding="utf-8") as part:
+            for line in part:
+                yield json.loads(line)
+
+
+def run_sharded(
+    client_factory: Callable,
+    operation: str,
+    input_path: str,
+    output_path: str,
+    processes: int,
+    input_format: Optional[str] = None,
+    concurrency: int = 1,
+    requests_per_second: Optional[float] = None,
+    tier: Optional[str] = None,
+    cache_path: Optional[str] = None,
+    cache_ttl: float = DEFAULT_TTL_SECONDS,
+    cache_max_entries: int = DEFAULT_MAX_ENTRIES,
+    model_version: Optional[str] = None,
+    local_language_detection: bool = False,
+    output_format: str = "jsonl",
+    include_sentences: bool = False,
+    preprocess: bool = False,
+    resources: int = 1,
+    max_memory_mb: Optional[float] = None,
+) -> Dict:
+    """
+    Run a bulk operation over a file with a pool of processes.
+
+    Args:
+        client_factory: Picklable callable returning a TextAnalyticsClient,
+            e.g. functools.partial(get_text_analytics_client, endpoint, key),
+            or an endpoints.EndpointPool (see endpoints.create_pool); called
+            once in each worker process that reaches the service.
+        operation: "analyze_sentiment" or "detect_language".
+        input_path: Input file; stdin cannot be sharded.
+        output_path: Output file, written once every shard is done.
+        processes: Number of worker processes.
+        input_format: As for batching.read_documents.
+        concurrency: Requests in flight for the whole run, shared between
+            the processes (rounded up, so each has at least one).
+        requests_per_second: Pacing rate of each resource for the whole run,
+            shared evenly between the processes.
+        tier: Pricing tier used for the pacing rate when no explicit rate is
+            given.
+        cache_path: Optional SQLite result cache shared by the processes.
+        cache_ttl: Seconds a cached result stays valid.
+        cache_max_entries: Cached results kept before LRU eviction.
+        model_version: Model version to request.
+        local_language_detection: Pre-detect clear-cut languages locally in
+            each process, see bulk.prepare_documents.
+        output_format: One of writers.OUTPUT_FORMATS.
+        include_sentences: Also write sentence-level sentiment.
+        preprocess: Normalize, deduplicate (within each shard) and chunk
+            documents, see azure_ai_toolkit.preprocess.
+        resources: Number of resources the client factory balances requests
+            across; the pacing rate applies to each.
+        max_memory_mb: Resident memory ceiling of each process, above which
+            its batches shrink (see azure_ai_toolkit.memory).
+
+    Returns:
+        A dict with the total "count", the summed request, cache, local
+        language detection and preprocessing "stats", and the number of shards "resumed" from
+        an earlier run.
+    """
+    manifest_path = output_path + ".manifest.json"
+    expected = {
+        "input": os.path.abspath(input_path),
+        "fingerprint": _fingerprint(input_path),
+        "operation": operation,
+        "model_version": model_version,
+        "include_sentences": include_sentences,
+        "preprocess": preprocess,
+    }
+    manifest = _load_manifest(manifest_path, expected)
+    if manifest is None:
+        manifest = dict(expected, shards=plan_shards(input_path, processes * SHARDS_PER_PROCESS))
+        for shard in manifest["shards"]:
+            shard["part"] = f"{output_path}.part-{shard['index']:05d}"
+            shard["done"] = False
+        _write_manifest(manifest_path, manifest)
+
+    if requests_per_second is None and tier is not None:
+        requests_per_second = TIER_REQUESTS_PER_SECOND[tier]
+    options = {
+        "operation": operation,
+        "input_path": input_path,
+        "input_format": input_format,
+        "concurrency": math.ceil(concurrency / processes),
+        "requests_per_second": requests_per_second * resources / processes if requests_per_second else None,
+        "cache_path": cache_path,
+        "cache_ttl": cache_ttl,
+        "cache_max_entries": cache_max_entries,
+        "model_version": model_version,
+        "local_language_detection": local_language_detection,
+        "include_sentences": include_sentences,
+        "preprocess": preprocess,
+        "max_memory_mb": max_memory_mb,
+    }
+
+    totals = {name: 0 for name in _SCHEDULER_STATS + _CACHE_STATS + _LANGUAGE_STATS + _PREPROCESS_STATS}
+    # Parts are renamed into place only when complete, so an existing part is
+    # a finished shard even if the manifest was not updated in time
+    pending = [shard for shard in manifest["shards"] if not os.path.exists(shard["part"])]
+    resumed = len(manifest["shards"]) - len(pending)
+    if resumed:
+        logger.info("Resuming: %d of %d shards already done", resumed, len(manifest["shards"]))
+
+    if pending:
+        executor = ProcessPoolExecutor(
+            max_workers=min(processes, len(pending)), initializer=_init_worker, initargs=(os.getpid(),)
+        )
+        try:
+            futures = {executor.submit(run_shard, client_factory, shard, options): shard for shard in pending}
+            for future in as_completed(futures):
+                shard = futures[future]
+                result = future.result()
+                shard["done"] = True
+                for name, value in result["stats"].items():
+                    totals[name] += value
+                metrics.REGISTRY.merge(result["metrics"])
+                _write_manifest(manifest_path, manifest)
+                logger.info("Shard %d done: %d records", shard["index"], result["count"])
+        except KeyboardInterrupt:
+            logger.warning("Interrupted: finishing the shards in progress; rerun to resume")
+            executor.shutdown(wait=True, cancel_futures=True)
+            for shard in pending:
+                shard["done"] = os.path.exists(shard["part"])
+            _write_manifest(manifest_path, manifest)
+            raise
+        finally:
+            executor.shutdown(wait=True)
+
+    # Merge the parts in input order, then clean up
+    temp_path = output_path + ".tmp"
+    with open(temp_path, "wb") as output:
+        if output_format == "jsonl":
+            count = 0
+            for shard in manifest["shards"]:
+                with open(shard["part"], "rb") as part:
+                    for chunk in iter(lambda: part.read(1 << 20), b""):
+                        output.write(chunk)
+                        count += chunk.count(b"\n")
+        else:
+            writer = writers.open_writer(output, output_format, operation, include_sentences)
+            count = writers.write_records(_read_parts(manifest["shards"]), writer)
+        output.flush()
+        os.fsync(output.fileno())
+    os.replace(temp_path, output_path)
+    for shard in manifest["shards"]:
+        os.remove(shard["part"])
+    os.remove(manifest_path)
+
+    for names, prefix, enabled in ((_SCHEDULER_STATS, "", True), (_CACHE_STATS, "cache_", cache_path),
+                                   (_LANGUAGE_STATS, "language_", local_language_detection),
+                                   (_PREPROCESS_STATS, "preprocess_", preprocess)):
+        if enabled:
+            metrics.REGISTRY.add_stats({name: totals[name] for name in names}, prefix)
+    return {"count": count, "stats": totals, "resumed": resumed}
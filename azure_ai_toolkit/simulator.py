@@ -0,0 +1,386 @@
+"""
+Local stub of the Azure AI Language (Text Analytics) and Key Vault REST endpoints.
+
+Implements just enough of the ``/language/:analyze-text`` API for the
+TextAnalyticsClient to run sentiment analysis and language detection against
+it, including the service's per-request document limits, so the bulk paths
+can be exercised without an Azure subscription. Latency with random jitter,
+throttling (429 with Retry-After), server errors and per-document failures
+can be injected at configurable rates to exercise the retry scheduler, and
+an API key can be required to exercise authentication failures. Several
+instances with different settings stand in for resources in several regions
+(see azure_ai_toolkit.endpoints).
+
+The Key Vault ``GET /secrets/{name}`` API is served too, with the bearer
+token challenge the SecretClient expects. The Key Vault SDK only sends
+tokens over TLS, so serve it with a certificate (see
+create_self_signed_certificate) and trust that certificate in the client.
+
+Run it with:
+
+    python -m azure_ai_toolkit.simulator --port 5000
+
+and point the scripts at ``http://127.0.0.1:5000`` with ``--endpoint``.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import random
+import re
+import ssl
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from azure_ai_toolkit.batching import MAX_CHARACTERS_PER_DOCUMENT
+
+MODEL_VERSION = "2022-11-01"
+
+# Challenge returned to Key Vault requests without a bearer token
+KEY_VAULT_CHALLENGE = ('Bearer authorization="https://login.microsoftonline.com/00000000-0000-0000-0000-000000000000", '
+                       'resource="https://vault.azure.net"')
+_SECRET_PATH = re.compile(r"^/secrets/([0-9A-Za-z-]+)(?:/([0-9A-Za-z]*))?/?(?:\?.*)?$")
+
+# Document limits per request, keyed by the "kind" of the analyze-text call
+MAX_DOCUMENTS_PER_KIND = {
+    "SentimentAnalysis": 10,
+    "LanguageDetection": 1000,
+}
+
+POSITIVE_WORDS = {"good", "great", "best", "love", "excellent", "happy", "amazing", "fast"}
+NEGATIVE_WORDS = {"bad", "worst", "hate", "terrible", "awful", "slow", "broken", "no"}
+
+_SENTENCE = re.compile(r"[^.!?]*[^.!?\s][^.!?]*[.!?]*")
+
+LANGUAGE_MARKERS = {
+    ("Spanish", "es"): {"el", "la", "los", "que", "y", "es", "muy"},
+    ("French", "fr"): {"le", "la", "les", "et", "est", "très", "une"},
+    ("German", "de"): {"der", "die", "das", "und", "ist", "sehr", "nicht"},
+}
+
+
+def _score_sentiment(text: str) -> Tuple[str, Dict[str, float]]:
+    words = [word.strip(".,!?;:\"'").lower() for word in text.split()]
+    positive = sum(word in POSITIVE_WORDS for word in words)
+    negative = sum(word in NEGATIVE_WORDS for word in words)
+    if positive > negative:
+        return "positive", {"positive": 0.9, "neutral": 0.08, "negative": 0.02}
+    if negative > positive:
+        return "negative", {"positive": 0.02, "neutral": 0.08, "negative": 0.9}
+    return "neutral", {"positive": 0.1, "neutral": 0.8, "negative": 0.1}
+
+
+def _sentences(text: str) -> List[Dict]:
+    """Split text at sentence punctuation and score each sentence, as the service does."""
+    sentences = []
+    for match in _SENTENCE.finditer(text):
+        sentence = match.group().strip()
+        sentiment, scores = _score_sentiment(sentence)
+        sentences.append({"sentiment": sentiment, "confidenceScores": scores,
+                          "offset": match.start() + match.group().index(sentence),
+                          "length": len(sentence), "text": sentence})
+    return sentences
+
+
+def _detect_language(text: str) -> Dict:
+    words = {word.strip(".,!?;:\"'").lower() for word in text.split()}
+    best, hits = ("English", "en"), 0
+    for language, markers in LANGUAGE_MARKERS.items():
+        count = len(words & markers)
+        if count > hits:
+            best, hits = language, count
+    return {"name": best[0], "iso6391Name": best[1], "confidenceScore": 1.0 if hits else 0.8}
+
+
+def _document_error(document_id: str, code: str, message: str) -> Dict:
+    return {"id": document_id, "error": {"code": "InvalidArgument", "message": message,
+                                         "innererror": {"code": code, "message": message}}}
+
+
+def analyze_text(body: Dict, document_error_rate: float = 0.0) -> Tuple[int, Dict]:
+    """
+    Compute the response for one analyze-text request body.
+
+    Args:
+        body: The decoded JSON request body.
+        document_error_rate: Fraction of documents answered with a transient
+            InternalServerError document error.
+
+    Returns:
+        A tuple of (HTTP status code, JSON response body).
+    """
+    kind = body.get("kind")
+    documents: List[Dict] = body.get("analysisInput", {}).get("documents", [])
+    if kind not in MAX_DOCUMENTS_PER_KIND:
+        return 400, {"error": {"code": "InvalidRequest", "message": f"Unsupported kind: {kind}"}}
+    if len(documents) > MAX_DOCUMENTS_PER_KIND[kind]:
+        message = f"Batch request contains too many records. Max {MAX_DOCUMENTS_PER_KIND[kind]} records are permitted."
+        return 400, {"error": {"code": "InvalidArgument", "message": message,
+                               "innererror": {"code": "InvalidDocumentBatch", "message": message}}}
+
+    results, errors = [], []
+    for document in documents:
+        text = document.get("text", "")
+        if not text:
+            errors.append(_document_error(document["id"], "InvalidDocument", "Document text is empty."))
+            continue
+        if len(text) > MAX_CHARACTERS_PER_DOCUMENT:
+            errors.append(_document_error(
+                document["id"], "InvalidDocument",
+                "A document within the request was too large to be processed."))
+            continue
+        if document_error_rate and random.random() < document_error_rate:
+            errors.append(_document_error(document["id"], "InternalServerError", "Internal server error."))
+            continue
+
+        if kind == "SentimentAnalysis":
+            sentiment, scores = _score_sentiment(text)
+            results.append({
+                "id": document["id"],
+                "sentiment": sentiment,
+                "confidenceScores": scores,
+                "sentences": _sentences(text),
+                "warnings": [],
+            })
+        else:
+            results.append({"id": document["id"], "detectedLanguage": _detect_language(text),
+                            "warnings": []})
+
+    result_kind = "SentimentAnalysisResults" if kind == "SentimentAnalysis" else "LanguageDetectionResults"
+    return 200, {"kind": result_kind,
+                 "results": {"documents": results, "errors": errors, "modelVersion": MODEL_VERSION}}
+
+
+def create_self_signed_certificate(directory: str, host: str = "127.0.0.1") -> Tuple[str, str]:
+    """
+    Write a self-signed certificate and key for host into directory.
+
+    Requires the cryptography package, which azure-identity already depends on.
+
+    Returns:
+        A tuple of (certificate file, key file) paths.
+    """
+    import ipaddress
+
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, host)])
+    try:
+        alternative_name = x509.IPAddress(ipaddress.ip_address(host))
+    except ValueError:
+        alternative_name = x509.DNSName(host)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=5))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([alternative_name]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    certfile = os.path.join(directory, "simulator-cert.pem")
+    keyfile = os.path.join(directory, "simulator-key.pem")
+    with open(certfile, "wb") as f:
+        f.write(certificate.public_bytes(serialization.Encoding.PEM))
+    with open(keyfile, "wb") as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                  serialization.NoEncryption()))
+    return certfile, keyfile
+
+
+class SimulatorRequestHandler(BaseHTTPRequestHandler):
+    """HTTP handler serving the analyze-text and Key Vault secrets APIs."""
+
+    # HTTP/1.1 keeps connections alive between requests, like the real service;
+    # headers and body are written separately, so Nagle would stall keep-alive clients
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    # Simulated service-side processing time per request, in seconds, plus
+    # up to `jitter` seconds more chosen at random
+    latency = 0.0
+    jitter = 0.0
+    # Fractions of requests answered with 429 Too Many Requests and 500 errors
+    throttle_rate = 0.0
+    error_rate = 0.0
+    # Fraction of documents failing individually inside a successful response
+    document_error_rate = 0.0
+    # Seconds advertised in the Retry-After header of throttled responses
+    retry_after = 1.0
+    # Key Vault secrets served by name
+    secrets: Dict[str, str] = {}
+    # Text Analytics requests with another key are rejected with 401; any key is accepted when unset
+    api_key: Optional[str] = None
+
+    def log_message(self, format, *args):
+        # Keep the simulator quiet; the clients report their own progress
+        pass
+
+    def _send_json(self, status: int, payload: Dict, headers: Dict = None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _simulate_service(self) -> bool:
+        """Wait out the simulated latency; return False if a failure was sent instead."""
+        if self.latency or self.jitter:
+            time.sleep(self.latency + random.uniform(0, self.jitter))
+        roll = random.random()
+        if roll < self.throttle_rate:
+            message = f"Rate limit is exceeded. Try again in {self.retry_after:g} seconds."
+            self._send_json(429, {"error": {"code": "429", "message": message}},
+                            {"Retry-After": f"{self.retry_after:g}"})
+            return False
+        if roll < self.throttle_rate + self.error_rate:
+            self._send_json(500, {"error": {"code": "InternalServerError", "message": "Internal server error."}})
+            return False
+        return True
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        if not self.path.startswith("/language/:analyze-text"):
+            self._send_json(404, {"error": {"code": "NotFound", "message": self.path}})
+            return
+        if self.api_key is not None and self.headers.get("Ocp-Apim-Subscription-Key") != self.api_key:
+            self._send_json(401, {"error": {"code": "401", "message": "Access denied due to invalid subscription key "
+                                            "or wrong API endpoint."}})
+            return
+        if not self._simulate_service():
+            return
+        status, payload = analyze_text(json.loads(body), self.document_error_rate)
+        self._send_json(status, payload)
+
+    def do_GET(self):
+        match = _SECRET_PATH.match(self.path)
+        if not match:
+            self._send_json(404, {"error": {"code": "NotFound", "message": self.path}})
+            return
+        if not self.headers.get("Authorization", "").startswith("Bearer "):
+            self._send_json(401, {"error": {"code": "Unauthorized", "message": "AKV10000: Request is missing a Bearer."}},
+                            {"WWW-Authenticate": KEY_VAULT_CHALLENGE})
+            return
+        if not self._simulate_service():
+            return
+        name = match.group(1)
+        if name not in self.secrets:
+            self._send_json(404, {"error": {"code": "SecretNotFound",
+                                            "message": f"A secret with (name/id) {name} was not found in this key vault."}})
+            return
+        version = match.group(2) or "0" * 32
+        now = int(time.time())
+        self._send_json(200, {
+            "value": self.secrets[name],
+            "id": f"https://{self.headers.get('Host')}/secrets/{name}/{version}",
+            "attributes": {"enabled": True, "created": now, "updated": now, "recoveryLevel": "Recoverable+Purgeable"},
+            "tags": {},
+        })
+
+
+def _make_handler(**options):
+    return type("ConfiguredSimulatorRequestHandler", (SimulatorRequestHandler,), options)
+
+
+def _create_server(
+    host: str, port: int, certfile: Optional[str], keyfile: Optional[str], **options
+) -> Tuple[ThreadingHTTPServer, str]:
+    server = ThreadingHTTPServer((host, port), _make_handler(**options))
+    server.daemon_threads = True
+    scheme = "http"
+    if certfile:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certfile, keyfile)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        scheme = "https"
+    return server, f"{scheme}://{host}:{server.server_port}"
+
+
+def start_simulator(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    certfile: Optional[str] = None,
+    keyfile: Optional[str] = None,
+    **options
+) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Start the simulator on a background thread.
+
+    Args:
+        host: Interface to bind.
+        port: Port to bind, or 0 to pick a free one.
+        certfile: Certificate to serve HTTPS with; plain HTTP by default.
+        keyfile: Private key of certfile.
+        **options: Overrides for the SimulatorRequestHandler attributes
+            (latency, jitter, throttle_rate, error_rate, document_error_rate,
+            retry_after, secrets, api_key).
+
+    Returns:
+        A tuple of (server, endpoint URL). Call server.shutdown() to stop it.
+    """
+    server, endpoint = _create_server(host, port, certfile, keyfile, **options)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, endpoint
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Azure AI Language REST simulator.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind.")
+    parser.add_argument("--port", type=int, default=5000, help="Port to listen on.")
+    parser.add_argument("--latency-ms", type=float, default=0.0,
+                        help="Simulated processing time per request, in milliseconds.")
+    parser.add_argument("--jitter-ms", type=float, default=0.0,
+                        help="Random extra processing time per request, up to this many milliseconds.")
+    parser.add_argument("--throttle-rate", type=float, default=0.0,
+                        help="Fraction of requests answered with 429 Too Many Requests.")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of requests answered with 500 Internal Server Error.")
+    parser.add_argument("--document-error-rate", type=float, default=0.0,
+                        help="Fraction of documents failing individually with a transient error.")
+    parser.add_argument("--retry-after", type=float, default=1.0,
+                        help="Seconds advertised in the Retry-After header of throttled responses.")
+    parser.add_argument("--secret", action="append", default=[], metavar="NAME=VALUE",
+                        help="Key Vault secret to serve; may be repeated.")
+    parser.add_argument("--key", help="Reject Text Analytics requests that do not use this API key.")
+    parser.add_argument("--certfile", help="Serve HTTPS with this certificate (needed for Key Vault clients).")
+    parser.add_argument("--keyfile", help="Private key of --certfile.")
+    args = parser.parse_args()
+
+    server, endpoint = _create_server(
+        args.host, args.port, args.certfile, args.keyfile,
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        throttle_rate=args.throttle_rate,
+        error_rate=args.error_rate,
+        document_error_rate=args.document_error_rate,
+        retry_after=args.retry_after,
+        secrets=dict(secret.split("=", 1) for secret in args.secret),
+        api_key=args.key,
+    )
+    print(f"Simulator listening on {endpoint}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Directory spool consumed by a long-running worker.
+
+Instead of starting a process (and acquiring credentials, building a client)
+for every piece of work, a worker keeps its client warm and processes job
+files dropped into a spool directory:
+
+    <spool>/incoming/    producers place job files here
+    <spool>/processing/  jobs claimed by a running worker
+    <spool>/results/     one result file per finished job
+    <spool>/failed/      jobs that raised, with a .error file next to them
+
+Producers should write a job under a name starting with "." (or outside the
+spool) and rename it into incoming/ once complete; dot files are ignored.
+Jobs are claimed with an atomic rename, so several workers may share a spool.
+Results are written to a temporary file and renamed into place, so a result
+file that exists is always complete.
+
+SIGTERM and SIGINT drain the worker: the job in progress is finished and its
+result written, then the worker exits without claiming further jobs.
+
+A claimed job is named after the worker's random id and held under a lease:
+the worker touches the claimed file while it processes the job, and a claim
+whose file has not been touched for the lease duration is requeued by any
+worker, at start-up or when idle. Process ids are not used, as workers in
+different containers sharing a spool volume have their own PID namespaces.
+The lease must be well above the clock skew between the hosts sharing the
+spool.
+"""
+
+import contextlib
+import logging
+import os
+import signal
+import threading
+import time
+import uuid
+from typing import BinaryIO, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+SPOOL_DIRECTORIES = ("incoming", "processing", "results", "failed")
+DEFAULT_LEASE_SECONDS = 60.0
+
+
+class SpoolWorker:
+    """Claims job files from a spool directory and writes one result file per job."""
+
+    def __init__(
+        self,
+        spool_dir: str,
+        handle_job: Callable[[str, BinaryIO], int],
+        poll_interval: float = 1.0,
+        result_suffix: str = ".jsonl",
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    ):
+        """
+        Args:
+            spool_dir: Root of the spool; its subdirectories are created if missing.
+            handle_job: Called with (job path, binary result stream) for
+                every job; returns the number of records written.
+            poll_interval: Seconds to wait before looking for new jobs when
+                the spool is empty.
+            result_suffix: Extension of result files, which are named after
+                the job file without its extension.
+            lease_seconds: Seconds after its last heartbeat a claimed job is
+                considered abandoned; heartbeats are sent four times as often.
+        """
+        self.spool_dir = spool_dir
+        self.handle_job = handle_job
+        self.poll_interval = poll_interval
+        self.result_suffix = result_suffix
+        self.lease_seconds = lease_seconds
+        # Unique across hosts and restarts, and free of "." so claims can be parsed
+        self.worker_id = uuid.uuid4().hex
+        self.stats = {"jobs": 0, "failed": 0, "records": 0, "requeued": 0}
+        self._stop = threading.Event()
+        for name in SPOOL_DIRECTORIES:
+            os.makedirs(self._path(name), exist_ok=True)
+
+    def _path(self, directory: str, name: str = "") -> str:
+        return os.path.join(self.spool_dir, directory, name)
+
+    def stop(self, *_):
+        """Finish the job in progress, then return from run(); usable as a signal handler."""
+        if not self._stop.is_set():
+            logger.info("Draining: finishing the current job before exiting")
+        self._stop.set()
+
+    def install_signal_handlers(self):
+        """Drain on SIGTERM and SIGINT; must be called from the main thread."""
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+    def recover(self):
+        """Requeue claimed jobs whose lease has expired."""
+        expired = time.time() - self.lease_seconds
+        for entry in os.scandir(self._path("processing")):
+            worker_id, _, name = entry.name.partition(".")
+            if not name or worker_id == self.worker_id:
+                continue
+            try:
+                if entry.stat().st_mtime > expired:
+                    continue
+                os.replace(entry.path, self._path("incoming", name))
+            except FileNotFoundError:
+                # Finished or requeued by another worker in the meantime
+                continue
+            self.stats["requeued"] += 1
+            logger.warning("Requeued job %s abandoned by worker %s", name, worker_id)
+
+    def claim(self) -> Optional[str]:
+        """Move the oldest pending job to processing/ and return its claimed path."""
+        incoming = self._path("incoming")
+        entries = [entry for entry in os.scandir(incoming) if entry.is_file() and not entry.name.startswith(".")]
+        for entry in sorted(entries, key=lambda entry: (entry.stat().st_mtime, entry.name)):
+            claimed = self._path("processing", f"{self.worker_id}.{entry.name}")
+            try:
+                # The rename keeps the modification time, so start the lease before it
+                os.utime(entry.path)
+                os.rename(entry.path, claimed)
+            except FileNotFoundError:
+                # Claimed by another worker in the meantime
+                continue
+            return claimed
+        return None
+
+    def _heartbeat(self, claimed: str, done: threading.Event):
+        """Renew the lease on a claimed job until done is set."""
+        while not done.wait(self.lease_seconds / 4):
+            try:
+                os.utime(claimed)
+            except FileNotFoundError:
+                logger.warning("Lost the lease on %s; another worker may run it again", claimed)
+                return
+
+    def process(self, claimed: str):
+        """Run one claimed job and move it to results/ or failed/."""
+        name = os.path.basename(claimed).partition(".")[2]
+        result_path = self._path("results", os.path.splitext(name)[0] + self.result_suffix)
+        temp_path = self._path("results", f".{name}.{self.worker_id}.tmp")
+        started = time.monotonic()
+        done = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(claimed, done), daemon=True).start()
+        try:
+            with open(temp_path, "wb") as output:
+                count = self.handle_job(claimed, output)
+                output.flush()
+                os.fsync(output.fileno())
+            os.replace(temp_path, result_path)
+            with contextlib.suppress(FileNotFoundError):
+                # Gone if the lease was lost; the result written is complete all the same
+                os.remove(claimed)
+        except Exception as e:
+            logger.error("Job %s failed: %s", name, e)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            with contextlib.suppress(FileNotFoundError):
+                os.replace(claimed, self._path("failed", name))
+            with open(self._path("failed", name + ".error"), "w", encoding="utf-8") as error_file:
+                error_file.write(f"{type(e).__name__}: {e}\n")
+            self.stats["failed"] += 1
+            return
+        finally:
+            done.set()
+        self.stats["jobs"] += 1
+        self.stats["records"] += count
+        logger.info("Job %s: %d records in %.2fs", name, count, time.monotonic() - started)
+
+    def run(self):
+        """Process jobs until stop() is called, polling when the spool is empty."""
+        recovered = float("-inf")
+        while not self._stop.is_set():
+            # Also while jobs keep arriving, so abandoned ones are not starved
+            if time.monotonic() - recovered >= self.lease_seconds / 4:
+                self.recover()
+                recovered = time.monotonic()
+            claimed = self.claim()
+            if claimed is None:
+                self._stop.wait(self.poll_interval)
+                continue
+            self.process(claimed)
@@ -0,0 +1,304 @@
+"""
+Rate-limit-aware scheduling and retries for Text Analytics calls.
+
+The scheduler combines three mechanisms so that throttling slows a long run
+down instead of killing it:
+
+* A token bucket paces requests to the transaction rate of the resource's
+  pricing tier.
+* An AIMD (additive-increase, multiplicative-decrease) limiter adapts the
+  number of concurrent requests: it halves on every throttle and grows back
+  slowly while requests succeed.
+* Failed requests are retried with exponential backoff, honoring the
+  service's Retry-After headers, and only the documents that failed inside a
+  successful batch are resubmitted.
+
+The SDK's own retry policy should be disabled (``retry_total=0``) on clients
+used with the scheduler so that retries are not multiplied.
+"""
+
+import logging
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Request rate limits of the Language service per pricing tier, in requests per second
+# https://learn.microsoft.com/en-us/azure/ai-services/language-service/concepts/data-limits
+TIER_REQUESTS_PER_SECOND = {
+    "F0": 100 / 60,
+    "S": 1000 / 60,
+}
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+RETRYABLE_DOCUMENT_ERRORS = {"InternalServerError", "ServiceUnavailable", "TooManyRequests"}
+
+
+class TokenBucket:
+    """A thread-safe token bucket that paces callers to a steady request rate."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate: Tokens added per second.
+            capacity: Maximum burst size; defaults to one second worth of tokens.
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1.0):
+        """Block until the requested number of tokens is available, then take them."""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take the requested number of tokens if available, without waiting."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    @property
+    def fill(self) -> float:
+        """The fraction of the bucket currently available, from 0 to 1."""
+        with self._lock:
+            self._refill()
+            return self._tokens / self.capacity
+
+
+class AdaptiveConcurrencyLimiter:
+    """An AIMD concurrency limit shared by all threads issuing requests."""
+
+    def __init__(self, initial: int, minimum: int = 1, maximum: Optional[int] = None):
+        self.minimum = minimum
+        self.maximum = maximum if maximum is not None else initial
+        self._limit = float(initial)
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        """The current number of requests allowed in flight."""
+        return max(self.minimum, int(self._limit))
+
+    def acquire(self):
+        """Block until a request slot is free under the current limit."""
+        with self._condition:
+            while self._in_flight >= self.limit:
+                self._condition.wait()
+            self._in_flight += 1
+
+    def release(self):
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self):
+        """Additive increase: grow the limit by roughly one slot per window of successes."""
+        with self._condition:
+            self._limit = min(float(self.maximum), self._limit + 1.0 / max(self._limit, 1.0))
+            self._condition.notify_all()
+
+    def on_throttle(self):
+        """Multiplicative decrease: halve the limit."""
+        with self._condition:
+            self._limit = max(float(self.minimum), self._limit / 2)
+            logger.info("Throttled by the service, concurrency limit is now %d", self.limit)
+
+
+def get_retry_after(error) -> Optional[float]:
+    """
+    Return the delay requested by the service in seconds, if any.
+
+    Supports the millisecond headers sent by Azure services as well as the
+    standard Retry-After header in both its seconds and HTTP-date forms.
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    for header in ("retry-after-ms", "x-ms-retry-after-ms"):
+        value = headers.get(header)
+        if value:
+            try:
+                return float(value) / 1000
+            except ValueError:
+                pass
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        # HTTP-date form; rare enough not to load the email package up front
+        import email.utils
+
+        try:
+            retry_at = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, retry_at.timestamp() - time.time())
+
+
+class RetryScheduler:
+    """Paces, limits and retries Text Analytics requests."""
+
+    def __init__(
+        self,
+        requests_per_second: Optional[float] = None,
+        tier: Optional[str] = None,
+        max_concurrency: int = 4,
+        max_attempts: int = 6,
+        base_delay: float = 0.5,
+        max_delay: float = 60.0,
+        resources: int = 1,
+    ):
+        """
+        Args:
+            requests_per_second: Pacing rate; takes precedence over tier.
+            tier: Pricing tier of the resource ("F0" or "S") used to pick the
+                pacing rate. No pacing is applied when neither is given.
+            max_concurrency: Upper bound for the adaptive concurrency limit.
+            max_attempts: Attempts per request (and per failed document)
+                before giving up.
+            base_delay: First backoff delay in seconds, doubled on each retry.
+            max_delay: Cap for backoff delays in seconds.
+            resources: Number of resources requests are spread across (see
+                azure_ai_toolkit.endpoints); the pacing rate applies to each.
+        """
+        if requests_per_second is None and tier is not None:
+            requests_per_second = TIER_REQUESTS_PER_SECOND[tier]
+        self.bucket = TokenBucket(requests_per_second * resources) if requests_per_second else None
+        self.limiter = AdaptiveConcurrencyLimiter(max_concurrency)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats = {"requests": 0, "throttled": 0, "retried_requests": 0, "retried_documents": 0}
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _wait_for_turn(self):
+        # A Retry-After applies to the whole resource, so every thread honors it
+        delay = self._blocked_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        if self.bucket:
+            self.bucket.acquire()
+
+    def call(self, func: Callable, *args, **kwargs):
+        """
+        Call func with pacing, adaptive concurrency and request-level retries.
+
+        Raises:
+            HttpResponseError: For non-retryable service errors, or when the
+                last attempt still fails.
+        """
+        from azure.core.exceptions import HttpResponseError, ServiceRequestError, ServiceResponseError
+
+        attempt = 0
+        while True:
+            attempt += 1
+            self._wait_for_turn()
+            self.limiter.acquire()
+            try:
+                self._count("requests")
+                result = func(*args, **kwargs)
+            except HttpResponseError as e:
+                if e.status_code not in RETRYABLE_STATUS_CODES or attempt >= self.max_attempts:
+                    raise
+                delay = self._backoff(attempt)
+                if e.status_code == 429:
+                    self._count("throttled")
+                    self.limiter.on_throttle()
+                    retry_after = get_retry_after(e)
+                    if retry_after is not None:
+                        delay = max(delay, retry_after)
+                        with self._lock:
+                            self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+                logger.warning("Request failed with HTTP %s, retrying in %.1fs (attempt %d/%d)",
+                               e.status_code, delay, attempt, self.max_attempts)
+            except (ServiceRequestError, ServiceResponseError) as e:
+                if attempt >= self.max_attempts:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning("Request failed (%s), retrying in %.1fs (attempt %d/%d)",
+                               e, delay, attempt, self.max_attempts)
+            else:
+                self.limiter.on_success()
+                return result
+            finally:
+                self.limiter.release()
+
+            self._count("retried_requests")
+            time.sleep(delay)
+
+    def _send(self, send_batch: Callable[[List[Dict]], List[Dict]], documents: List[Dict]) -> List[Dict]:
+        from azure.core.exceptions import HttpResponseError, ServiceRequestError, ServiceResponseError
+
+        # Once retries are exhausted on a transient failure, report it per document
+        # instead of aborting the whole run
+        try:
+            return self.call(send_batch, documents)
+        except HttpResponseError as e:
+            if e.status_code not in RETRYABLE_STATUS_CODES:
+                raise
+            code, message = str(e.status_code), e.message
+        except (ServiceRequestError, ServiceResponseError) as e:
+            code, message = "ServiceUnavailable", str(e)
+        logger.error("Giving up on %d documents after %d attempts: %s", len(documents), self.max_attempts, message)
+        return [{"id": document["id"], "error": {"code": code, "message": message}} for document in documents]
+
+    def run_batch(self, send_batch: Callable[[List[Dict]], List[Dict]], batch: List[Dict]) -> List[Dict]:
+        """
+        Send a batch, then resubmit only the documents that failed transiently.
+
+        Args:
+            send_batch: Function sending a list of documents and returning one
+                record per document, in order (see bulk.run_batch).
+            batch: Documents as dicts with an "id" key.
+
+        Returns:
+            One record per document of the batch, in input order. Documents
+            that still fail after the last attempt get an error record.
+
+        Raises:
+            HttpResponseError: For non-retryable service errors such as an
+                invalid key (401), which no amount of retrying will fix.
+        """
+        records = {record["id"]: record for record in self._send(send_batch, batch)}
+        for attempt in range(1, self.max_attempts):
+            failed = [document for document in batch
+                      if records[document["id"]].get("error", {}).get("code") in RETRYABLE_DOCUMENT_ERRORS]
+            if not failed:
+                break
+            self._count("retried_documents", len(failed))
+            time.sleep(self._backoff(attempt))
+            for record in self._send(send_batch, failed):
+                records[record["id"]] = record
+        return [records[document["id"]] for document in batch]
@@ -0,0 +1,251 @@
+"""
+Streaming result writers: JSON Lines, CSV and Parquet.
+
+Writers consume the plain records produced by azure_ai_toolkit.bulk as
+batches complete, so results are never held as SDK objects or collected in
+memory. JSON Lines and CSV are written to binary streams and report the
+bytes written per record, which lets checkpointed runs truncate and resume
+them; Parquet is written in typed row groups and cannot be resumed.
+
+Sentence-level sentiment is only written when requested: as nested records
+in JSON Lines, as a JSON column in CSV and as a list of structs in Parquet.
+
+Parquet output requires the optional pyarrow package.
+"""
+
+import csv
+import io
+import json
+from typing import BinaryIO, Dict, Iterable, List
+
+OUTPUT_FORMATS = ("jsonl", "csv", "parquet")
+
+DEFAULT_ROW_GROUP_SIZE = 10000
+
+_SCORES = ("positive", "neutral", "negative")
+COLUMNS = {
+    "analyze_sentiment": ("id", "sentiment") + _SCORES + ("error_code", "error_message"),
+    "detect_language": ("id", "language", "iso6391_name", "confidence_score", "error_code", "error_message"),
+}
+
+
+def guess_output_format(path: str) -> str:
+    """Infer the output format from the file extension ("jsonl" by default)."""
+    if path.endswith(".csv"):
+        return "csv"
+    if path.endswith((".parquet", ".pq")):
+        return "parquet"
+    return "jsonl"
+
+
+def _sentence_row(sentence: Dict) -> Dict:
+    scores = sentence["confidence_scores"]
+    return {
+        "text": sentence["text"],
+        "sentiment": sentence["sentiment"],
+        **{name: scores[name] for name in _SCORES},
+        "offset": sentence["offset"],
+        "length": sentence["length"],
+    }
+
+
+def flatten_record(record: Dict, operation: str) -> Dict:
+    """Flatten a record into the typed columns of COLUMNS[operation]."""
+    row = dict.fromkeys(COLUMNS[operation])
+    row["id"] = record["id"]
+    if "error" in record:
+        row["error_code"] = record["error"]["code"]
+        row["error_message"] = record["error"]["message"]
+    elif operation == "analyze_sentiment":
+        row["sentiment"] = record["sentiment"]
+        for name in _SCORES:
+            row[name] = record["confidence_scores"][name]
+    else:
+        for name in ("language", "iso6391_name", "confidence_score"):
+            row[name] = record[name]
+    return row
+
+
+class JsonlWriter:
+    """Writes one JSON object per line."""
+
+    resumable = True
+
+    def __init__(self, stream: BinaryIO, operation: str, include_sentences: bool = False):
+        self.stream = stream
+        self.include_sentences = include_sentences
+        self.count = 0
+
+    def write_header(self) -> int:
+        return 0
+
+    def write(self, record: Dict) -> int:
+        """Write one record and return the number of bytes written."""
+        if not self.include_sentences and "sentences" in record:
+            record = {key: value for key, value in record.items() if key != "sentences"}
+        data = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        self.stream.write(data)
+        self.count += 1
+        return len(data)
+
+    def flush(self):
+        self.stream.flush()
+
+    def close(self):
+        self.flush()
+
+
+class CsvWriter:
+    """Writes flattened records as CSV with a header row."""
+
+    resumable = True
+
+    def __init__(self, stream: BinaryIO, operation: str, include_sentences: bool = False):
+        self.stream = stream
+        self.operation = operation
+        self.include_sentences = include_sentences and operation == "analyze_sentiment"
+        self.columns = COLUMNS[operation] + (("sentences",) if self.include_sentences else ())
+        self.count = 0
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator="\n")
+
+    def _write_row(self, values: Iterable) -> int:
+        self._writer.writerow(values)
+        data = self._buffer.getvalue().encode("utf-8")
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        self.stream.write(data)
+        return len(data)
+
+    def write_header(self) -> int:
+        """Write the header row; only at the start of a new file."""
+        return self._write_row(self.columns)
+
+    def write(self, record: Dict) -> int:
+        """Write one record and return the number of bytes written."""
+        row = flatten_record(record, self.operation)
+        values = [row[column] for column in COLUMNS[self.operation]]
+        if self.include_sentences:
+            sentences = [_sentence_row(sentence) for sentence in record.get("sentences", [])]
+            values.append(json.dumps(sentences, ensure_ascii=False) if "error" not in record else None)
+        self.count += 1
+        return self._write_row(values)
+
+    def flush(self):
+        self.stream.flush()
+
+    def close(self):
+        self.flush()
+
+
+class ParquetWriter:
+    """Writes records as typed Parquet row groups; requires pyarrow."""
+
+    resumable = False
+
+    def __init__(
+        self,
+        stream: BinaryIO,
+        operation: str,
+        include_sentences: bool = False,
+        row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+    ):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("Parquet output requires pyarrow: pip install pyarrow")
+
+        self._pa = pyarrow
+        self.operation = operation
+        self.include_sentences = include_sentences and operation == "analyze_sentiment"
+        self.row_group_size = row_group_size
+        self.count = 0
+        self.schema = self._schema()
+        self._columns: Dict[str, List] = {field.name: [] for field in self.schema}
+        self._writer = pyarrow.parquet.ParquetWriter(stream, self.schema, compression="zstd")
+
+    def _schema(self):
+        pa = self._pa
+        label = pa.dictionary(pa.int8(), pa.string())
+        score = pa.float32()
+        if self.operation == "analyze_sentiment":
+            fields = [("id", pa.string()), ("sentiment", label)] + [(name, score) for name in _SCORES]
+        else:
+            fields = [("id", pa.string()), ("language", label), ("iso6391_name", label),
+                      ("confidence_score", score)]
+        fields += [("error_code", pa.string()), ("error_message", pa.string())]
+        if self.include_sentences:
+            sentence = pa.struct([("text", pa.string()), ("sentiment", pa.string())]
+                                 + [(name, score) for name in _SCORES]
+                                 + [("offset", pa.int32()), ("length", pa.int32())])
+            fields.append(("sentences", pa.list_(sentence)))
+        return pa.schema(fields)
+
+    def write_header(self) -> int:
+        return 0
+
+    def write(self, record: Dict) -> int:
+        """Buffer one record, writing a row group once enough are buffered."""
+        row = flatten_record(record, self.operation)
+        for column in COLUMNS[self.operation]:
+            self._columns[column].append(row[column])
+        if self.include_sentences:
+            sentences = None if "error" in record else [
+                _sentence_row(sentence) for sentence in record.get("sentences", [])
+            ]
+            self._columns["sentences"].append(sentences)
+        self.count += 1
+        if len(self._columns["id"]) >= self.row_group_size:
+            self.flush()
+        return 0
+
+    def flush(self):
+        """Write the buffered records as a row group."""
+        if not self._columns["id"]:
+            return
+        table = self._pa.Table.from_pydict(self._columns, schema=self.schema)
+        self._writer.write_table(table)
+        for values in self._columns.values():
+            values.clear()
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+
+
+WRITERS = {
+    "jsonl": JsonlWriter,
+    "csv": CsvWriter,
+    "parquet": ParquetWriter,
+}
+
+
+def open_writer(stream: BinaryIO, output_format: str, operation: str, include_sentences: bool = False):
+    """
+    Create a writer for a binary stream.
+
+    Args:
+        stream: Binary output stream, e.g. open(path, "wb") or sys.stdout.buffer.
+        output_format: One of OUTPUT_FORMATS.
+        operation: "analyze_sentiment" or "detect_language"; selects the columns.
+        include_sentences: Also write sentence-level sentiment.
+    """
+    if output_format not in WRITERS:
+        raise ValueError(f"Unsupported output format: {output_format}")
+    return WRITERS[output_format](stream, operation, include_sentences)
+
+
+def write_records(records: Iterable[Dict], writer, header: bool = True) -> int:
+    """
+    Stream records through a writer and close it.
+
+    Returns:
+        The number of records written.
+    """
+    if header:
+        writer.write_header()
+    for record in records:
+        writer.write(record)
+    writer.close()
+    return writer.count
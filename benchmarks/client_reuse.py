@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Client Reuse Benchmark
+----------------------
+Measures per-request latency of single-document sentiment calls against the
+local simulator when a new TextAnalyticsClient is built for every call (the
+scripts' original behaviour) versus the shared, pooled client.
+
+Run from the repository root:
+
+    python benchmarks/client_reuse.py --requests 200
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from azure.ai.textanalytics import TextAnalyticsClient
+from azure.core.credentials import AzureKeyCredential
+from azure_ai_toolkit.clients import get_text_analytics_client
+from azure_ai_toolkit.simulator import start_simulator
+
+KEY = "benchmark-key"
+TEXT = "Infrastructure as Code is the best approach for cloud deployments"
+
+
+def per_call_client(endpoint):
+    client = TextAnalyticsClient(endpoint=endpoint, credential=AzureKeyCredential(KEY))
+    with client:
+        return client.analyze_sentiment([TEXT])
+
+
+def shared_client(endpoint):
+    return get_text_analytics_client(endpoint, KEY).analyze_sentiment([TEXT])
+
+
+def measure(func, endpoint, requests):
+    """Return per-request latencies in milliseconds."""
+    func(endpoint)  # warm up imports and the shared client
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        func(endpoint)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def summarize(latencies):
+    ordered = sorted(latencies)
+    return {
+        "mean_ms": round(statistics.mean(ordered), 3),
+        "p50_ms": round(ordered[len(ordered) // 2], 3),
+        "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark per-call versus shared Text Analytics clients.')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per scenario.')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Simulated service latency.')
+    args = parser.parse_args()
+
+    server, endpoint = start_simulator(latency=args.latency_ms / 1000)
+    try:
+        results = {
+            "requests": args.requests,
+            "per_call_client": summarize(measure(per_call_client, endpoint, args.requests)),
+            "shared_client": summarize(measure(shared_client, endpoint, args.requests)),
+        }
+    finally:
+        server.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Memory Check
+------------
+Runs the sentiment CLIs' bulk path over a large synthetic corpus of long,
+many-sentence documents against the local simulator, with tracemalloc
+tracing every allocation of the pipeline, and fails if:
+
+- peak traced memory grows with the size of the corpus (results are not
+  streamed),
+- leaving sentence-level results out does not lower the peak,
+- a memory ceiling below the footprint of the run does not shrink batches
+  or does not lower the peak.
+
+Every run happens in its own process, after the Azure SDK is imported, so
+only the memory the pipeline allocates is traced.
+
+Run from the repository root:
+
+    python benchmarks/memory_check.py --documents 400
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+from azure_ai_toolkit.batching import MAX_DOCUMENTS_PER_BATCH
+from azure_ai_toolkit.simulator import start_simulator
+
+KEY = "memory-check-key"
+WORDS = ("the deployment was fast and the team was great but support was slow and the portal is broken "
+         "while the invoice arrived on tuesday and I love how simple the new pipeline is").split()
+# Shorter than the service limit, so documents are never rejected
+DOCUMENT_CHARACTERS = 5000
+
+
+def write_corpus(path, count, seed=0):
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            sentences = []
+            length = 0
+            while True:
+                sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 12))).capitalize() + "."
+                if length + len(sentence) + 1 > DOCUMENT_CHARACTERS:
+                    break
+                sentences.append(sentence)
+                length += len(sentence) + 1
+            # The number keeps every document unique, so each one is sent
+            f.write(f"{i}. {' '.join(sentences)}\n")
+
+
+def run_child(options):
+    """Child process: run the bulk path under tracemalloc and report its peak."""
+    import logging
+    import tracemalloc
+
+    from azure.ai.textanalytics import TextAnalyticsClient  # noqa: F401 - imported before tracing starts
+    from azure_ai_toolkit import cli, writers
+    from azure_ai_toolkit.clients import get_text_analytics_client
+    from azure_ai_toolkit.memory import MemoryCeiling, current_rss
+    from azure_ai_toolkit.throttling import RetryScheduler
+
+    concurrency = options["concurrency"]
+    client = get_text_analytics_client(options["endpoint"], KEY, pool_size=concurrency, retry_total=0)
+    scheduler = RetryScheduler(max_concurrency=concurrency)
+    # Every shrink is logged as a warning, which is expected here
+    logging.getLogger("azure_ai_toolkit.memory").setLevel(logging.ERROR)
+    ceiling = None
+    if options["max_memory_mb"] is not None:
+        # Sampled before every batch, so the check does not depend on timing
+        ceiling = MemoryCeiling(int(options["max_memory_mb"] * (1 << 20)), check_interval=0)
+    tracemalloc.start()
+    start = time.perf_counter()
+    with open(os.devnull, "wb") as output:
+        writer = writers.open_writer(output, "jsonl", "analyze_sentiment", options["include_sentences"])
+        count = cli.analyze_sentiment_bulk(client, options["input"], None, writer, concurrency, scheduler,
+                                           memory_ceiling=ceiling)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "documents": count,
+        "requests": scheduler.stats["requests"],
+        "seconds": round(seconds, 3),
+        "peak_traced_mb": round(peak / (1 << 20), 2),
+        "rss_mb": round((current_rss() or 0) / (1 << 20), 1),
+        "batches_shrunk": ceiling.stats["shrinks"] if ceiling else None,
+    }
+
+
+def run_scenario(options):
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", json.dumps(options)],
+        stdout=subprocess.PIPE, text=True, timeout=3600,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Run {options} exited with {result.returncode}")
+    return json.loads(result.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that bulk sentiment analysis runs in bounded memory.')
+    parser.add_argument('--documents', type=int, default=400, help='Documents in the full corpus.')
+    parser.add_argument('--concurrency', type=int, default=4, help='Requests in flight.')
+    parser.add_argument('--latency-ms', type=float, default=5.0, help='Simulated latency per request.')
+    parser.add_argument('--growth-limit', type=float, default=1.5,
+                        help='Largest allowed ratio of the peak for the full corpus to that for a quarter of it.')
+    parser.add_argument('--ceiling-mb', type=float, default=1.0,
+                        help='Memory ceiling of the ceiling run; below the footprint of any run, so batches shrink.')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(json.loads(args.child))))
+        return
+
+    # A quarter of the corpus must outlast the documents in flight, or the peaks cannot be compared
+    in_flight = args.concurrency * MAX_DOCUMENTS_PER_BATCH["analyze_sentiment"]
+    if args.documents // 4 < 2 * in_flight:
+        parser.error(f"--documents must be at least {8 * in_flight} with --concurrency {args.concurrency}")
+    full, quarter = args.documents, args.documents // 4
+    runs = {
+        "sentences_quarter": (quarter, True, None),
+        "sentences": (full, True, None),
+        "no_sentences": (full, False, None),
+        "ceiling": (full, True, args.ceiling_mb),
+    }
+    results = {}
+    failures = []
+    with tempfile.TemporaryDirectory() as workdir:
+        corpora = {}
+        for count in (full, quarter):
+            corpora[count] = os.path.join(workdir, f"corpus-{count}.txt")
+            write_corpus(corpora[count], count)
+        server, endpoint = start_simulator(latency=args.latency_ms / 1000)
+        try:
+            for name, (count, include_sentences, max_memory_mb) in runs.items():
+                results[name] = run_scenario({"endpoint": endpoint, "input": corpora[count],
+                                              "concurrency": args.concurrency,
+                                              "include_sentences": include_sentences,
+                                              "max_memory_mb": max_memory_mb})
+                if results[name]["documents"] != count:
+                    failures.append(f"{name}: wrote {results[name]['documents']} of {count} documents")
+        finally:
+            server.shutdown()
+
+    growth = results["sentences"]["peak_traced_mb"] / results["sentences_quarter"]["peak_traced_mb"]
+    if growth > args.growth_limit:
+        failures.append(f"peak grew {growth:.2f}x from a quarter to the full corpus (limit {args.growth_limit}x)")
+    if results["no_sentences"]["peak_traced_mb"] >= results["sentences"]["peak_traced_mb"]:
+        failures.append("leaving sentences out did not lower the peak")
+    if not results["ceiling"]["batches_shrunk"]:
+        failures.append("the memory ceiling never shrank batches")
+    if results["ceiling"]["peak_traced_mb"] >= results["sentences"]["peak_traced_mb"]:
+        failures.append("the memory ceiling did not lower the peak")
+
+    report = {
+        "settings": {"documents": args.documents, "document_characters": DOCUMENT_CHARACTERS,
+                     "concurrency": args.concurrency, "ceiling_mb": args.ceiling_mb},
+        "results": results,
+        "growth": round(growth, 2),
+        "failures": failures,
+    }
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+1Password Check
+---------------
+Runs the 1Password CLI client of secrets_handling/1p_vault_auth.py against
+the fake `op` in benchmarks/fake_op, which records every invocation, and
+fails if:
+
+- concurrent requests for the same item start more than one `op item get`,
+- requests for different items do not run in parallel,
+- fields retrieved once are fetched again while they are memoized,
+- a missing item does not resolve to None.
+
+Run from the repository root:
+
+    python benchmarks/onepassword_check.py --delay-ms 300
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+SCRIPT = os.path.join(ROOT, "secrets_handling", "1p_vault_auth.py")
+FAKE_OP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_op")
+ITEMS = {
+    "v/j": {"api_key": "key-j", "endpoint": "https://j.example.com/"},
+    "v/k": {"api_key": "key-k", "endpoint": "https://k.example.com/"},
+}
+
+
+def load_module():
+    # The file name starts with a digit, so it cannot be imported by name
+    spec = importlib.util.spec_from_file_location("onepassword_vault_auth", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def invocations(log_path):
+    """Return and clear the invocations the fake `op` recorded."""
+    with open(log_path) as f:
+        calls = [json.loads(line) for line in f]
+    open(log_path, "w").close()
+    return calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that the 1Password client merges and parallelizes CLI calls.')
+    parser.add_argument('--delay-ms', type=float, default=300.0, help='Simulated latency of each `op` invocation.')
+    args = parser.parse_args()
+
+    results = {}
+    failures = []
+    with tempfile.TemporaryDirectory() as workdir:
+        items_path = os.path.join(workdir, "items.json")
+        log_path = os.path.join(workdir, "invocations.jsonl")
+        with open(items_path, "w") as f:
+            json.dump(ITEMS, f)
+        open(log_path, "w").close()
+        os.environ.update({"FAKE_OP_ITEMS": items_path, "FAKE_OP_LOG": log_path,
+                           "FAKE_OP_DELAY_MS": str(args.delay_ms)})
+        os.environ["PATH"] = FAKE_OP_DIR + os.pathsep + os.environ["PATH"]
+
+        module = load_module()
+        # Failures of the missing item are expected
+        module.logger.setLevel(logging.CRITICAL)
+        client_class = module.OnePasswordCLIClient
+
+        # Memoization off, so only merging can avoid the second invocation
+        client = client_class(cache_ttl=0)
+        values = asyncio.run(client.get_items_async([
+            ("v", "j", ["api_key", "endpoint"]),
+            ("v", "j", ["api_key"]),
+        ]))
+        results["same_item"] = {"invocations": len(invocations(log_path)), "values": values}
+        if results["same_item"]["invocations"] != 1:
+            failures.append(f"concurrent requests for one item started {results['same_item']['invocations']} "
+                            "`op item get` processes")
+        if values != [ITEMS["v/j"], {"api_key": "key-j"}]:
+            failures.append(f"concurrent requests for one item returned {values}")
+
+        start = time.perf_counter()
+        values = asyncio.run(client.get_items_async([
+            ("v", "j", ["api_key"]),
+            ("v", "k", ["api_key"]),
+        ]))
+        seconds = time.perf_counter() - start
+        results["two_items"] = {"invocations": len(invocations(log_path)), "seconds": round(seconds, 3)}
+        if values != [{"api_key": "key-j"}, {"api_key": "key-k"}]:
+            failures.append(f"requests for two items returned {values}")
+        # In series the two invocations would take at least twice the delay
+        if seconds >= 2 * args.delay_ms / 1000:
+            failures.append(f"requests for two items took {seconds:.3f} s, so they did not run in parallel")
+
+        client_class._item_cache.clear()
+        client = client_class()
+        client.get_fields("v", "j", ["api_key", "endpoint"])
+        first = len(invocations(log_path))
+        values = client.get_fields("v", "j", ["endpoint"])
+        results["memoized"] = {"first": first, "second": len(invocations(log_path))}
+        if results["memoized"]["second"] or values != {"endpoint": ITEMS["v/j"]["endpoint"]}:
+            failures.append("fields retrieved once were fetched again")
+
+        values = asyncio.run(client.get_items_async([("v", "missing", ["api_key"])]))
+        invocations(log_path)
+        if values != [{"api_key": None}]:
+            failures.append(f"a missing item returned {values}")
+
+    report = {
+        "settings": {"delay_ms": args.delay_ms},
+        "results": results,
+        "failures": failures,
+    }
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Benchmark Suite
+---------------
+Measures the sentiment analysis, language detection and Key Vault paths
+against the local simulator, so runs need no Azure subscription and are
+comparable across versions. Every scenario runs in its own process and
+reports:
+
+- throughput (documents or secrets per second),
+- p50/p99 latency of the individual service requests, as seen by the client,
+- peak resident memory of the process,
+
+and the wall-clock start-up time of each CLI (`--help`) is measured too. The
+simulator's latency, jitter, throttling and error rates are configurable.
+
+Run from the repository root:
+
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --baseline results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+from azure_ai_toolkit.simulator import create_self_signed_certificate, start_simulator
+
+KEY = "benchmark-key"
+SCENARIOS = ("analyze_sentiment", "detect_language", "key_vault")
+CLIS = {
+    "terraform": os.path.join(ROOT, "deployment", "terraform", "azure_ai_sentiment_analysis.py"),
+    "bicep": os.path.join(ROOT, "deployment", "bicep", "azure_ai_sentiment_analysis.py"),
+    "azure_vault_auth": os.path.join(ROOT, "secrets_handling", "azure_vault_auth.py"),
+}
+SECRETS = {"AI-SERVICE-ENDPOINT": "http://127.0.0.1", "AI-SERVICE-KEY": KEY}
+
+SENTIMENT_TEXTS = [
+    "The deployment was fast and the team was great",
+    "Support was slow and the portal is broken",
+    "The invoice arrived on Tuesday",
+    "I love how simple the new pipeline is",
+    "Worst upgrade so far, everything is slow",
+]
+LANGUAGE_TEXTS = [
+    "The weather is nice today and we are going out",
+    "El servicio es muy bueno y la comida también",
+    "Le service est très rapide et les prix sont bas",
+    "Der Zug ist nicht pünktlich und das ist sehr ärgerlich",
+]
+
+
+def write_documents(path, texts, count, seed=0):
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            # Unique texts, so nothing is answered without a request
+            f.write(f"{rng.choice(texts)} ({i})\n")
+
+
+class TimedClient:
+    """Wraps a client and records the latency of every service call in milliseconds."""
+
+    def __init__(self, client):
+        self._client = client
+        self.latencies = []
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        method = getattr(self._client, name)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.latencies.append((time.perf_counter() - start) * 1000)
+
+        return timed
+
+
+class StaticTokenCredential:
+    """Hands out a fixed bearer token; the simulator accepts any token."""
+
+    def get_token(self, *scopes, **kwargs):
+        from azure.core.credentials import AccessToken
+
+        return AccessToken("benchmark-token", int(time.time()) + 3600)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else None
+
+
+def peak_memory_mb():
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return round(peak / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1)
+
+
+def summarize(items, seconds, latencies, unit):
+    return {
+        unit: items,
+        "seconds": round(seconds, 3),
+        f"{unit}_per_sec": round(items / seconds, 1) if seconds else None,
+        "requests": len(latencies),
+        "p50_ms": round(percentile(latencies, 0.5), 3) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99), 3) if latencies else None,
+        "peak_memory_mb": peak_memory_mb(),
+    }
+
+
+def run_text_analytics(options):
+    """Child process: run one bulk operation through the pipeline the CLIs use."""
+    from azure_ai_toolkit import batching, bulk, cli, writers
+    from azure_ai_toolkit.clients import DEFAULT_POOL_SIZE, get_text_analytics_client
+    from azure_ai_toolkit.throttling import RetryScheduler
+
+    operation = options["scenario"]
+    concurrency = options["concurrency"]
+    client = TimedClient(get_text_analytics_client(
+        options["endpoint"], KEY, pool_size=max(concurrency, DEFAULT_POOL_SIZE), retry_total=0
+    ))
+    scheduler = RetryScheduler(max_concurrency=concurrency)
+    start = time.perf_counter()
+    with open(os.devnull, "wb") as output:
+        writer = writers.open_writer(output, "jsonl", operation)
+        if operation == "analyze_sentiment":
+            count = cli.analyze_sentiment_bulk(client, options["input"], None, writer, concurrency, scheduler)
+        else:
+            documents = batching.read_documents(options["input"])
+            batches = batching.iter_batches(documents, max_documents=batching.MAX_DOCUMENTS_PER_BATCH[operation])
+            count = writers.write_records(bulk.run_bulk(client, operation, batches, concurrency, scheduler), writer)
+    return summarize(count, time.perf_counter() - start, client.latencies, "documents")
+
+
+def run_key_vault(options):
+    """Child process: fetch the scripts' secrets with a cold cache, repeatedly."""
+    from azure_ai_toolkit.key_vault import SecretCache
+
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(options["rounds"]):
+        # A new cache per round, so every round goes to the vault
+        cache = SecretCache(options["vault_url"], credential=StaticTokenCredential(),
+                            connection_verify=options["certfile"], verify_challenge_resource=False)
+        round_start = time.perf_counter()
+        cache.get_many(SECRETS)
+        latencies.append((time.perf_counter() - round_start) * 1000)
+    result = summarize(options["rounds"] * len(SECRETS), time.perf_counter() - start, latencies, "secrets")
+    # Latencies are of fetching all secrets concurrently, as the CLIs do
+    result["fetches"] = result.pop("requests")
+    return result
+
+
+def run_child(options):
+    if options["scenario"] == "key_vault":
+        return run_key_vault(options)
+    return run_text_analytics(options)
+
+
+def run_scenario(options):
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", json.dumps(options)],
+        stdout=subprocess.PIPE, text=True, timeout=3600,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Scenario {options['scenario']} exited with {result.returncode}")
+    return json.loads(result.stdout)
+
+
+def measure_startup(runs):
+    """Median wall-clock milliseconds of `--help` for each CLI."""
+    results = {}
+    for name, script in CLIS.items():
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, script, "--help"], stdout=subprocess.DEVNULL, check=True, timeout=120)
+            timings.append((time.perf_counter() - start) * 1000)
+        results[name] = {"help_ms": round(statistics.median(timings), 1)}
+    return results
+
+
+def flatten(results, prefix=""):
+    flat = {}
+    for name, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[prefix + name] = value
+    return flat
+
+
+def compare(results, baseline):
+    """Relative change of every numeric metric present in both runs."""
+    current, previous = flatten(results), flatten(baseline)
+    return {name: round((value - previous[name]) / previous[name], 3)
+            for name, value in current.items() if previous.get(name)}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the example scripts against the local simulator.')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS + ("startup",),
+                        default=list(SCENARIOS) + ["startup"], help='Scenarios to run (default: all).')
+    parser.add_argument('--documents', type=int, default=2000, help='Documents per Text Analytics scenario.')
+    parser.add_argument('--concurrency', type=int, default=4, help='Requests in flight.')
+    parser.add_argument('--key-vault-rounds', type=int, default=100, help='Cold fetches of the secrets.')
+    parser.add_argument('--startup-runs', type=int, default=5, help='Runs per CLI for the start-up time.')
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='Simulated latency per request.')
+    parser.add_argument('--jitter-ms', type=float, default=10.0, help='Random extra latency per request, up to this.')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Fraction of requests throttled (429).')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests failing with 500.')
+    parser.add_argument('--document-error-rate', type=float, default=0.0,
+                        help='Fraction of documents failing individually.')
+    parser.add_argument('--retry-after', type=float, default=0.2, help='Retry-After of throttled responses.')
+    parser.add_argument('--output', help='Also write the results to this JSON file.')
+    parser.add_argument('--baseline', help='Results of an earlier run to report relative changes against.')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(json.loads(args.child))))
+        return
+
+    simulation = {
+        "latency": args.latency_ms / 1000,
+        "jitter": args.jitter_ms / 1000,
+        "throttle_rate": args.throttle_rate,
+        "error_rate": args.error_rate,
+        "document_error_rate": args.document_error_rate,
+        "retry_after": args.retry_after,
+    }
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        server, endpoint = start_simulator(**simulation)
+        certfile, keyfile = create_self_signed_certificate(workdir)
+        vault, vault_url = start_simulator(certfile=certfile, keyfile=keyfile, secrets=SECRETS, **simulation)
+        try:
+            for scenario in SCENARIOS:
+                if scenario not in args.scenarios:
+                    continue
+                options = {"scenario": scenario, "concurrency": args.concurrency}
+                if scenario == "key_vault":
+                    options.update(vault_url=vault_url + "/", certfile=certfile, rounds=args.key_vault_rounds)
+                else:
+                    options.update(endpoint=endpoint, input=os.path.join(workdir, f"{scenario}.txt"))
+                    texts = SENTIMENT_TEXTS if scenario == "analyze_sentiment" else LANGUAGE_TEXTS
+                    write_documents(options["input"], texts, args.documents)
+                results[scenario] = run_scenario(options)
+        finally:
+            server.shutdown()
+            vault.shutdown()
+    if "startup" in args.scenarios:
+        results["startup"] = measure_startup(args.startup_runs)
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {
+            "documents": args.documents,
+            "concurrency": args.concurrency,
+            "key_vault_rounds": args.key_vault_rounds,
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "throttle_rate": args.throttle_rate,
+            "error_rate": args.error_rate,
+            "document_error_rate": args.document_error_rate,
+        },
+        "results": results,
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["change"] = compare(results, json.load(f)["results"])
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
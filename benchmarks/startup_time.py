@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Startup Time Check
+------------------
+Runs the sentiment CLIs under `python -X importtime` on the paths that should
+never load the Azure SDK - `--help` and a bulk run answered entirely from the
+result cache - and fails if any azure.* module is imported or the total import
+time exceeds the budget.
+
+Run from the repository root:
+
+    python benchmarks/startup_time.py --budget-ms 150
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from azure_ai_toolkit.simulator import start_simulator
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+SCRIPTS = {
+    "terraform": os.path.join(ROOT, "deployment", "terraform", "azure_ai_sentiment_analysis.py"),
+    "bicep": os.path.join(ROOT, "deployment", "bicep", "azure_ai_sentiment_analysis.py"),
+}
+# Nothing listens here, so a cache miss would fail the run instead of hiding
+UNREACHABLE_ENDPOINT = "http://127.0.0.1:9"
+
+_IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+
+def parse_importtime(stderr):
+    """Return (top-level cumulative microseconds, imported module names)."""
+    total_us = 0
+    modules = []
+    for line in stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if not match:
+            continue
+        cumulative, indent, module = int(match.group(2)), match.group(3), match.group(4)
+        modules.append(module)
+        if len(indent) == 1:
+            total_us += cumulative
+    return total_us, modules
+
+
+def run(script, args, cwd):
+    env = dict(os.environ, AI_SERVICES_KEY="startup-check-key")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", script] + args,
+        cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, timeout=120,
+    )
+    total_us, modules = parse_importtime(result.stderr)
+    return {
+        "returncode": result.returncode,
+        "import_ms": round(total_us / 1000, 1),
+        "azure_modules": sorted(m for m in modules if m == "azure" or m.startswith("azure.")),
+    }
+
+
+def check_script(script, workdir):
+    input_path = os.path.join(workdir, "input.txt")
+    cache_path = os.path.join(workdir, "cache.db")
+    with open(input_path, "w") as f:
+        for i in range(20):
+            f.write(f"Startup check document {i} is great\n")
+
+    # Warm the cache against the simulator, then replay against a dead endpoint
+    server, endpoint = start_simulator()
+    try:
+        warm = run(script, ["--input", input_path, "--output", os.devnull,
+                            "--endpoint", endpoint, "--cache", cache_path], workdir)
+    finally:
+        server.shutdown()
+    if warm["returncode"] != 0:
+        raise RuntimeError(f"Warming the cache with {script} failed")
+
+    return {
+        "help": run(script, ["--help"], workdir),
+        "cache_hit_run": run(script, ["--input", input_path, "--output", os.devnull,
+                                      "--endpoint", UNREACHABLE_ENDPOINT, "--cache", cache_path], workdir),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that the sentiment CLIs start without loading the Azure SDK.')
+    parser.add_argument('--budget-ms', type=float, default=150.0, help='Maximum total import time per run.')
+    args = parser.parse_args()
+
+    results = {}
+    failures = []
+    for name, script in SCRIPTS.items():
+        with tempfile.TemporaryDirectory() as workdir:
+            results[name] = check_script(script, workdir)
+        for path, result in results[name].items():
+            if result["returncode"] != 0:
+                failures.append(f"{name} {path}: exited with {result['returncode']}")
+            if result["azure_modules"]:
+                failures.append(f"{name} {path}: imported {', '.join(result['azure_modules'][:5])}")
+            if result["import_ms"] > args.budget_ms:
+                failures.append(f"{name} {path}: {result['import_ms']} ms of imports exceeds {args.budget_ms} ms")
+
+    print(json.dumps({"budget_ms": args.budget_ms, "results": results, "failures": failures}, indent=2))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,58 +7,61 @@ and performs sentiment analysis using Azure AI Text Analytics
 """
 
 import os
-import json
 import sys
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
-from azure.ai.textanalytics import TextAnalyticsClient
-from azure.core.credentials import AzureKeyCredential
 
-def load_deployment_config():
+# Shared helpers live in the azure_ai_toolkit package at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from azure_ai_toolkit import cli, endpoints, key_vault
+from azure_ai_toolkit.clients import get_text_analytics_client
+from azure_ai_toolkit.config import resolve_config, ConfigError, DEPLOYMENT_CONFIG_FILE
+
+def load_deployment_config(overrides=None, interactive=None):
     """
-    Load deployment configuration from JSON file or environment variables
+    Load deployment configuration from command line flags, environment
+    variables or deployment_config.json, prompting only when attached to a terminal
     """
     try:
-        # Try loading from file first
-        with open('deployment_config.json', 'r') as config_file:
-            return json.load(config_file)
-    except FileNotFoundError:
-        # Fallback to environment variables
-        config = {
-            'KEY_VAULT_NAME': os.environ.get('KEY_VAULT_NAME', ''),
-            'AI_SERVICES_NAME': os.environ.get('AI_SERVICES_NAME', '')
-        }
-        
-        # Validate configuration
-        if not config['KEY_VAULT_NAME'] or not config['AI_SERVICES_NAME']:
-            print("❌ Unable to find deployment configuration")
-            print("Please ensure deployment_config.json exists or environment variables are set")
-            sys.exit(1)
-        
-        return config
+        config, source = resolve_config(
+            overrides,
+            files=(DEPLOYMENT_CONFIG_FILE,),
+            interactive=interactive
+        )
+    except ConfigError as e:
+        print(f"❌ Unable to find deployment configuration: {str(e)}")
+        print("Please ensure deployment_config.json exists or environment variables are set")
+        sys.exit(1)
 
-def get_credentials_from_keyvault(config):
+    print(f"📋 Loaded configuration from {source}")
+    return config
+
+def get_credentials_from_keyvault(config, resources=1, on_rotation=None):
     """
-    Retrieves AI service credentials from Azure Key Vault using DefaultAzureCredential
+    Retrieves AI service credentials from Azure Key Vault using DefaultAzureCredential,
+    as (endpoint, key) pairs of one or more AI Services resources. on_rotation
+    is called with (name, value) when a secret is later found to have changed
     """
     try:
-        # Create a credential object using DefaultAzureCredential
-        credential = DefaultAzureCredential()
-        
-        # Create a secret client to access the Key Vault
         key_vault_uri = f"https://{config['KEY_VAULT_NAME']}.vault.azure.net/"
-        secret_client = SecretClient(vault_url=key_vault_uri, credential=credential)
+        # Further resources are stored as <name>-key-2, <name>-endpoint-2, ...
+        key_names = endpoints.numbered_names(f"{config['AI_SERVICES_NAME']}-key", resources)
+        endpoint_names = endpoints.numbered_names(f"{config['AI_SERVICES_NAME']}-endpoint", resources)
         
-        # Retrieve the AI service key and endpoint from Key Vault
-        ai_key = secret_client.get_secret(f"{config['AI_SERVICES_NAME']}-key").value
-        ai_endpoint = secret_client.get_secret(f"{config['AI_SERVICES_NAME']}-endpoint").value
+        # Retrieve the AI service keys and endpoints concurrently, with a single
+        # process-wide DefaultAzureCredential and an in-memory secret cache
+        secret_cache = key_vault.get_secret_cache(key_vault_uri)
+        if on_rotation:
+            secret_cache.add_refresh_listener(on_rotation)
+        secrets = secret_cache.get_many(key_names + endpoint_names)
+        credentials = [(secrets[endpoint_name], secrets[key_name])
+                       for endpoint_name, key_name in zip(endpoint_names, key_names)]
         
         print(f"✅ Successfully retrieved credentials from Key Vault")
         print(f"   Vault: {config['KEY_VAULT_NAME']}")
         print(f"   AI Service: {config['AI_SERVICES_NAME']}")
-        print(f"   Endpoint: {ai_endpoint}")  # Add this line to print the endpoint
+        for ai_endpoint, _ in credentials:
+            print(f"   Endpoint: {ai_endpoint}")  # Add this line to print the endpoint
         
-        return ai_key, ai_endpoint
+        return credentials
     except Exception as e:
         print(f"❌ Error retrieving credentials from Key Vault: {str(e)}")
         sys.exit(1)
@@ -73,11 +76,8 @@ def analyze_sentiment(key, endpoint, text):
         print(f"   Key Length: {len(key)}")
         print(f"   Endpoint: {endpoint}")
 
-        # Create a client for Text Analytics with the retrieved credentials
-        text_analytics_client = TextAnalyticsClient(
-            endpoint=endpoint,
-            credential=AzureKeyCredential(key)
-        )
+        # Reuse the process-wide client (and its connection pool) for this endpoint
+        text_analytics_client = get_text_analytics_client(endpoint, key)
         
         # Analyze sentiment of the provided text
         documents = [text]
@@ -102,19 +102,36 @@ def analyze_sentiment(key, endpoint, text):
         traceback.print_exc()
         sys.exit(1)
 
-def main():
+def load_credentials(args, on_rotation=None):
     """
-    Main execution function for sentiment analysis
+    Return (endpoint, key) pairs of the AI Services resources from Key Vault,
+    calling on_rotation when a secret later changes
     """
     print("🔑 Loading deployment configuration...")
-    config = load_deployment_config()
-    
+    config = load_deployment_config(
+        {'KEY_VAULT_NAME': args.key_vault_name, 'AI_SERVICES_NAME': args.ai_services_name},
+        interactive=False if args.non_interactive else None
+    )
+
     print("🔐 Retrieving credentials from Azure Key Vault...")
-    key, endpoint = get_credentials_from_keyvault(config)
+    return get_credentials_from_keyvault(config, args.resources, on_rotation)
+
+def run_interactive(args):
+    """
+    Analyze the sentiment of a single text
+    """
+    # A single text needs a single resource
+    endpoint, key = cli.resolve_credentials(args, load_credentials)[0]
     
     print("\n📊 Performing sentiment analysis...")
     text_to_analyze = "Just say NO to click-ops deployments"
     analyze_sentiment(key, endpoint, text_to_analyze)
 
+def main():
+    """
+    Main execution function for sentiment analysis
+    """
+    cli.main(load_credentials, run_interactive, banner=False)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -7,104 +7,69 @@ and performs sentiment analysis using Azure AI Text Analytics
 """
 
 import os
-import json
 import sys
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
-from azure.ai.textanalytics import TextAnalyticsClient
-from azure.core.credentials import AzureKeyCredential
 
-def load_terraform_output():
+# Shared helpers live in the azure_ai_toolkit package at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from azure_ai_toolkit import cli, endpoints, key_vault
+from azure_ai_toolkit.clients import get_text_analytics_client
+from azure_ai_toolkit.config import resolve_config, ConfigError, TERRAFORM_OUTPUTS_FILE, DEPLOYMENT_CONFIG_FILE
+
+def load_terraform_output(overrides=None, interactive=None):
     """
-    Load information from Terraform's deployment-outputs.json file
+    Resolve the Key Vault and AI Services names from command line flags,
+    environment variables, Terraform's deployment-outputs.json or
+    deployment_config.json, prompting only when attached to a terminal
     """
     try:
-        # Try loading from terraform output file
-        with open('deployment-outputs.json', 'r') as config_file:
-            tf_output = json.load(config_file)
-            
-            # Extract Key Vault and AI Services names from Terraform output
-            key_vault_name = tf_output.get('key_vault', {}).get('value', {}).get('name', '')
-            ai_services_name = tf_output.get('ai_services', {}).get('value', {}).get('name', '')
-            
-            config = {
-                'KEY_VAULT_NAME': key_vault_name,
-                'AI_SERVICES_NAME': ai_services_name
-            }
-            
-            print(f"📋 Loaded configuration from Terraform output:")
-            print(f"   Key Vault: {key_vault_name}")
-            print(f"   AI Service: {ai_services_name}")
-            
-            # Validate configuration
-            if not config['KEY_VAULT_NAME'] or not config['AI_SERVICES_NAME']:
-                raise ValueError("Missing required configuration values")
-                
-            return config
-            
-    except (FileNotFoundError, json.JSONDecodeError, ValueError) as e:
-        print(f"❌ Error loading Terraform output: {str(e)}")
-        
-        # Try loading from deployment_config.json instead
-        try:
-            with open('deployment_config.json', 'r') as config_file:
-                config = json.load(config_file)
-                print(f"📋 Loaded configuration from deployment_config.json:")
-                print(f"   Key Vault: {config.get('KEY_VAULT_NAME', '')}")
-                print(f"   AI Service: {config.get('AI_SERVICES_NAME', '')}")
-                
-                # Validate configuration
-                if not config.get('KEY_VAULT_NAME') or not config.get('AI_SERVICES_NAME'):
-                    raise ValueError("Missing required configuration values")
-                    
-                return config
-        except (FileNotFoundError, json.JSONDecodeError, ValueError) as e2:
-            print(f"❌ Error loading deployment_config.json: {str(e2)}")
-        
-        # Fallback to manual input
-        print("\n⌨️ Please provide the required information manually:")
-        key_vault_name = input("Key Vault Name: ")
-        ai_services_name = input("AI Services Name: ")
-        
-        config = {
-            'KEY_VAULT_NAME': key_vault_name,
-            'AI_SERVICES_NAME': ai_services_name
-        }
-        
-        if not config['KEY_VAULT_NAME'] or not config['AI_SERVICES_NAME']:
-            print("❌ Required configuration values not provided")
-            sys.exit(1)
-            
-        return config
+        config, source = resolve_config(
+            overrides,
+            files=(TERRAFORM_OUTPUTS_FILE, DEPLOYMENT_CONFIG_FILE),
+            interactive=interactive
+        )
+    except ConfigError as e:
+        print(f"❌ Error loading configuration: {str(e)}")
+        sys.exit(1)
+
+    print(f"📋 Loaded configuration from {source}:")
+    print(f"   Key Vault: {config['KEY_VAULT_NAME']}")
+    print(f"   AI Service: {config['AI_SERVICES_NAME']}")
+    return config
 
-def get_credentials_from_keyvault(config):
+def get_credentials_from_keyvault(config, resources=1, on_rotation=None):
     """
-    Retrieves AI service credentials from Azure Key Vault using DefaultAzureCredential
+    Retrieves AI service credentials from Azure Key Vault using DefaultAzureCredential,
+    as (endpoint, key) pairs of one or more AI Services resources. on_rotation
+    is called with (name, value) when a secret is later found to have changed
     """
     try:
         print(f"🔐 Attempting to connect to Key Vault: {config['KEY_VAULT_NAME']}")
         
-        # Create a credential object using DefaultAzureCredential
-        credential = DefaultAzureCredential()
-        
-        # Create a secret client to access the Key Vault
         key_vault_uri = f"https://{config['KEY_VAULT_NAME']}.vault.azure.net/"
-        secret_client = SecretClient(vault_url=key_vault_uri, credential=credential)
         
         # Try to get the secret names from the configuration
         ai_key_name = "ai-services-key"  # Based on the Terraform configuration
         ai_endpoint_name = "ai-services-endpoint"  # Based on the Terraform configuration
         
-        print(f"🔑 Retrieving secrets: {ai_key_name}, {ai_endpoint_name}")
+        # Further resources are stored as ai-services-key-2, ai-services-endpoint-2, ...
+        key_names = endpoints.numbered_names(ai_key_name, resources)
+        endpoint_names = endpoints.numbered_names(ai_endpoint_name, resources)
+        print(f"🔑 Retrieving secrets: {', '.join(key_names + endpoint_names)}")
         
-        # Retrieve the AI service key and endpoint from Key Vault
-        ai_key = secret_client.get_secret(ai_key_name).value
-        ai_endpoint = secret_client.get_secret(ai_endpoint_name).value
+        # Retrieve the AI service keys and endpoints concurrently, with a single
+        # process-wide DefaultAzureCredential and an in-memory secret cache
+        secret_cache = key_vault.get_secret_cache(key_vault_uri)
+        if on_rotation:
+            secret_cache.add_refresh_listener(on_rotation)
+        secrets = secret_cache.get_many(key_names + endpoint_names)
+        credentials = [(secrets[endpoint_name], secrets[key_name])
+                       for endpoint_name, key_name in zip(endpoint_names, key_names)]
         
         print(f"✅ Successfully retrieved credentials from Key Vault")
-        print(f"   Endpoint: {ai_endpoint}")
+        for ai_endpoint, _ in credentials:
+            print(f"   Endpoint: {ai_endpoint}")
         
-        return ai_key, ai_endpoint
+        return credentials
     except Exception as e:
         print(f"❌ Error retrieving credentials from Key Vault: {str(e)}")
         print("\n🔍 Troubleshooting tips:")
@@ -118,11 +83,8 @@ def analyze_sentiment(key, endpoint, text):
     Performs sentiment analysis on the provided text using Azure AI Text Analytics
     """
     try:
-        # Create a client for Text Analytics with the retrieved credentials
-        text_analytics_client = TextAnalyticsClient(
-            endpoint=endpoint,
-            credential=AzureKeyCredential(key)
-        )
+        # Reuse the process-wide client (and its connection pool) for this endpoint
+        text_analytics_client = get_text_analytics_client(endpoint, key)
         
         # Analyze sentiment of the provided text
         documents = [text]
@@ -147,16 +109,27 @@ def analyze_sentiment(key, endpoint, text):
         traceback.print_exc()
         sys.exit(1)
 
-def main():
+def load_credentials(args, on_rotation=None):
     """
-    Main execution function for sentiment analysis
+    Return (endpoint, key) pairs of the AI Services resources from Key Vault,
+    calling on_rotation when a secret later changes
     """
-    print("=== Azure AI Services Sentiment Analysis ===")
     print("🔍 Loading configuration from Terraform output...")
-    config = load_terraform_output()
-    
+    config = load_terraform_output(
+        {'KEY_VAULT_NAME': args.key_vault_name, 'AI_SERVICES_NAME': args.ai_services_name},
+        interactive=False if args.non_interactive else None
+    )
+
     print("\n🔐 Retrieving credentials from Azure Key Vault...")
-    key, endpoint = get_credentials_from_keyvault(config)
+    return get_credentials_from_keyvault(config, args.resources, on_rotation)
+
+def run_interactive(args):
+    """
+    Analyze the sentiment of a single text
+    """
+    print("=== Azure AI Services Sentiment Analysis ===")
+    # A single text needs a single resource
+    endpoint, key = cli.resolve_credentials(args, load_credentials)[0]
     
     # Let the user enter text for analysis
     print("\n⌨️ Enter text for sentiment analysis (or press Enter for default):")
@@ -166,6 +139,11 @@ def main():
     print("\n📊 Performing sentiment analysis...")
     analyze_sentiment(key, endpoint, text_to_analyze)
 
+def main():
+    """
+    Main execution function for sentiment analysis
+    """
+    cli.main(load_credentials, run_interactive)
+
 if __name__ == "__main__":
     main()
-    
\ No newline at end of file
@@ -1,11 +1,23 @@
 #!/usr/bin/env python3
 
+import asyncio
 import json
 import logging
+import os
 import subprocess
-from typing import Optional, Union, List, Dict
-from azure.ai.textanalytics import TextAnalyticsClient
-from azure.core.credentials import AzureKeyCredential
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING, Optional, Union, List, Dict, Tuple
+
+if TYPE_CHECKING:
+    # The SDK is loaded lazily by get_text_analytics_client
+    from azure.ai.textanalytics import TextAnalyticsClient
+
+# Shared helpers live in the azure_ai_toolkit package at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from azure_ai_toolkit.clients import get_text_analytics_client
+from azure_ai_toolkit.endpoints import EndpointPool, create_pool
 
 # Global parameters for easy modification (for demo purposes)
 LOG_LEVEL = logging.INFO  # Set to logging.DEBUG to see secret values
@@ -13,6 +25,7 @@ VAULT_NAME = "demo"  # Vault name in 1Password
 ITEM_NAME = "CognitiveServices"  # Item name in 1Password
 API_KEY_FIELD = "api_key"  # Field for Cognitive Services API key
 ENDPOINT_FIELD = "endpoint"  # Field for Cognitive Services endpoint
+EXTRA_ITEM_NAMES: List[str] = []  # Items of further resources to balance requests across
 
 # Configure logging with global log level
 logging.basicConfig(
@@ -25,9 +38,118 @@ logger = logging.getLogger(__name__)
 class OnePasswordCLIClient:
     """A client to interact with 1Password CLI for secret retrieval."""
 
-    def __init__(self, cli_executable: str = "op"):
-        """Initialize the client with the CLI executable path."""
+    # Parsed item fields shared by all clients of the process:
+    # (cli_executable, vault, item) -> (fields, expiry)
+    _item_cache: Dict[Tuple[str, str, str], Tuple[Dict[str, str], float]] = {}
+    _item_cache_lock = threading.Lock()
+
+    def __init__(self, cli_executable: str = "op", cache_ttl: float = 300, timeout: float = 10):
+        """
+        Initialize the client with the CLI executable path.
+
+        Args:
+            cli_executable: Name or path of the 1Password CLI.
+            cache_ttl: Seconds retrieved fields are memoized for the process
+                (0 disables memoization).
+            timeout: Seconds to wait for each CLI invocation.
+        """
         self.cli_executable = cli_executable
+        self.cache_ttl = cache_ttl
+        self.timeout = timeout
+        # (vault, item) -> future of the fields an async CLI invocation in progress fetches
+        self._in_flight: Dict[Tuple[str, str], "asyncio.Future"] = {}
+
+    def _command(self, vault: str, item: str, fields: List[str]) -> List[str]:
+        return [
+            self.cli_executable, "item", "get", item,
+            "--vault", vault,
+            "--fields", ",".join(fields),
+            "--format", "json"
+        ]
+
+    @staticmethod
+    def _parse_fields(stdout: str, fields: List[str]) -> Dict[str, str]:
+        """Map requested field labels to values from `op item get --fields` JSON output."""
+        output: Union[Dict, List[Dict]] = json.loads(stdout)
+        logger.debug("Raw CLI output: %s", output)
+
+        if isinstance(output, dict):
+            output = [output]
+        elif not isinstance(output, list):
+            logger.error("Unexpected output type: %s", type(output))
+            return {}
+
+        values = {}
+        for field_data in output:
+            if field_data.get("label") in fields:
+                values[field_data["label"]] = field_data.get("value")
+        for field in fields:
+            if field not in values:
+                logger.warning("Field '%s' not found in CLI output", field)
+        return values
+
+    def _cached_fields(self, vault: str, item: str) -> Dict[str, str]:
+        with self._item_cache_lock:
+            entry = self._item_cache.get((self.cli_executable, vault, item))
+            if entry is None or entry[1] <= time.monotonic():
+                return {}
+            return dict(entry[0])
+
+    def _remember(self, vault: str, item: str, values: Dict[str, str]):
+        if not self.cache_ttl or not values:
+            return
+        key = (self.cli_executable, vault, item)
+        with self._item_cache_lock:
+            cached = self._item_cache.get(key)
+            fields = dict(cached[0]) if cached and cached[1] > time.monotonic() else {}
+            fields.update(values)
+            self._item_cache[key] = (fields, time.monotonic() + self.cache_ttl)
+
+    def get_fields(
+        self, vault: str, item: str, fields: List[str]
+    ) -> Dict[str, Optional[str]]:
+        """
+        Retrieve several fields of a 1Password item with a single CLI invocation.
+
+        Fields memoized by an earlier call are served from memory; only the
+        missing ones are requested from the CLI.
+
+        Args:
+            vault: Name of the vault containing the item.
+            item: Name or ID of the item (secret).
+            fields: Names of the fields containing the secret values.
+
+        Returns:
+            A dict mapping each requested field to its value, or to None if
+            retrieval fails.
+        """
+        values = self._cached_fields(vault, item)
+        missing = [field for field in fields if field not in values]
+        if missing:
+            command = self._command(vault, item, missing)
+            try:
+                logger.debug("Executing command: %s", " ".join(command))
+                result = subprocess.run(
+                    command,
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                    timeout=self.timeout
+                )
+                fetched = self._parse_fields(result.stdout, missing)
+                self._remember(vault, item, fetched)
+                values.update(fetched)
+
+            except subprocess.CalledProcessError as e:
+                logger.error("CLI command failed: %s", e.stderr)
+            except subprocess.TimeoutExpired as e:
+                logger.error("CLI command timed out: %s", e.stderr)
+            except json.JSONDecodeError as e:
+                logger.error("Failed to parse CLI output: %s", e)
+            except Exception as e:
+                logger.exception("Unexpected error retrieving secret: %s", e)
+
+        return {field: values.get(field) for field in fields}
 
     def get_secret(
         self, vault: str, item: str, field: str
@@ -43,85 +165,127 @@ class OnePasswordCLIClient:
         Returns:
             The secret value as a string, or None if retrieval fails.
         """
-        command = [
-            self.cli_executable, "item", "get", item,
-            "--vault", vault,
-            "--fields", field,
-            "--format", "json"
-        ]
+        return self.get_fields(vault, item, [field])[field]
 
-        try:
-            logger.debug("Executing command: %s", " ".join(command))
-            result = subprocess.run(
-                command,
-                capture_output=True,
-                text=True,
-                check=True,
-                timeout=10
-            )
-
-            output: Union[Dict, List[Dict]] = json.loads(result.stdout)
-            logger.debug("Raw CLI output: %s", output)
-
-            if isinstance(output, dict):
-                if output.get("label") == field:
-                    return output.get("value")
-                logger.warning("Field '%s' not found in single-field output", field)
-                return None
-            elif isinstance(output, list):
-                for field_data in output:
-                    if field_data.get("label") == field:
-                        return field_data.get("value")
-                logger.warning("Field '%s' not found in multi-field output", field)
-                return None
-            else:
-                logger.error("Unexpected output type: %s", type(output))
-                return None
-
-        except subprocess.CalledProcessError as e:
-            logger.error("CLI command failed: %s", e.stderr)
-            return None
-        except subprocess.TimeoutExpired as e:
-            logger.error("CLI command timed out: %s", e.stderr)
-            return None
-        except json.JSONDecodeError as e:
-            logger.error("Failed to parse CLI output: %s", e)
-            return None
-        except Exception as e:
-            logger.exception("Unexpected error retrieving secret: %s", e)
-            return None
+    async def get_fields_async(
+        self, vault: str, item: str, fields: List[str]
+    ) -> Dict[str, Optional[str]]:
+        """
+        Asynchronous variant of get_fields that does not block the event loop.
 
-def get_cognitive_services_client() -> Optional[TextAnalyticsClient]:
-    """Authenticate to Azure Cognitive Services using secrets from 1Password."""
-    client = OnePasswordCLIClient()
+        Concurrent calls for the same item share one CLI invocation: a call
+        that finds the item being fetched waits for that invocation and only
+        requests the fields it did not cover.
+        """
+        key = (vault, item)
+        values = self._cached_fields(vault, item)
+        pending = self._in_flight.get(key)
+        if pending is not None and any(field not in values for field in fields):
+            # Shielded, so a cancelled caller does not cancel the fetch for the others
+            values.update(await asyncio.shield(pending))
+        missing = [field for field in fields if field not in values]
+        if missing:
+            command = self._command(vault, item, missing)
+            process = None
+            fetched: Dict[str, str] = {}
+            # Registered before the first await, so concurrent calls find it
+            future = asyncio.get_running_loop().create_future()
+            self._in_flight[key] = future
+            try:
+                logger.debug("Executing command: %s", " ".join(command))
+                process = await asyncio.create_subprocess_exec(
+                    *command,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE
+                )
+                stdout, stderr = await asyncio.wait_for(process.communicate(), self.timeout)
+                if process.returncode != 0:
+                    logger.error("CLI command failed: %s", stderr.decode(errors="replace"))
+                else:
+                    fetched = self._parse_fields(stdout.decode(), missing)
+                    self._remember(vault, item, fetched)
 
-    # Retrieve API key and endpoint from 1Password
-    api_key = client.get_secret(VAULT_NAME, ITEM_NAME, API_KEY_FIELD)
-    endpoint = client.get_secret(VAULT_NAME, ITEM_NAME, ENDPOINT_FIELD)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                logger.error("CLI command timed out: %s", " ".join(command))
+            except json.JSONDecodeError as e:
+                logger.error("Failed to parse CLI output: %s", e)
+            except Exception as e:
+                logger.exception("Unexpected error retrieving secret: %s", e)
+            finally:
+                future.set_result(fetched)
+                if self._in_flight.get(key) is future:
+                    del self._in_flight[key]
+            values.update(fetched)
 
-    if not api_key or not endpoint:
-        logger.error("Failed to retrieve Cognitive Services credentials")
-        return None
+        return {field: values.get(field) for field in fields}
 
-    # Log secrets conditionally based on log level
-    if logger.isEnabledFor(logging.DEBUG):
-        logger.debug("API Key: %s", api_key)
-        logger.debug("Endpoint: %s", endpoint)
+    async def get_items_async(
+        self, requests: List[Tuple[str, str, List[str]]]
+    ) -> List[Dict[str, Optional[str]]]:
+        """
+        Resolve several items in parallel.
+
+        Args:
+            requests: (vault, item, fields) tuples.
+
+        Returns:
+            The get_fields result of each request, in order.
+        """
+        return await asyncio.gather(
+            *(self.get_fields_async(vault, item, fields) for vault, item, fields in requests)
+        )
+
+def get_cognitive_services_client() -> Optional[Union["TextAnalyticsClient", EndpointPool]]:
+    """
+    Authenticate to Azure Cognitive Services using secrets from 1Password.
+
+    With EXTRA_ITEM_NAMES set, the items are resolved in parallel and an
+    EndpointPool balancing requests across their resources is returned.
+    """
+    client = OnePasswordCLIClient()
+    fields = [API_KEY_FIELD, ENDPOINT_FIELD]
+
+    if EXTRA_ITEM_NAMES:
+        items = asyncio.run(client.get_items_async(
+            [(VAULT_NAME, item, fields) for item in [ITEM_NAME] + EXTRA_ITEM_NAMES]
+        ))
     else:
-        logger.debug("API Key: [REDACTED]")
-        logger.debug("Endpoint: [REDACTED]")
+        # Retrieve API key and endpoint from 1Password with a single CLI invocation
+        items = [client.get_fields(VAULT_NAME, ITEM_NAME, fields)]
+
+    credentials = []
+    for secrets in items:
+        api_key = secrets[API_KEY_FIELD]
+        endpoint = secrets[ENDPOINT_FIELD]
+
+        if not api_key or not endpoint:
+            logger.error("Failed to retrieve Cognitive Services credentials")
+            return None
+
+        # Log secrets conditionally based on log level
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("API Key: %s", api_key)
+            logger.debug("Endpoint: %s", endpoint)
+        else:
+            logger.debug("API Key: [REDACTED]")
+            logger.debug("Endpoint: [REDACTED]")
+        credentials.append((endpoint, api_key))
 
     try:
-        # Authenticate to Cognitive Services
-        credential = AzureKeyCredential(api_key)
-        text_analytics_client = TextAnalyticsClient(endpoint=endpoint, credential=credential)
+        # Authenticate to Cognitive Services with the process-wide shared client(s)
+        if len(credentials) > 1:
+            text_analytics_client = create_pool(credentials)
+        else:
+            text_analytics_client = get_text_analytics_client(*credentials[0])
         logger.info("Successfully authenticated to Cognitive Services")
         return text_analytics_client
     except Exception as e:
         logger.error("Failed to authenticate to Cognitive Services: %s", e)
         return None
 
-def analyze_text(client: TextAnalyticsClient, text: str):
+def analyze_text(client: "TextAnalyticsClient", text: str):
     """Example function to analyze text using Cognitive Services."""
     try:
         # Log the sample text before analysis
@@ -1,9 +1,21 @@
 import argparse
 import logging
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
-from azure.core.credentials import AzureKeyCredential
-from azure.ai.textanalytics import TextAnalyticsClient
+import os
+import sys
+
+# Shared helpers live in the azure_ai_toolkit package at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from azure_ai_toolkit import batching, bulk, checkpoint, endpoints, key_vault, metrics, writers
+from azure_ai_toolkit.bulk import language_result_to_record
+from azure_ai_toolkit.cache import ResultCache
+from azure_ai_toolkit.clients import get_text_analytics_client, DEFAULT_POOL_SIZE
+from azure_ai_toolkit.langid import LocalLanguageDetector
+from azure_ai_toolkit.memory import MemoryCeiling
+from azure_ai_toolkit.preprocess import Preprocessor
+from azure_ai_toolkit.throttling import RetryScheduler
+
+# Shared across calls so that throttling slows the whole session down instead of failing it
+scheduler = RetryScheduler(max_concurrency=1)
 
 def setup_logging():
     """Configure logging for the application."""
@@ -12,6 +24,32 @@ def setup_logging():
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
 
+def get_secrets_from_vault(vault_url, secret_names):
+    """
+    Retrieve several secrets from Azure Key Vault concurrently.
+    
+    The DefaultAzureCredential is built once per process and retrieved
+    secrets are kept in an in-memory cache with expiry, so repeated lookups
+    do not go back to the vault.
+    
+    Args:
+        vault_url (str): The URL of the Azure Key Vault.
+        secret_names (list): The names of the secrets to retrieve.
+    
+    Returns:
+        dict: The value of each retrieved secret, keyed by name.
+    
+    Raises:
+        Exception: If the secret retrieval fails.
+    """
+    try:
+        secrets = key_vault.get_secrets(vault_url, secret_names)
+        logging.info(f"Successfully retrieved secrets: {', '.join(secret_names)}")
+        return secrets
+    except Exception as ex:
+        logging.error(f"Failed to retrieve secrets {secret_names} from Key Vault: {ex}")
+        raise
+
 def get_secret_from_vault(vault_url, secret_name):
     """
     Retrieve a secret from Azure Key Vault using DefaultAzureCredential.
@@ -26,17 +64,9 @@ def get_secret_from_vault(vault_url, secret_name):
     Raises:
         Exception: If the secret retrieval fails.
     """
-    try:
-        credential = DefaultAzureCredential()
-        secret_client = SecretClient(vault_url=vault_url, credential=credential)
-        secret = secret_client.get_secret(secret_name).value
-        logging.info(f"Successfully retrieved secret: {secret_name}")
-        return secret
-    except Exception as ex:
-        logging.error(f"Failed to retrieve secret '{secret_name}' from Key Vault: {ex}")
-        raise
+    return get_secrets_from_vault(vault_url, [secret_name])[secret_name]
 
-def detect_language(text, endpoint, key):
+def detect_language(text, endpoint, key, cache=None, detector=None):
     """
     Detect the language of the input text using Azure Text Analytics.
     
@@ -44,44 +74,257 @@ def detect_language(text, endpoint, key):
         text (str): The text to analyze.
         endpoint (str): The endpoint URL of the Text Analytics service.
         key (str): The API key for the Text Analytics service.
+        cache (ResultCache, optional): Result cache consulted before calling the service.
+        detector (LocalLanguageDetector, optional): Answers clear-cut texts
+            without calling the service.
     
     Returns:
         str: The name of the detected primary language.
     
     Raises:
-        Exception: If language detection fails.
+        Exception: If language detection fails after throttling and transient
+            errors have been retried.
     """
+    document = {"id": "0", "text": text}
+    if detector:
+        record = detector.detect(document)
+        if record:
+            logging.info(f"Detected language (local): {record['language']}")
+            return record["language"]
+    if cache:
+        record = cache.get(document, "detect_language")
+        if record:
+            logging.info(f"Detected language (cached): {record['language']}")
+            return record["language"]
+
     try:
-        credential = AzureKeyCredential(key)
-        client = TextAnalyticsClient(endpoint=endpoint, credential=credential)
-        response = client.detect_language(documents=[text])[0]
+        # The shared client keeps its connection open across the interactive loop;
+        # retries are handled by the scheduler, so the SDK's own retry policy is disabled
+        client = get_text_analytics_client(endpoint, key, retry_total=0)
+        response = scheduler.call(client.detect_language, documents=[text])[0]
         language = response.primary_language.name
+        if cache:
+            cache.put_many([document], [language_result_to_record(response)], "detect_language")
         logging.info(f"Detected language: {language}")
         return language
     except Exception as ex:
         logging.error(f"Failed to detect language: {ex}")
         raise
 
+def create_bulk_client(endpoint, key, concurrency, extra_credentials=()):
+    """
+    Return the shared client of the resource, or a pool balancing batches
+    across it and extra_credentials. Retries are handled by the scheduler, so
+    the SDK's own retry policy is disabled.
+    """
+    client_kwargs = {"pool_size": max(concurrency, DEFAULT_POOL_SIZE), "retry_total": 0}
+    if extra_credentials:
+        client = endpoints.create_pool([(endpoint, key)] + list(extra_credentials), **client_kwargs)
+        metrics.REGISTRY.add_stats(client.stats, "endpoint_")
+        return client
+    return get_text_analytics_client(endpoint, key, **client_kwargs)
+
+def detect_language_bulk(input_path, output_path, endpoint, key, cache=None, concurrency=4, detector=None,
+                         output_format=None, preprocessor=None, extra_credentials=(), memory_ceiling=None):
+    """
+    Detect the language of every line of a file (or stdin) in batches.
+    
+    File to file runs are checkpointed: after a failure, rerunning with the
+    same input and output resumes after the last written batch without
+    duplicating or re-sending any document.
+    
+    Args:
+        input_path (str): Text or JSONL input file, or "-" for stdin.
+        output_path (str): Output file, or "-" for stdout.
+        endpoint (str): The endpoint URL of the Text Analytics service.
+        key (str): The API key for the Text Analytics service.
+        cache (ResultCache, optional): Result cache consulted before calling the service.
+        concurrency (int): Maximum number of batches in flight.
+        detector (LocalLanguageDetector, optional): Answers clear-cut texts
+            without calling the service.
+        output_format (str, optional): "jsonl", "csv" or "parquet"; inferred
+            from the output file extension by default.
+        preprocessor (Preprocessor, optional): Normalizes texts, sends
+            repeated texts once and splits oversized ones into chunks.
+        extra_credentials (list): (endpoint, key) pairs of further resources;
+            batches are balanced across all of them, failing over between them.
+        memory_ceiling (MemoryCeiling, optional): Shrinks batches while the
+            resident memory of the process is above it.
+    
+    Returns:
+        int: The number of documents in the output.
+    """
+    client = create_bulk_client(endpoint, key, concurrency, extra_credentials)
+    bulk_scheduler = RetryScheduler(max_concurrency=concurrency, resources=1 + len(extra_credentials))
+    metrics.REGISTRY.add_stats(bulk_scheduler.stats)
+    output_format = output_format or writers.guess_output_format(output_path)
+    output_is_file = output_path != "-" and (os.path.isfile(output_path) or not os.path.exists(output_path))
+    if input_path != "-" and output_is_file and writers.WRITERS[output_format].resumable:
+        result = checkpoint.run_checkpointed(client, "detect_language", input_path, output_path,
+                                             max_in_flight=concurrency, scheduler=bulk_scheduler, cache=cache,
+                                             language_detector=detector, output_format=output_format,
+                                             preprocessor=preprocessor, memory_ceiling=memory_ceiling)
+        if result["resumed_from"]:
+            logging.info(f"Resumed from line {result['resumed_from']}")
+        log_endpoint_stats(client)
+        return result["count"]
+
+    documents = bulk.prepare_documents(batching.read_documents(input_path), "detect_language", cache, detector,
+                                       preprocessor)
+    batches = batching.iter_batches(documents, max_documents=batching.MAX_DOCUMENTS_PER_BATCH["detect_language"],
+                                    memory_ceiling=memory_ceiling)
+    records = bulk.run_bulk(client, "detect_language", batches, concurrency, bulk_scheduler, cache)
+    if preprocessor:
+        records = preprocessor.finish(records)
+    output = sys.stdout.buffer if output_path == "-" else open(output_path, "wb")
+    try:
+        return writers.write_records(records, writers.open_writer(output, output_format, "detect_language"))
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+        log_endpoint_stats(client)
+
+def detect_language_stream(endpoint, key, cache=None, concurrency=4, detector=None, window=0.05,
+                           extra_credentials=()):
+    """
+    Detect the language of stdin lines as they arrive, e.g. from a pipe.
+    
+    Stdin is read without blocking on the service: lines arriving within
+    window seconds of each other are coalesced into one request, and a JSON
+    record per line is printed to stdout in input order as soon as its
+    request returns.
+    
+    Args:
+        endpoint (str): The endpoint URL of the Text Analytics service.
+        key (str): The API key for the Text Analytics service.
+        cache (ResultCache, optional): Result cache consulted before calling the service.
+        concurrency (int): Maximum number of requests in flight.
+        detector (LocalLanguageDetector, optional): Answers clear-cut texts
+            without calling the service.
+        window (float): Seconds a line may wait for others to join its request.
+        extra_credentials (list): (endpoint, key) pairs of further resources.
+    
+    Returns:
+        dict: The number of "documents" answered and of service "requests" made.
+    """
+    # Only this mode needs asyncio, which is slow to import
+    import asyncio
+    from azure_ai_toolkit import coalescing
+
+    client = create_bulk_client(endpoint, key, concurrency, extra_credentials)
+    stream_scheduler = RetryScheduler(max_concurrency=concurrency, resources=1 + len(extra_credentials))
+    metrics.REGISTRY.add_stats(stream_scheduler.stats)
+    writer = writers.open_writer(sys.stdout.buffer, "jsonl", "detect_language")
+
+    def print_record(record):
+        writer.write(record)
+        writer.flush()
+
+    async def run():
+        return await coalescing.run_coalesced(client, "detect_language", coalescing.read_lines(sys.stdin),
+                                              print_record, window, concurrency, stream_scheduler, cache,
+                                              detector)
+
+    try:
+        return asyncio.run(run())
+    finally:
+        log_endpoint_stats(client)
+
+def log_endpoint_stats(client):
+    """Log how requests were spread over the endpoints of a pool."""
+    if isinstance(client, endpoints.EndpointPool):
+        logging.info(f"Failovers between endpoints: {client.stats['failovers']}")
+        for line in client.describe():
+            logging.info(f"Endpoint {line}")
+
 def main():
     setup_logging()
     parser = argparse.ArgumentParser(description='Process text using Azure AI services.')
     parser.add_argument('--key-vault-url', required=True, help='The URL of the Azure Key Vault.')
+    parser.add_argument('--cache', help='SQLite file caching detected languages across runs.')
+    parser.add_argument('--input', help='Detect the language of every line of this file ("-" for stdin).')
+    parser.add_argument('--output', default='-', help='File for bulk results (default: stdout).')
+    parser.add_argument('--output-format', choices=writers.OUTPUT_FORMATS,
+                        help='Result format; inferred from the --output extension, JSONL by default.')
+    parser.add_argument('--concurrency', type=int, default=4, help='Maximum number of batches in flight.')
+    parser.add_argument('--local-language-detection', action='store_true',
+                        help='Answer clear-cut texts locally and only send ambiguous ones to the service.')
+    parser.add_argument('--preprocess', action='store_true',
+                        help='Normalize bulk texts, send repeated texts once and chunk oversized ones.')
+    parser.add_argument('--stream', action='store_true',
+                        help='Read stdin without blocking, coalescing lines that arrive close together into one '
+                             'request, and print a JSON record per line in order as soon as it is answered.')
+    parser.add_argument('--coalesce-ms', type=float, default=50,
+                        help='With --stream, how long a line waits for others to join its request (default: 50).')
+    parser.add_argument('--resources', type=int, default=1,
+                        help='Number of AI Services resources in the vault (AI-SERVICE-ENDPOINT-2, '
+                             'AI-SERVICE-KEY-2, ... after the first); bulk batches are balanced across them.')
+    parser.add_argument('--max-memory-mb', type=float,
+                        help='Shrink bulk batches while the resident memory exceeds this many MB.')
+    parser.add_argument('--metrics', action='store_true',
+                        help='Log per-stage timings and request counters at exit.')
     args = parser.parse_args()
 
+    cache = ResultCache(args.cache) if args.cache else None
+    detector = LocalLanguageDetector() if args.local_language_detection else None
+    preprocessor = Preprocessor("detect_language") if args.preprocess else None
+    memory_ceiling = MemoryCeiling.from_megabytes(args.max_memory_mb)
+    metrics.REGISTRY.add_stats(scheduler.stats)
+    for helper, prefix in ((cache, "cache_"), (detector, "language_"), (preprocessor, "preprocess_"),
+                           (memory_ceiling, "memory_")):
+        if helper:
+            metrics.REGISTRY.add_stats(helper.stats, prefix)
     try:
-        ai_endpoint = get_secret_from_vault(args.key_vault_url, "AI-SERVICE-ENDPOINT")
-        ai_key = get_secret_from_vault(args.key_vault_url, "AI-SERVICE-KEY")
+        bulk_mode = args.input or args.stream
+        endpoint_names = endpoints.numbered_names("AI-SERVICE-ENDPOINT", args.resources if bulk_mode else 1)
+        key_names = endpoints.numbered_names("AI-SERVICE-KEY", len(endpoint_names))
+        secrets = get_secrets_from_vault(args.key_vault_url, endpoint_names + key_names)
+        credentials = [(secrets[endpoint_name], secrets[key_name])
+                       for endpoint_name, key_name in zip(endpoint_names, key_names)]
+        ai_endpoint, ai_key = credentials[0]
+
+        if args.input:
+            count = detect_language_bulk(args.input, args.output, ai_endpoint, ai_key, cache, args.concurrency,
+                                         detector, args.output_format, preprocessor, credentials[1:],
+                                         memory_ceiling)
+            logging.info(f"Detected the language of {count} documents")
+            if memory_ceiling:
+                logging.info(f"Peak resident memory: {memory_ceiling.peak_rss / (1 << 20):.0f} MB, "
+                             f"batches shrunk {memory_ceiling.stats['shrinks']} times")
+            return
+
+        if args.stream:
+            result = detect_language_stream(ai_endpoint, ai_key, cache, args.concurrency, detector,
+                                            args.coalesce_ms / 1000, credentials[1:])
+            logging.info(f"Detected the language of {result['documents']} lines "
+                         f"with {result['requests']} requests")
+            return
 
         while True:
             user_text = input('\nEnter some text ("quit" to stop):\n')
             if user_text.lower() == "quit":
                 logging.info("Exiting application.")
                 break
-            language = detect_language(user_text, ai_endpoint, ai_key)
+            language = detect_language(user_text, ai_endpoint, ai_key, cache, detector)
             print('Detected Language:', language)
 
     except Exception as ex:
         logging.critical(f"Application terminated with an error: {ex}")
+    finally:
+        if cache:
+            logging.info(f"Cache hits: {cache.stats['hits']}, misses: {cache.stats['misses']}")
+            cache.close()
+        if detector:
+            logging.info(f"Languages detected locally: {detector.stats['local']} of "
+                         f"{detector.stats['local'] + detector.stats['service']} "
+                         f"({detector.local_fraction:.0%} of service calls avoided)")
+        if preprocessor:
+            logging.info(f"Duplicates not sent: {preprocessor.stats['duplicates']} of "
+                         f"{preprocessor.stats['documents']}, oversized texts chunked: "
+                         f"{preprocessor.stats['chunked']}")
+        if args.metrics:
+            for line in metrics.REGISTRY.summary():
+                logging.info(f"Metrics: {line}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
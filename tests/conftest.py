@@ -0,0 +1,53 @@
+"""Fixtures running the toolkit against the in-process simulator."""
+
+import pytest
+
+from azure_ai_toolkit.clients import get_text_analytics_client
+from azure_ai_toolkit.simulator import start_simulator
+
+KEY = "simulator-key"
+
+
+@pytest.fixture
+def simulator():
+    """Start simulators with the given SimulatorRequestHandler options and return their endpoints."""
+    servers = []
+
+    def start(**options):
+        server, endpoint = start_simulator(**options)
+        servers.append(server)
+        return endpoint
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def create_client():
+    """Return the client of an endpoint; the SDK's own retries are off, as with a RetryScheduler."""
+
+    def create(endpoint):
+        return get_text_analytics_client(endpoint, KEY, retry_total=0)
+
+    return create
+
+
+@pytest.fixture
+def client(simulator, create_client):
+    """A client of a simulator without latency or failures."""
+    return create_client(simulator())
+
+
+@pytest.fixture
+def write_input(tmp_path):
+    """Write texts to a text input file, one per line, and return its path."""
+
+    def write(texts, name="input.txt"):
+        path = str(tmp_path / name)
+        with open(path, "w", encoding="utf-8") as input_file:
+            input_file.writelines(text + "\n" for text in texts)
+        return path
+
+    return write
@@ -0,0 +1,90 @@
+"""Exactly-once output of checkpointed runs interrupted part way."""
+
+import json
+
+import pytest
+
+from azure_ai_toolkit import checkpoint
+from azure_ai_toolkit.preprocess import Preprocessor
+
+
+class CrashingClient:
+    """Forwards sentiment requests, recording their ids, and raises once `crash_after` requests were sent."""
+
+    def __init__(self, client, crash_after=None):
+        self.client = client
+        self.crash_after = crash_after
+        self.requests = []
+
+    def analyze_sentiment(self, documents, **kwargs):
+        if self.crash_after is not None and len(self.requests) >= self.crash_after:
+            raise RuntimeError("crash")
+        self.requests.append([document["id"] for document in documents])
+        return self.client.analyze_sentiment(documents, **kwargs)
+
+
+def read_records(path):
+    with open(path, "r", encoding="utf-8") as output:
+        return [json.loads(line) for line in output]
+
+
+def read_state(output_path):
+    with open(checkpoint.checkpoint_path(output_path), "r") as state_file:
+        return json.load(state_file)
+
+
+def test_resume_truncates_uncommitted_output_and_skips_committed_batches(client, write_input, tmp_path):
+    input_path = write_input([f"Review {line} was great." for line in range(1, 36)])
+    expected_path = str(tmp_path / "expected.jsonl")
+    checkpoint.run_checkpointed(client, "analyze_sentiment", input_path, expected_path)
+    output_path = str(tmp_path / "output.jsonl")
+
+    with pytest.raises(RuntimeError):
+        checkpoint.run_checkpointed(CrashingClient(client, crash_after=2), "analyze_sentiment", input_path,
+                                    output_path)
+    state = read_state(output_path)
+    assert state["records"] == 20
+    assert state["last_batch_ids"] == [str(line) for line in range(11, 21)]
+    # A process killed while writing leaves a torn record behind the checkpoint
+    with open(output_path, "a", encoding="utf-8") as output:
+        output.write('{"id": "21", "sent')
+
+    resumed = CrashingClient(client)
+    result = checkpoint.run_checkpointed(resumed, "analyze_sentiment", input_path, output_path)
+    assert result == {"count": 35, "resumed_from": 21}
+    sent = [document_id for request in resumed.requests for document_id in request]
+    assert sent == [str(line) for line in range(21, 36)]
+    assert read_records(output_path) == read_records(expected_path)
+
+
+def test_resume_reassembles_chunks_and_duplicates_across_checkpoints(client, write_input, tmp_path):
+    # Line 16 is cut into 12 chunks, which span the second and third batches
+    long_text = " ".join(f"Great service {index:02d}." for index in range(24))
+    texts = [f"Review {line} was bad." for line in range(1, 16)] + [long_text]
+    texts += ["Review 2 was bad.", long_text] + [f"Review {line} was good." for line in range(19, 31)]
+    input_path = write_input(texts)
+    expected_path = str(tmp_path / "expected.jsonl")
+    checkpoint.run_checkpointed(client, "analyze_sentiment", input_path, expected_path,
+                                preprocessor=Preprocessor("analyze_sentiment", max_characters=40))
+    output_path = str(tmp_path / "output.jsonl")
+
+    with pytest.raises(RuntimeError):
+        checkpoint.run_checkpointed(CrashingClient(client, crash_after=2), "analyze_sentiment", input_path,
+                                    output_path, preprocessor=Preprocessor("analyze_sentiment", max_characters=40))
+    # Never checkpointed between the chunks of a document
+    resume_line = read_state(output_path)["line"]
+    assert 1 < resume_line <= 16
+
+    resumed = CrashingClient(client)
+    checkpoint.run_checkpointed(resumed, "analyze_sentiment", input_path, output_path,
+                                preprocessor=Preprocessor("analyze_sentiment", max_characters=40))
+    sent = [document_id for request in resumed.requests for document_id in request]
+    assert sent[0] == str(resume_line)
+    assert [f"16#{index}" for index in range(12)] == [document_id for document_id in sent
+                                                       if document_id.startswith("16#")]
+    records = read_records(output_path)
+    assert records == read_records(expected_path)
+    assert [record["id"] for record in records] == [str(line) for line in range(1, 31)]
+    assert records[15]["sentiment"] == "positive"
+    assert records[16] == dict(records[1], id="17")
+    assert records[17] == dict(records[15], id="18")
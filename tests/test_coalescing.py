@@ -0,0 +1,59 @@
+"""When the coalescer sends the documents it has gathered."""
+
+import asyncio
+import time
+from functools import partial
+
+from azure_ai_toolkit import bulk
+from azure_ai_toolkit.coalescing import Coalescer
+
+
+def recording_sender(client, sends):
+    """Send batches with bulk.run_batch, recording the time and ids of each request."""
+    send_batch = partial(bulk.run_batch, client, "analyze_sentiment")
+
+    def send(batch):
+        sends.append((time.monotonic(), [document["id"] for document in batch]))
+        return send_batch(batch)
+
+    return send
+
+
+def documents(count):
+    return [{"id": str(line), "text": f"Review {line} was great."} for line in range(1, count + 1)]
+
+
+def test_documents_within_the_window_share_one_request(client):
+    sends = []
+
+    async def run():
+        coalescer = Coalescer(recording_sender(client, sends), window=0.3)
+        start = time.monotonic()
+        futures = [await coalescer.submit(document) for document in documents(3)]
+        await asyncio.sleep(0.1)
+        assert sends == []
+        records = await asyncio.gather(*futures)
+        await coalescer.close()
+        return start, records
+
+    start, records = asyncio.run(run())
+    assert [record["id"] for record in records] == ["1", "2", "3"]
+    assert [ids for _, ids in sends] == [["1", "2", "3"]]
+    assert sends[0][0] - start >= 0.3
+
+
+def test_full_batch_is_sent_before_the_window_closes(client):
+    sends = []
+
+    async def run():
+        coalescer = Coalescer(recording_sender(client, sends), window=5.0, max_documents=2)
+        futures = [await coalescer.submit(document) for document in documents(3)]
+        first = await asyncio.wait_for(asyncio.gather(*futures[:2]), 2.0)
+        # close() sends the partial batch left over without waiting either
+        await asyncio.wait_for(coalescer.close(), 2.0)
+        return first, await futures[2]
+
+    first, last = asyncio.run(run())
+    assert [record["id"] for record in first] == ["1", "2"]
+    assert last["id"] == "3"
+    assert [ids for _, ids in sends] == [["1", "2"], ["3"]]
@@ -0,0 +1,52 @@
+"""Resuming sharded runs from their manifest."""
+
+import json
+import os
+
+import pytest
+
+from azure_ai_toolkit import sharding
+from azure_ai_toolkit.clients import get_text_analytics_client
+
+from tests.conftest import KEY
+
+
+class ClientFactory:
+    """Picklable client factory for the worker processes; requests with `failing_id` raise."""
+
+    def __init__(self, endpoint, failing_id=None):
+        self.endpoint = endpoint
+        self.failing_id = failing_id
+
+    def __call__(self):
+        return self
+
+    def analyze_sentiment(self, documents, **kwargs):
+        if any(document["id"] == self.failing_id for document in documents):
+            raise RuntimeError(f"document {self.failing_id} failed")
+        return get_text_analytics_client(self.endpoint, KEY, retry_total=0).analyze_sentiment(documents, **kwargs)
+
+
+def test_resume_merges_finished_and_redone_shards_in_order(simulator, write_input, tmp_path):
+    endpoint = simulator()
+    input_path = write_input([f"Review {line} was great." for line in range(1, 201)])
+    expected_path = str(tmp_path / "expected.jsonl")
+    sharding.run_sharded(ClientFactory(endpoint), "analyze_sentiment", input_path, expected_path, processes=2)
+    output_path = str(tmp_path / "output.jsonl")
+
+    # One shard fails; the others finish and keep their part files
+    with pytest.raises(RuntimeError):
+        sharding.run_sharded(ClientFactory(endpoint, failing_id="120"), "analyze_sentiment", input_path,
+                             output_path, processes=2)
+    assert os.path.exists(output_path + ".manifest.json")
+    assert not os.path.exists(output_path)
+
+    result = sharding.run_sharded(ClientFactory(endpoint), "analyze_sentiment", input_path, output_path,
+                                  processes=2)
+    assert result["resumed"] == 2 * sharding.SHARDS_PER_PROCESS - 1
+    assert result["count"] == 200
+    with open(output_path, "r", encoding="utf-8") as output, open(expected_path, "r", encoding="utf-8") as expected:
+        records = [json.loads(line) for line in output]
+        assert records == [json.loads(line) for line in expected]
+    assert [record["id"] for record in records] == [str(line) for line in range(1, 201)]
+    assert sorted(os.listdir(tmp_path)) == ["expected.jsonl", "input.txt", "output.jsonl"]
@@ -0,0 +1,78 @@
+"""Recovery of jobs claimed by spool workers that died."""
+
+import json
+import os
+import threading
+import time
+
+from azure_ai_toolkit import batching, bulk
+from azure_ai_toolkit.spool import SpoolWorker
+
+
+def write_job(spool_dir, name, texts):
+    path = os.path.join(spool_dir, "incoming", name)
+    with open(path, "w", encoding="utf-8") as job:
+        job.writelines(text + "\n" for text in texts)
+    return path
+
+
+def analyze_job(client):
+    def handle_job(path, output):
+        records = bulk.run_bulk(client, "analyze_sentiment", batching.iter_batches(batching.read_documents(path)))
+        count = 0
+        for record in records:
+            output.write(json.dumps(record).encode("utf-8") + b"\n")
+            count += 1
+        return count
+
+    return handle_job
+
+
+def test_expired_claim_of_a_dead_worker_is_requeued_and_run(client, tmp_path):
+    spool_dir = str(tmp_path)
+    crashed = SpoolWorker(spool_dir, analyze_job(client), lease_seconds=0.5)
+    write_job(spool_dir, "reviews.txt", ["Great service.", "Terrible food."])
+    claimed = crashed.claim()
+    # The worker died without renewing its lease
+    expired = time.time() - 1
+    os.utime(claimed, (expired, expired))
+
+    worker = SpoolWorker(spool_dir, analyze_job(client), lease_seconds=0.5)
+    worker.recover()
+    assert worker.stats["requeued"] == 1
+    assert os.listdir(os.path.join(spool_dir, "processing")) == []
+    worker.process(worker.claim())
+
+    with open(os.path.join(spool_dir, "results", "reviews.jsonl"), "r", encoding="utf-8") as result:
+        assert [json.loads(line)["sentiment"] for line in result] == ["positive", "negative"]
+    assert worker.stats["jobs"] == 1
+
+
+def test_claim_of_a_live_worker_is_kept_while_it_heartbeats(client, tmp_path):
+    spool_dir = str(tmp_path)
+    started, release = threading.Event(), threading.Event()
+
+    def slow_job(path, output):
+        started.set()
+        release.wait(5)
+        return analyze_job(client)(path, output)
+
+    busy = SpoolWorker(spool_dir, slow_job, lease_seconds=0.4)
+    write_job(spool_dir, "reviews.txt", ["Great service."])
+    thread = threading.Thread(target=busy.process, args=(busy.claim(),))
+    thread.start()
+    started.wait(5)
+
+    other = SpoolWorker(spool_dir, analyze_job(client), lease_seconds=0.4)
+    # Past several lease durations, renewed by the heartbeat all along
+    deadline = time.monotonic() + 1.2
+    while time.monotonic() < deadline:
+        other.recover()
+        time.sleep(0.05)
+    release.set()
+    thread.join(5)
+
+    assert other.stats["requeued"] == 0
+    assert busy.stats["jobs"] == 1
+    assert os.listdir(os.path.join(spool_dir, "incoming")) == []
+    assert os.path.exists(os.path.join(spool_dir, "results", "reviews.jsonl"))
@@ -0,0 +1,50 @@
+"""The sentiment scripts' --help must not load the SDK or the heavy run modes."""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SCRIPTS = {
+    "terraform": os.path.join(ROOT, "deployment", "terraform", "azure_ai_sentiment_analysis.py"),
+    "bicep": os.path.join(ROOT, "deployment", "bicep", "azure_ai_sentiment_analysis.py"),
+}
+# Modules only a run needs: the Azure SDK, the process pool of the sharded
+# mode, the spool worker, checkpointing and the bulk pipeline
+HEAVY_MODULES = (
+    "azure.",
+    "requests",
+    "sqlite3",
+    "multiprocessing",
+    "concurrent.futures.process",
+    "http.server",
+    "azure_ai_toolkit.bulk",
+    "azure_ai_toolkit.checkpoint",
+    "azure_ai_toolkit.sharding",
+    "azure_ai_toolkit.spool",
+)
+
+# Runs the script as __main__ with --help and prints the modules it loaded
+PROBE = """
+import contextlib, io, json, runpy, sys
+sys.argv = [sys.argv[1], "--help"]
+with contextlib.redirect_stdout(io.StringIO()):
+    try:
+        runpy.run_path(sys.argv[0], run_name="__main__")
+    except SystemExit:
+        pass
+print(json.dumps(sorted(sys.modules)))
+"""
+
+
+@pytest.mark.parametrize("name", sorted(SCRIPTS))
+def test_help_loads_no_heavy_module(name):
+    result = subprocess.run([sys.executable, "-c", PROBE, SCRIPTS[name]], capture_output=True, text=True,
+                            check=True, timeout=60)
+    modules = json.loads(result.stdout)
+    assert "azure_ai_toolkit.cli" in modules
+    heavy = [module for module in modules if module.startswith(HEAVY_MODULES) or module == "azure"]
+    assert heavy == []
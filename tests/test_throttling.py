@@ -0,0 +1,33 @@
+"""Per-document retries of partially failed batches."""
+
+from azure_ai_toolkit import batching, bulk
+from azure_ai_toolkit.throttling import RetryScheduler
+
+
+class RecordingClient:
+    """Forwards sentiment requests, recording the ids of each."""
+
+    def __init__(self, client):
+        self.client = client
+        self.requests = []
+
+    def analyze_sentiment(self, documents, **kwargs):
+        self.requests.append([document["id"] for document in documents])
+        return self.client.analyze_sentiment(documents, **kwargs)
+
+
+def test_only_failed_documents_are_resent(simulator, create_client):
+    client = RecordingClient(create_client(simulator(document_error_rate=0.3)))
+    scheduler = RetryScheduler(max_concurrency=1, max_attempts=20, base_delay=0.001)
+    documents = [{"id": str(line), "text": f"Review {line} was great."} for line in range(1, 31)]
+
+    records = list(bulk.run_bulk(client, "analyze_sentiment", batching.iter_batches(documents), scheduler=scheduler))
+
+    assert [record["id"] for record in records] == [document["id"] for document in documents]
+    assert all(record["sentiment"] == "positive" for record in records)
+    retried = scheduler.stats["retried_documents"]
+    assert retried > 0
+    assert scheduler.stats["retried_requests"] == 0
+    # Each batch is sent once in full, then only the documents that failed
+    assert client.requests[0] == [str(line) for line in range(1, 11)]
+    assert sum(len(request) for request in client.requests) == len(documents) + retried